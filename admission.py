@@ -0,0 +1,168 @@
+import asyncio
+import contextlib
+import math
+import time
+from collections import deque
+
+from metrics import span
+
+# Optional cross-worker coalescing for single-seat claims: only the session
+# that wins the seat's advisory lock goes on to the row, every other worker's
+# contender is told to try again without queueing on it. The (int, int) key
+# space does not overlap the bigint one the migrations lock.
+SEAT_ADVISORY_GATE_SQL = "pg_try_advisory_xact_lock(%(event_id)s, %(seat_id)s)"
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after, reason):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Admission in front of the seat-claiming endpoints for on-sale spikes.
+
+    Two layers, both per process:
+
+    * ``claim(key, claim)`` coalesces contenders for one seat: while a claim
+      for it is in flight, every other request for the same seat waits for
+      that claim's outcome instead of taking a connection to find out.
+    * ``slot()`` caps the claims that run at once at ``max_concurrent``, so
+      a storm cannot take the whole pool from the other endpoints. Excess
+      requests wait in FIFO order; when ``max_queue`` are already waiting,
+      or a request has waited ``queue_timeout`` seconds, ``Overloaded`` is
+      raised with a Retry-After estimate from the recent service time.
+    """
+
+    def __init__(self, max_concurrent=10, max_queue=1000, queue_timeout=2.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._waiters = deque()
+        self._in_flight = {}
+
+        self.admitted = 0
+        self.queued = 0
+        self.coalesced = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.max_queue_length = 0
+        self._served = 0
+        self._service_total = 0.0
+        self._wait_total = 0.0
+
+    async def claim(self, key, claim):
+        """Run ``claim()`` for the first request for ``key``; concurrent ones share its outcome.
+
+        Returns ``(result, led)``. The request that ran the claim gets its
+        result with ``led`` True; the others get the same result with ``led``
+        False, or the exception it raised, so a missing seat, a 429 or a 500
+        for the leader is one for them too. Only a seat the leader won is
+        taken for the others.
+        """
+        counted = False
+        while key in self._in_flight:
+            pending = self._in_flight[key]
+            if not counted:
+                self.coalesced += 1
+                counted = True
+            try:
+                return await asyncio.shield(pending), False
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leader was cancelled before it had an outcome; contend again.
+
+        pending = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await claim()
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except BaseException as e:
+            pending.set_exception(e)
+            # Marks it retrieved, so a claim nobody waited on is not logged.
+            pending.exception()
+            raise
+        else:
+            pending.set_result(result)
+            return result, True
+        finally:
+            del self._in_flight[key]
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        with span("admission_wait"):
+            await self._acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._served += 1
+            self._service_total += time.perf_counter() - started
+            self._release()
+
+    def retry_after(self):
+        """Seconds until the current queue has likely drained, at least 1."""
+        service = self._service_total / self._served if self._served else 0.1
+        return max(1, math.ceil((len(self._waiters) + 1) * service / self.max_concurrent))
+
+    async def _acquire(self):
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise Overloaded(self.retry_after(), "Too many booking requests waiting")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_queue_length = max(self.max_queue_length, len(self._waiters))
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self._release()
+            else:
+                with contextlib.suppress(ValueError):
+                    self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected_timeout += 1
+                raise Overloaded(self.retry_after(), "Timed out waiting for a booking slot") from None
+            raise
+
+        self._wait_total += time.perf_counter() - queued_at
+        self.admitted += 1
+
+    def _release(self):
+        # Hand the slot straight to the oldest waiter, so late arrivals
+        # cannot overtake the queue.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self._active,
+            "queue_length": len(self._waiters),
+            "max_queue_length": self.max_queue_length,
+            "seats_in_flight": len(self._in_flight),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_wait_ms": round(self._wait_total / self.queued * 1000, 3) if self.queued else 0.0,
+            "avg_service_ms": round(self._service_total / self._served * 1000, 3) if self._served else 0.0,
+        }
@@ -0,0 +1,417 @@
+import math
+
+from aspects import ASPECT_NAMES
+
+# Concurrent writers add their deltas to different rows so that review
+# submissions do not queue on one hot summary row; readers sum the shards.
+REVIEW_STATS_SHARDS = 16
+
+# The summary and rollup tables, keyed by event first so that one event's
+# analytics never read another event's rows. Migration 7 replaced the unkeyed
+# ones migrations 3 and 4 created.
+EVENT_REVIEW_STATS_TABLES_SQL = [
+    """
+    CREATE TABLE review_stats (
+        event_id INTEGER NOT NULL,
+        shard SMALLINT NOT NULL,
+        metric VARCHAR(100) NOT NULL,
+        value_sum FLOAT NOT NULL DEFAULT 0,
+        value_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (event_id, shard, metric)
+    );
+    """,
+    """
+    CREATE TABLE review_stats_hourly (
+        event_id INTEGER NOT NULL,
+        bucket TIMESTAMP NOT NULL,
+        shard SMALLINT NOT NULL,
+        metric VARCHAR(100) NOT NULL,
+        value_sum FLOAT NOT NULL DEFAULT 0,
+        value_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (event_id, bucket, shard, metric)
+    );
+    """,
+    """
+    CREATE TABLE review_stats_by_seat (
+        event_id INTEGER NOT NULL,
+        seat_id INTEGER NOT NULL,
+        metric VARCHAR(100) NOT NULL,
+        value_sum FLOAT NOT NULL DEFAULT 0,
+        value_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (event_id, seat_id, metric)
+    );
+    """,
+]
+
+# The current hour is as hot as the global summary, but hourly rows pile up
+# over time, so it gets fewer shards.
+REVIEW_STATS_HOURLY_SHARDS = 4
+
+# The rollups keep counts and score sums only, not label and rating counts.
+_ROLLUP_METRIC_FILTER = "(metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')"
+
+
+def _review_metric_rows(reviews):
+    """Review-level contributions: ``reviews``, ``average_score`` and ``rating:<rating>``."""
+    return f"""
+        SELECT r.event_id, r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM {reviews} r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    """
+
+
+def _aspect_metric_rows(aspects, reviews):
+    """Aspect contributions: ``aspect:<name>`` score sums and ``label:<name>:<label>`` counts.
+
+    The review supplies the event, seat and hour bucket.
+    """
+    return f"""
+        SELECT r.event_id, r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM {aspects} a
+        JOIN {reviews} r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    """
+
+
+def _metric_rows(reviews):
+    """One (event_id, seat_id, bucket, metric, value) row per contribution of each review and its aspects.
+
+    NULL scores contribute nothing, like AVG() ignores them.
+    """
+    return _review_metric_rows(reviews) + " UNION ALL " + _aspect_metric_rows("review_aspects", reviews)
+
+
+def _upsert(table, key):
+    return f"""
+        ON CONFLICT ({key}, metric) DO UPDATE SET
+            value_sum = {table}.value_sum + EXCLUDED.value_sum,
+            value_count = {table}.value_count + EXCLUDED.value_count
+    """
+
+
+def _apply_delta_sql(delta):
+    """Add a signed delta to the summary and both rollups in one statement."""
+    changed = "HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0"
+    return f"""
+        WITH delta AS (
+            {delta}
+        ), summary AS (
+            INSERT INTO review_stats (event_id, shard, metric, value_sum, value_count)
+            SELECT event_id, pg_backend_pid() % {REVIEW_STATS_SHARDS}, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY event_id, metric
+            {changed}
+            ORDER BY event_id, metric
+            {_upsert("review_stats", "event_id, shard")}
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (event_id, seat_id, metric, value_sum, value_count)
+            SELECT event_id, seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND {_ROLLUP_METRIC_FILTER}
+            GROUP BY event_id, seat_id, metric
+            {changed}
+            ORDER BY event_id, seat_id, metric
+            {_upsert("review_stats_by_seat", "event_id, seat_id")}
+        )
+        INSERT INTO review_stats_hourly (event_id, bucket, shard, metric, value_sum, value_count)
+        SELECT event_id, bucket, pg_backend_pid() % {REVIEW_STATS_HOURLY_SHARDS}, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND {_ROLLUP_METRIC_FILTER}
+        GROUP BY event_id, bucket, metric
+        {changed}
+        ORDER BY event_id, bucket, metric
+        {_upsert("review_stats_hourly", "event_id, bucket, shard")};
+    """
+
+
+def _signed(rows, sign):
+    return f"SELECT event_id, seat_id, bucket, metric, value, {sign} AS sign FROM ({rows}) AS metric_rows"
+
+
+def _changes(rows):
+    """Delta statements for INSERT, DELETE and UPDATE given ``rows(transition_table)``."""
+    return {
+        "INSERT": _apply_delta_sql(_signed(rows("new_rows"), 1)),
+        "DELETE": _apply_delta_sql(_signed(rows("old_rows"), -1)),
+        "UPDATE": _apply_delta_sql(_signed(rows("new_rows"), 1) + " UNION ALL " + _signed(rows("old_rows"), -1)),
+    }
+
+
+_REVIEW_CHANGES = _changes(_metric_rows)
+_ASPECT_CHANGES = _changes(lambda table: _aspect_metric_rows(table, "reviews"))
+
+# Statement-level, like the seat NOTIFY trigger, so a bulk insert or the
+# worker's multi-row write-back costs one aggregate update, in the same
+# transaction as the change itself. A review's aspects are counted under the
+# review's event, seat and hour: review changes re-read its current aspects and
+# aspect changes look up the review, so either side may change alone.
+# review_aspects references reviews without cascading, so aspects are always
+# deleted while their review still exists. The statement triggers on both
+# tables that call it were created by migrations 3 and 5.
+REVIEW_STATS_FUNCTION_SQL = f"""
+    CREATE OR REPLACE FUNCTION maintain_review_stats() RETURNS trigger AS $$
+    BEGIN
+        IF TG_TABLE_NAME = 'reviews' THEN
+            IF TG_OP = 'INSERT' THEN
+                {_REVIEW_CHANGES["INSERT"]}
+            ELSIF TG_OP = 'DELETE' THEN
+                {_REVIEW_CHANGES["DELETE"]}
+            ELSE
+                {_REVIEW_CHANGES["UPDATE"]}
+            END IF;
+        ELSE
+            IF TG_OP = 'INSERT' THEN
+                {_ASPECT_CHANGES["INSERT"]}
+            ELSIF TG_OP = 'DELETE' THEN
+                {_ASPECT_CHANGES["DELETE"]}
+            ELSE
+                {_ASPECT_CHANGES["UPDATE"]}
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+READ_REVIEW_STATS_SQL = """
+    SELECT metric, SUM(value_sum) AS value_sum, SUM(value_count) AS value_count
+    FROM review_stats
+    WHERE event_id = %s
+    GROUP BY metric;
+"""
+
+# Each pair is (maintained, recomputed from reviews), keyed the same way.
+_CONSISTENCY_QUERIES = {
+    "summary": (
+        """
+        SELECT event_id::text || '/' || metric AS metric, SUM(value_sum) AS value_sum, SUM(value_count) AS value_count
+        FROM review_stats
+        GROUP BY event_id, metric;
+        """,
+        f"""
+        SELECT event_id::text || '/' || metric AS metric, COALESCE(SUM(value), 0) AS value_sum, COUNT(*) AS value_count
+        FROM ({_metric_rows("reviews")}) AS review_metrics
+        GROUP BY event_id, metric;
+        """,
+    ),
+    "by_seat": (
+        """
+        SELECT event_id::text || '/' || seat_id::text || '/' || metric AS metric, value_sum, value_count
+        FROM review_stats_by_seat;
+        """,
+        f"""
+        SELECT event_id::text || '/' || seat_id::text || '/' || metric AS metric,
+               COALESCE(SUM(value), 0) AS value_sum, COUNT(*) AS value_count
+        FROM ({_metric_rows("reviews")}) AS review_metrics
+        WHERE seat_id IS NOT NULL AND {_ROLLUP_METRIC_FILTER}
+        GROUP BY event_id, seat_id, metric;
+        """,
+    ),
+    "hourly": (
+        """
+        SELECT event_id::text || '/' || bucket::text || '/' || metric AS metric,
+               SUM(value_sum) AS value_sum, SUM(value_count) AS value_count
+        FROM review_stats_hourly
+        GROUP BY event_id, bucket, metric;
+        """,
+        f"""
+        SELECT event_id::text || '/' || bucket::text || '/' || metric AS metric,
+               COALESCE(SUM(value), 0) AS value_sum, COUNT(*) AS value_count
+        FROM ({_metric_rows("reviews")}) AS review_metrics
+        WHERE bucket IS NOT NULL AND {_ROLLUP_METRIC_FILTER}
+        GROUP BY event_id, bucket, metric;
+        """,
+    ),
+}
+
+# Blocks review writes (but not reads) while the summary is recomputed.
+REBUILD_REVIEW_STATS_SQL = [
+    "LOCK TABLE reviews IN SHARE MODE;",
+    "DELETE FROM review_stats;",
+    f"""
+    INSERT INTO review_stats (event_id, shard, metric, value_sum, value_count)
+    SELECT event_id, 0, metric, COALESCE(SUM(value), 0), COUNT(*)
+    FROM ({_metric_rows("reviews")}) AS review_metrics
+    GROUP BY event_id, metric;
+    """,
+]
+
+REBUILD_REVIEW_ROLLUPS_SQL = [
+    "LOCK TABLE reviews IN SHARE MODE;",
+    "DELETE FROM review_stats_by_seat;",
+    "DELETE FROM review_stats_hourly;",
+    f"""
+    INSERT INTO review_stats_by_seat (event_id, seat_id, metric, value_sum, value_count)
+    SELECT event_id, seat_id, metric, COALESCE(SUM(value), 0), COUNT(*)
+    FROM ({_metric_rows("reviews")}) AS review_metrics
+    WHERE seat_id IS NOT NULL AND {_ROLLUP_METRIC_FILTER}
+    GROUP BY event_id, seat_id, metric;
+    """,
+    f"""
+    INSERT INTO review_stats_hourly (event_id, bucket, shard, metric, value_sum, value_count)
+    SELECT event_id, bucket, 0, metric, COALESCE(SUM(value), 0), COUNT(*)
+    FROM ({_metric_rows("reviews")}) AS review_metrics
+    WHERE bucket IS NOT NULL AND {_ROLLUP_METRIC_FILTER}
+    GROUP BY event_id, bucket, metric;
+    """,
+]
+
+
+def _by_metric(rows):
+    return {
+        row['metric']: (float(row['value_sum']), int(row['value_count']))
+        for row in rows
+        if row['value_count'] or row['value_sum']
+    }
+
+
+async def read_review_stats(db, event_id):
+    """``{metric: (sum, count)}`` of one event from the summary; a handful of rows regardless of table size."""
+    return _by_metric(await db.fetch(READ_REVIEW_STATS_SQL, (event_id,)))
+
+
+def summarize(metrics):
+    """Review count, average score and per-aspect averages from ``{metric: (sum, count)}``."""
+    def average(metric):
+        total, count = metrics.get(metric, (0.0, 0))
+        return round(total / count, 3) if count else None
+
+    return {
+        "reviews": metrics.get("reviews", (0.0, 0))[1],
+        "average_score": average("average_score"),
+        "aspects": {aspect: average(f"aspect:{aspect}") for aspect in ASPECT_NAMES},
+    }
+
+
+async def read_timeseries(db, event_id, bucket, since, until):
+    """Per-``bucket`` (``hour`` or ``day``) summaries of one event in ``[since, until)`` from the hourly rollup."""
+    rows = await db.fetch("""
+        SELECT date_trunc(%s, bucket) AS bucket, metric, SUM(value_sum) AS value_sum, SUM(value_count) AS value_count
+        FROM review_stats_hourly
+        WHERE event_id = %s AND bucket >= date_trunc(%s, %s::timestamp) AND bucket < %s
+        GROUP BY 1, metric
+        ORDER BY 1;
+    """, (bucket, event_id, bucket, since, until))
+
+    buckets = {}
+    for row in rows:
+        buckets.setdefault(row['bucket'], {})[row['metric']] = (float(row['value_sum']), int(row['value_count']))
+    return [{"bucket": start, **summarize(metrics)} for start, metrics in buckets.items()]
+
+
+async def read_seat_stats(db, event_id, limit, after=None):
+    """One page of per-seat summaries of one event, in seat_id order after ``after``.
+
+    Returns ``(seats, next_after)``; ``next_after`` is the seat_id to pass as
+    ``after`` for the next page, or None on the last one. The grouping and
+    paging happen in SQL, on the rollup's (event_id, seat_id, metric) key.
+    """
+    rows = await db.fetch("""
+        SELECT st.seat_id, s.seat_number,
+               json_object_agg(st.metric, json_build_array(st.value_sum, st.value_count)) AS metrics
+        FROM review_stats_by_seat st
+        JOIN seats s ON s.event_id = st.event_id AND s.id = st.seat_id
+        WHERE st.event_id = %s AND st.seat_id > %s AND st.value_count <> 0
+        GROUP BY st.seat_id, s.seat_number
+        ORDER BY st.seat_id
+        LIMIT %s;
+    """, (event_id, -1 if after is None else after, limit + 1))
+
+    seats = [
+        {
+            "seat_id": row['seat_id'],
+            "seat_number": row['seat_number'],
+            **summarize({metric: (float(total), int(count)) for metric, (total, count) in row['metrics'].items()}),
+        }
+        for row in rows[:limit]
+    ]
+    return seats, seats[-1]["seat_id"] if len(rows) > limit else None
+
+
+async def read_seat_row_stats(db, event_id):
+    """Summaries per seat row (the letter prefix of ``seat_number``) of one event."""
+    rows = await db.fetch("""
+        SELECT substring(s.seat_number from '^[A-Za-z]+') AS seat_row, st.metric,
+               SUM(st.value_sum) AS value_sum, SUM(st.value_count) AS value_count
+        FROM review_stats_by_seat st
+        JOIN seats s ON s.event_id = st.event_id AND s.id = st.seat_id
+        WHERE st.event_id = %s AND st.value_count <> 0
+        GROUP BY 1, st.metric
+        ORDER BY 1;
+    """, (event_id,))
+
+    seat_rows = {}
+    for row in rows:
+        seat_rows.setdefault(row['seat_row'], {})[row['metric']] = (float(row['value_sum']), int(row['value_count']))
+    return [{"row": seat_row, **summarize(metrics)} for seat_row, metrics in seat_rows.items()]
+
+
+async def check_review_stats(db):
+    """Compare the maintained summary and rollups with a full recomputation from ``reviews``."""
+    results = {}
+    async with db.transaction() as tx:
+        await tx.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;")
+        for name, (maintained_sql, computed_sql) in _CONSISTENCY_QUERIES.items():
+            results[name] = (_by_metric(await tx.fetch(maintained_sql)), _by_metric(await tx.fetch(computed_sql)))
+
+    mismatches = []
+    for name, (maintained, computed) in results.items():
+        for metric in sorted(set(maintained) | set(computed)):
+            kept_sum, kept_count = maintained.get(metric, (0.0, 0))
+            true_sum, true_count = computed.get(metric, (0.0, 0))
+            if kept_count != true_count or not math.isclose(kept_sum, true_sum, rel_tol=1e-9, abs_tol=1e-6):
+                mismatches.append({
+                    "table": name,
+                    "metric": metric,
+                    "maintained": {"sum": kept_sum, "count": kept_count},
+                    "computed": {"sum": true_sum, "count": true_count},
+                })
+
+    return {
+        "consistent": not mismatches,
+        "metrics": {name: len(computed) for name, (_, computed) in results.items()},
+        "mismatches": mismatches,
+    }
+
+
+async def rebuild_review_stats(db):
+    async with db.transaction() as tx:
+        for sql in REBUILD_REVIEW_STATS_SQL + REBUILD_REVIEW_ROLLUPS_SQL:
+            await tx.execute(sql)
+
+
+async def _main():
+    import argparse
+    import json
+    import os
+
+    from db import create_database
+
+    parser = argparse.ArgumentParser(description="Check or rebuild the maintained review summary and rollups.")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args()
+
+    db = create_database(os.environ.get("DB_BACKEND", "sync"), os.environ["DATABASE_URL"], min_size=0, max_size=1)
+    await db.open()
+    try:
+        if args.command == "rebuild":
+            await rebuild_review_stats(db)
+        print(json.dumps(await check_review_stats(db), indent=2))
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    asyncio.run(_main())
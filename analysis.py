@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from aspects import ASPECT_NAMES
+from sentiment import cache_stats, readiness, score_review_texts, warm_up
+
+logger = logging.getLogger(__name__)
+
+
+def _values_sql(rows, kinds):
+    placeholder = "(" + ", ".join(f"%s::{kind}" for kind in kinds) + ")"
+    return ", ".join([placeholder] * rows)
+
+
+def _write_back_reviews_sql(rows):
+    return f"""
+        UPDATE reviews AS r SET
+            average_score = v.average_score,
+            overall_rating = v.overall_rating,
+            analysis_status = v.analysis_status,
+            analyzed_at = CURRENT_TIMESTAMP
+        FROM (VALUES {_values_sql(rows, ("int", "float8", "varchar", "varchar"))})
+            AS v(review_id, average_score, overall_rating, analysis_status)
+        WHERE r.review_id = v.review_id;
+    """
+
+
+def _write_back_aspects_sql(rows):
+    return f"""
+        UPDATE review_aspects AS a SET
+            score = v.score,
+            label = v.label
+        FROM (VALUES {_values_sql(rows, ("int", "varchar", "float8", "varchar"))})
+            AS v(review_id, aspect, score, label)
+        WHERE a.review_id = v.review_id AND a.aspect = v.aspect;
+    """
+
+
+def analyze_review_texts(texts):
+    """Runs in a worker process; also reports that process's sentiment cache counters."""
+    return score_review_texts(texts), os.getpid(), cache_stats()
+
+
+class ReviewAnalysisWorker:
+    """Scores reviews in a process pool and writes the results back in batches.
+
+    ``submit_review`` inserts the review as ``pending`` and hands its texts to
+    ``submit``; the NLP runs in separate processes so it neither holds the
+    GIL nor a database connection of the request. Finished analyses are
+    collected for up to ``flush_interval`` seconds (or ``batch_size`` results)
+    and written with one multi-row UPDATE. Reviews still pending at startup
+    are picked up again by ``recover``.
+    """
+
+    def __init__(self, db, processes=None, batch_size=50, flush_interval=0.2):
+        self.db = db
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._executor = None
+        self._results = None
+        self._writer = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self._latency_total = 0.0
+        self._cache_stats = {}
+        self._readiness = {}
+
+    @property
+    def in_flight(self):
+        return self.submitted - self.completed - self.failed
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_up,
+        )
+
+    def start(self):
+        self._executor = self._create_executor()
+        self._results = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_results())
+
+    async def warm_up(self):
+        """Start the worker processes and wait until they have loaded the model.
+
+        Every process warms the sentiment backend in its initializer before it
+        takes work, so reviews never wait on a cold model; this just makes the
+        processes start now instead of on the first review.
+        """
+        loop = asyncio.get_running_loop()
+        states = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, readiness) for _ in range(self.processes)
+        ))
+        for state in states:
+            self._readiness[state["pid"]] = state
+        return self.readiness()
+
+    def readiness(self):
+        states = list(self._readiness.values())
+        warm = [s for s in states if s["state"] == "warm"]
+        return {
+            "state": "warm" if warm else states[0]["state"] if states else "cold",
+            "processes": self.processes,
+            "processes_warm": len(warm),
+            "warmup_seconds": max((s["warmup_seconds"] for s in warm), default=None),
+        }
+
+    async def recover(self):
+        rows = await self.db.fetch("""
+            SELECT r.review_id, a.aspect, a.text
+            FROM reviews r
+            JOIN review_aspects a ON a.review_id = r.review_id
+            WHERE r.analysis_status = 'pending'
+            ORDER BY r.review_id;
+        """)
+
+        texts = {}
+        for row in rows:
+            texts.setdefault(row['review_id'], {})[row['aspect']] = row['text']
+        for review_id, by_aspect in texts.items():
+            self.submit(review_id, [by_aspect.get(aspect) for aspect in ASPECT_NAMES])
+        return len(texts)
+
+    def submit(self, review_id, texts):
+        submitted_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor, analyze_review_texts, texts)
+        except BrokenProcessPool:
+            logger.warning("Sentiment process pool broke; starting a new one")
+            self._executor = self._create_executor()
+            future = loop.run_in_executor(self._executor, analyze_review_texts, texts)
+        future.add_done_callback(lambda f: self._results.put_nowait((review_id, submitted_at, f)))
+        self.submitted += 1
+
+    async def _write_results(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._results.get()]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._results.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        review_params = []
+        aspect_params = []
+        failed = 0
+        for review_id, submitted_at, future in batch:
+            try:
+                (results, avg_score, overall_rating), pid, cache = future.result()
+            except Exception:
+                logger.exception("Sentiment analysis failed for review %s", review_id)
+                review_params.extend([review_id, None, None, "failed"])
+                failed += 1
+                continue
+
+            self._cache_stats[pid] = cache
+            review_params.extend([review_id, avg_score, overall_rating, "complete"])
+            for aspect, (score, label) in zip(ASPECT_NAMES, results):
+                aspect_params.extend([review_id, aspect, score, label])
+            self._latency_total += time.perf_counter() - submitted_at
+
+        try:
+            async with self.db.transaction() as tx:
+                if aspect_params:
+                    await tx.execute(_write_back_aspects_sql(len(aspect_params) // 4), aspect_params)
+                await tx.execute(_write_back_reviews_sql(len(batch)), review_params)
+        except Exception:
+            # The reviews stay pending and are re-analysed by recover() on the next start.
+            logger.exception("Could not write back %d review analyses", len(batch))
+            self.write_errors += 1
+            self.failed += len(batch)
+            return
+
+        self.batches_written += 1
+        self.completed += len(batch) - failed
+        self.failed += failed
+
+    async def close(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def cache_stats(self):
+        """Sentiment cache counters summed over the worker processes seen so far."""
+        per_process = [stats for stats in self._cache_stats.values() if stats.get("enabled", True)]
+        if not per_process:
+            # Either no process has reported yet or the cache is disabled in all of them.
+            return {"enabled": False} if self._cache_stats else {"processes": 0}
+
+        totals = {
+            key: sum(stats[key] for stats in per_process)
+            for key in ("size", "hits", "store_hits", "misses", "evictions", "store_errors")
+        }
+        lookups = totals["hits"] + totals["store_hits"] + totals["misses"]
+        totals["processes"] = len(per_process)
+        totals["persistent"] = per_process[0]["persistent"]
+        totals["hit_rate"] = round((totals["hits"] + totals["store_hits"]) / lookups, 4) if lookups else 0.0
+        return totals
+
+    def stats(self):
+        return {
+            "processes": self.processes,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "batches_written": self.batches_written,
+            "write_errors": self.write_errors,
+            "avg_batch_size": round((self.completed + self.failed) / self.batches_written, 2) if self.batches_written else 0.0,
+            "avg_analysis_latency_ms": round(self._latency_total / self.completed * 1000, 3) if self.completed else 0.0,
+        }
@@ -0,0 +1,88 @@
+from typing import NamedTuple, Optional
+
+from pydantic import BaseModel, Field, create_model
+
+
+class ReviewAspect(NamedTuple):
+    name: str
+    field: str
+    description: str
+    required: bool = False
+
+
+# Single source of truth for review aspects: the request model, the
+# ``review_aspects`` rows, the analysis responses and the analytics all follow
+# this list. The overall experience must stay first; the overall rating
+# treats it specially.
+ASPECTS = [
+    ReviewAspect("overall_experience", "overall_experience", "Your overall experience", required=True),
+    ReviewAspect("sound_quality", "sound_quality_review", "Review about sound/audio quality"),
+    ReviewAspect("seat_comfort", "seat_comfort_review", "Review about seat comfort"),
+    ReviewAspect("seat_height", "seat_height_review", "Review about seat height/position"),
+    ReviewAspect("view_quality", "view_quality_review", "Review about view/visibility"),
+    ReviewAspect("booking_service", "booking_service_review", "Review about booking service"),
+    ReviewAspect("staff_behavior", "staff_behavior_review", "Review about staff behavior"),
+    ReviewAspect("cleanliness", "cleanliness_review", "Review about cleanliness"),
+    ReviewAspect("value_for_money", "value_for_money_review", "Review about value for money"),
+]
+
+ASPECT_NAMES = [aspect.name for aspect in ASPECTS]
+OVERALL_ASPECT = ASPECTS[0].name
+
+
+class ReviewerInfo(BaseModel):
+    user_id: int
+    user_name: str
+
+
+# One optional text field per registered aspect (the overall experience is required).
+ReviewRequest = create_model(
+    "ReviewRequest",
+    __base__=ReviewerInfo,
+    **{
+        aspect.field: (str, Field(..., description=aspect.description)) if aspect.required
+        else (Optional[str], Field(None, description=aspect.description))
+        for aspect in ASPECTS
+    },
+)
+
+
+def aspect_texts(review):
+    """The aspect texts of a request model (or any object with the aspect fields), in registry order."""
+    return [getattr(review, aspect.field) for aspect in ASPECTS]
+
+
+async def insert_review_aspects(tx, review_id, texts, results=None):
+    """Insert one ``review_aspects`` row per provided text with a single multi-row INSERT.
+
+    ``results`` holds the ``(score, label)`` pairs in registry order; without
+    it the rows are inserted unscored for the analysis worker to fill in.
+    """
+    rows = []
+    for index, (aspect, text) in enumerate(zip(ASPECT_NAMES, texts)):
+        if text is None:
+            continue
+        score, label = results[index] if results is not None else (None, None)
+        rows.extend([review_id, aspect, text, score, label])
+
+    if not rows:
+        return
+
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * (len(rows) // 5))
+    await tx.execute(
+        f"INSERT INTO review_aspects (review_id, aspect, text, score, label) VALUES {placeholders};",
+        rows,
+    )
+
+
+def format_analysis(aspect_rows):
+    """``{aspect: {"score", "sentiment"}}`` in registry order; aspects without text count as neutral."""
+    by_aspect = {row['aspect']: row for row in aspect_rows}
+    analysis = {}
+    for aspect in ASPECT_NAMES:
+        row = by_aspect.get(aspect)
+        if row is None or row['score'] is None:
+            analysis[aspect] = {"score": 0.0, "sentiment": "neutral"}
+        else:
+            analysis[aspect] = {"score": round(row['score'], 3), "sentiment": row['label']}
+    return analysis
@@ -0,0 +1,239 @@
+"""Same-seat booking storm: lock-read-update-reread vs single-statement claim.
+
+Every round resets one seat and releases ``--concurrency`` clients at it at the
+same instant; exactly one of them must win. Runs directly against Postgres
+(``DATABASE_URL``) on a scratch table, so the app does not need to be running.
+
+The row lock serializes everyone who touches the seat, so "lock held/round" is
+the summed time clients spent holding it between acquiring it and ending their
+transaction. ``--rtt-ms`` sleeps before every round trip to model the network
+distance to the database, which is what the legacy path multiplies.
+
+    python benchmarks/booking_contention.py --concurrency 50 --rounds 20 --rtt-ms 1
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+
+TABLE = "bench_contention_seats"
+
+LEGACY_LOCK_SQL = f"SELECT status FROM {TABLE} WHERE id = %s FOR UPDATE;"
+LEGACY_UPDATE_SQL = f"""
+    UPDATE {TABLE}
+    SET status = 'booked', user_id = %s, user_name = %s, booked_at = %s
+    WHERE id = %s;
+"""
+LEGACY_REREAD_SQL = f"SELECT seat_number FROM {TABLE} WHERE id = %s;"
+
+ATOMIC_CLAIM_SQL = f"""
+    WITH candidate AS (
+        SELECT id FROM {TABLE}
+        WHERE id = %(seat_id)s AND status = 'available'
+        FOR UPDATE SKIP LOCKED
+    ), claimed AS (
+        UPDATE {TABLE}
+        SET status = 'booked',
+            user_id = %(user_id)s,
+            user_name = %(user_name)s,
+            booked_at = %(booked_at)s
+        FROM candidate
+        WHERE {TABLE}.id = candidate.id
+        RETURNING {TABLE}.seat_number
+    )
+    SELECT
+        (SELECT seat_number FROM claimed) AS seat_number,
+        EXISTS (SELECT 1 FROM {TABLE} WHERE id = %(seat_id)s) AS seat_exists;
+"""
+
+
+def round_trip(cur, sql, params, rtt):
+    if rtt:
+        time.sleep(rtt)
+    cur.execute(sql, params)
+
+
+def end_transaction(conn, commit, rtt):
+    if rtt:
+        time.sleep(rtt)
+    if commit:
+        conn.commit()
+    else:
+        conn.rollback()
+
+
+def book_legacy(conn, seat_id, user_id, rtt):
+    """Mirror of the original book_seat: returns (won, lock_hold_seconds)."""
+    cur = conn.cursor()
+    round_trip(cur, LEGACY_LOCK_SQL, (seat_id,), rtt)
+    locked_at = time.perf_counter()
+    status = cur.fetchone()[0]
+
+    if status != "available":
+        end_transaction(conn, False, rtt)
+        return False, time.perf_counter() - locked_at
+
+    round_trip(cur, LEGACY_UPDATE_SQL, (user_id, f"user{user_id}", datetime.now(), seat_id), rtt)
+    end_transaction(conn, True, rtt)
+    held = time.perf_counter() - locked_at
+    round_trip(cur, LEGACY_REREAD_SQL, (seat_id,), rtt)
+    cur.fetchone()
+    end_transaction(conn, True, rtt)
+    return True, held
+
+
+def book_atomic(conn, seat_id, user_id, rtt):
+    cur = conn.cursor()
+    round_trip(cur, ATOMIC_CLAIM_SQL, {
+        "seat_id": seat_id,
+        "user_id": user_id,
+        "user_name": f"user{user_id}",
+        "booked_at": datetime.now(),
+    }, rtt)
+    claimed_at = time.perf_counter()
+    seat_number, _ = cur.fetchone()
+    end_transaction(conn, True, rtt)
+
+    if seat_number is None:
+        return False, 0.0
+    return True, time.perf_counter() - claimed_at
+
+
+STRATEGIES = {"legacy": book_legacy, "atomic": book_atomic}
+
+
+def setup(dsn):
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {TABLE};")
+    cur.execute(f"""
+        CREATE TABLE {TABLE} (
+            id SERIAL PRIMARY KEY,
+            seat_number VARCHAR(10) UNIQUE NOT NULL,
+            status VARCHAR(20) DEFAULT 'available',
+            user_id INTEGER,
+            user_name VARCHAR(100),
+            booked_at TIMESTAMP
+        );
+    """)
+    cur.execute(f"INSERT INTO {TABLE} (seat_number) VALUES ('A1');")
+    conn.commit()
+    return conn
+
+
+def reset_seat(conn):
+    cur = conn.cursor()
+    cur.execute(f"UPDATE {TABLE} SET status = 'available', user_id = NULL, user_name = NULL, booked_at = NULL;")
+    conn.commit()
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))]
+
+
+def run_strategy(dsn, admin, name, concurrency, rounds, rtt):
+    book = STRATEGIES[name]
+    conns = [psycopg2.connect(dsn) for _ in range(concurrency)]
+    latencies, round_lock_holds = [], []
+    bad_rounds = 0
+    lock = threading.Lock()
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        reset_seat(admin)
+        barrier = threading.Barrier(concurrency)
+        winners = []
+        lock_holds = []
+
+        def client(index):
+            barrier.wait()
+            t0 = time.perf_counter()
+            won, held = book(conns[index], 1, index + 1, rtt)
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                if held:
+                    lock_holds.append(held)
+                if won:
+                    winners.append(index)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        round_lock_holds.append(sum(lock_holds))
+        if len(winners) != 1:
+            bad_rounds += 1
+    elapsed = time.perf_counter() - started
+
+    for conn in conns:
+        conn.close()
+
+    return {
+        "strategy": name,
+        "attempts": len(latencies),
+        "rounds": rounds,
+        "rounds_without_exactly_one_winner": bad_rounds,
+        "attempts_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(max(latencies) * 1000, 3),
+        },
+        "lock_hold_ms_per_round": {
+            "p50": round(percentile(round_lock_holds, 0.50) * 1000, 3),
+            "p99": round(percentile(round_lock_holds, 0.99) * 1000, 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=50, help="clients racing for the seat each round")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="simulated client/server latency per round trip")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), action="append")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    dsn = os.environ.get("DATABASE_URL")
+    if not dsn:
+        sys.exit("DATABASE_URL is required")
+
+    admin = setup(dsn)
+    try:
+        results = [
+            run_strategy(dsn, admin, name, args.concurrency, args.rounds, args.rtt_ms / 1000)
+            for name in args.strategy or ["legacy", "atomic"]
+        ]
+    finally:
+        admin.cursor().execute(f"DROP TABLE IF EXISTS {TABLE};")
+        admin.commit()
+        admin.close()
+
+    for result in results:
+        print(
+            f"{result['strategy']:>7}: {result['attempts_per_second']:>8} attempts/s  "
+            f"p50 {result['latency_ms']['p50']:>8} ms  p99 {result['latency_ms']['p99']:>8} ms  "
+            f"lock held/round p50 {result['lock_hold_ms_per_round']['p50']:>8} ms  "
+            f"bad rounds {result['rounds_without_exactly_one_winner']}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "booking_contention", "args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
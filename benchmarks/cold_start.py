@@ -0,0 +1,134 @@
+"""Cold start: seconds from spawning a worker to serving, to ready, and the first review.
+
+Starts ``uvicorn main:app`` against ``DATABASE_URL`` once per run and polls
+``/ready`` every few milliseconds, recording for each ``--warmup`` mode
+(``SENTIMENT_WARMUP``):
+
+* ``serving_s``: the first response of any status, i.e. startup finished;
+* ``ready_s``: the first 200 from ``/ready`` (database answering and, unless
+  warmup is off, the sentiment model loaded);
+* ``first_review_ms``: latency of a review submitted the moment the worker
+  serves, which is where a cold model used to show up.
+
+Each run books one seat of a scratch one-seat event to review, so point it at
+a disposable database.
+
+    python benchmarks/cold_start.py --warmup background --warmup off --runs 5
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MODES = ["background", "blocking", "off"]
+POLL_INTERVAL = 0.005
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def first_review(client, run):
+    venue = client.post("/venues", json={"name": "Cold start hall"}).json()
+    event = client.post("/events", json={
+        "venue_id": venue["id"], "name": f"Cold start {run}", "rows": 1, "seats_per_row": 1,
+    }).json()
+    seat_id = client.get(f"/events/{event['id']}/seats").json()["seats"][0]["id"]
+    client.post(f"/events/{event['id']}/book/{seat_id}", json={"user_id": 1, "user_name": "cold"}).raise_for_status()
+
+    started = time.perf_counter()
+    response = client.post(f"/events/{event['id']}/review/{seat_id}", json={
+        "user_id": 1, "user_name": "cold", "overall_experience": "The view was great but it was too loud",
+    })
+    response.raise_for_status()
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def run_once(mode, run, timeout):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env={**os.environ, "SENTIMENT_WARMUP": mode},
+    )
+    result = {"warmup": mode, "run": run}
+    try:
+        with httpx.Client(base_url=url, timeout=30) as client:
+            while "ready_s" not in result:
+                try:
+                    response = client.get("/ready")
+                except httpx.HTTPError:
+                    response = None
+                elapsed = round(time.perf_counter() - started, 3)
+
+                if response is not None and "serving_s" not in result:
+                    result["serving_s"] = elapsed
+                    result["first_review_ms"] = first_review(client, run)
+                    continue
+                if response is not None and response.status_code == 200:
+                    result["ready_s"] = elapsed
+                    result["startup"] = response.json()["startup"]
+                    break
+
+                if proc.poll() is not None or elapsed > timeout:
+                    sys.exit(f"The app did not become ready with SENTIMENT_WARMUP={mode}")
+                time.sleep(POLL_INTERVAL)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return result
+
+
+def summarize(mode, runs):
+    summary = {"warmup": mode, "runs": len(runs)}
+    for key in ("serving_s", "ready_s", "first_review_ms"):
+        values = [run[key] for run in runs]
+        summary[f"{key}_median"] = round(statistics.median(values), 3)
+        summary[f"{key}_max"] = max(values)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--warmup", action="append", choices=MODES, help="repeatable; default: all modes")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60, help="give up on a worker after this many seconds")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    args.warmup = args.warmup or MODES
+
+    if not os.environ.get("DATABASE_URL"):
+        sys.exit("DATABASE_URL is required")
+
+    runs = []
+    results = []
+    for mode in args.warmup:
+        mode_runs = [run_once(mode, run, args.timeout) for run in range(args.runs)]
+        runs.extend(mode_runs)
+        summary = summarize(mode, mode_runs)
+        results.append(summary)
+        print(
+            f"{mode:>10}: serving {summary['serving_s_median']} s  ready {summary['ready_s_median']} s  "
+            f"first review {summary['first_review_ms_median']} ms  (median of {summary['runs']}; "
+            f"max {summary['serving_s_max']} / {summary['ready_s_max']} s / {summary['first_review_ms_max']} ms)"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "cold_start", "args": vars(args), "results": results, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""HTTP load suite: booking storms, random booking, reviews, /seats and analytics.
+
+Drives the real app over HTTP, so everything in front of the database
+(admission control, caches, serialization) is measured too. Without ``--url``
+it starts ``uvicorn main:app`` against ``DATABASE_URL`` on a free port and
+stops it afterwards. Every scenario runs on scratch events it creates through
+``POST /events``, so the default event is never touched; the events are not
+deleted afterwards, so point it at a disposable database.
+
+Scenarios:
+
+* ``storm``: ``--storm-concurrency`` clients hit one fresh seat at the same
+  instant, ``--storm-rounds`` times; exactly one of them must win each round.
+* ``random``: ``--random-requests`` bookings of uniformly random seats; no
+  seat may have two winners and the seat map must show every win.
+* ``reviews``: one review per booked seat with a realistic spread of aspects
+  and text lengths.
+* ``scaling``: for each size in ``--sizes``, an event with that many seats and
+  ``--reviews-per-seat`` bulk-loaded reviews, then ``/seats`` (full and
+  revalidated), ``/analytics``, ``/analytics/timeseries`` and
+  ``/analytics/seats`` under ``--poll-concurrency``.
+
+Each result reports throughput, p50/p99 latency and the HTTP statuses seen;
+``--output`` saves them as JSON and ``--compare`` diffs a run against a saved
+one, exiting non-zero on a correctness failure or a regression beyond
+``--tolerance``.
+
+    python benchmarks/load_suite.py --output before.json
+    python benchmarks/load_suite.py --scenario storm --scenario random --compare before.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from aspects import ASPECTS  # noqa: E402
+
+SCENARIOS = ["storm", "random", "reviews", "scaling"]
+
+SEATS_PER_ROW = 50
+
+PHRASES = [
+    "great", "too loud", "ok", "the view was amazing", "seats were not comfortable",
+    "staff were friendly and helpful", "terrible booking experience", "very clean hall",
+    "overpriced for what you get", "sound was perfect", "could not see the stage at all",
+    "it was fine I guess", "never coming back, awful service", "wonderful evening with family",
+    "the seat was too high and cramped", "good value for money", "not bad", "really loved the show",
+]
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))]
+
+
+class Recorder:
+    """Latencies and statuses of one scenario's requests."""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self._started = time.perf_counter()
+
+    async def request(self, client, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.statuses[type(e).__name__] += 1
+            return None
+        self.latencies.append(time.perf_counter() - started)
+        self.statuses[str(response.status_code)] += 1
+        return response
+
+    def summary(self, **extra):
+        elapsed = time.perf_counter() - self._started
+        return {
+            **extra,
+            "requests": sum(self.statuses.values()),
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(self.latencies) / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": round(percentile(self.latencies, 0.50) * 1000, 3),
+                "p99": round(percentile(self.latencies, 0.99) * 1000, 3),
+                "max": round(max(self.latencies, default=0.0) * 1000, 3),
+            },
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+async def run_concurrently(count, concurrency, work):
+    """Run ``work(i)`` for i in range(count), at most ``concurrency`` at a time."""
+    queue = iter(range(count))
+
+    async def worker():
+        for i in queue:
+            await work(i)
+
+    await asyncio.gather(*(worker() for _ in range(min(count, concurrency))))
+
+
+def booking(i):
+    return {"user_id": i + 1, "user_name": f"bench{i + 1}"}
+
+
+def review_payload(rng, user_id):
+    """The overall experience plus a random subset of aspects, one to five phrases each."""
+    payload = {"user_id": user_id, "user_name": f"bench{user_id}"}
+    for aspect in ASPECTS:
+        if aspect.required or rng.random() < 0.4:
+            sentences = rng.choice([1, 1, 1, 2, 3, 5])
+            payload[aspect.field] = ". ".join(rng.choice(PHRASES) for _ in range(sentences))
+    return payload
+
+
+async def create_event(client, name, seats):
+    rows = max(1, math.ceil(seats / SEATS_PER_ROW))
+    venue = (await client.post("/venues", json={"name": "Benchmark hall"})).json()
+    response = await client.post("/events", json={
+        "venue_id": venue["id"], "name": name, "rows": rows, "seats_per_row": SEATS_PER_ROW,
+    })
+    response.raise_for_status()
+    event = response.json()
+    seats = (await client.get(f"/events/{event['id']}/seats")).json()["seats"]
+    return event["id"], [seat["id"] for seat in seats]
+
+
+async def storm(client, args, rng, state):
+    event_id, seat_ids = await create_event(client, "Benchmark storm", args.storm_rounds)
+    recorder = Recorder()
+    bad_rounds = 0
+
+    for seat_id in seat_ids[:args.storm_rounds]:
+        go = asyncio.Event()
+        outcomes = []
+
+        async def contender(i):
+            await go.wait()
+            response = await recorder.request(client, "POST", f"/events/{event_id}/book/{seat_id}", json=booking(i))
+            outcomes.append(response is not None and response.status_code == 200 and response.json()["status"] == "success")
+
+        tasks = [asyncio.create_task(contender(i)) for i in range(args.storm_concurrency)]
+        await asyncio.sleep(0)
+        go.set()
+        await asyncio.gather(*tasks)
+        if sum(outcomes) != 1:
+            bad_rounds += 1
+
+    return recorder.summary(
+        scenario="storm",
+        concurrency=args.storm_concurrency,
+        rounds=args.storm_rounds,
+        rounds_without_exactly_one_winner=bad_rounds,
+        correct=bad_rounds == 0,
+    )
+
+
+async def random_booking(client, args, rng, state):
+    event_id, seat_ids = await create_event(client, "Benchmark random", args.random_seats)
+    recorder = Recorder()
+    winners = Counter()
+
+    async def book(i):
+        seat_id = rng.choice(seat_ids)
+        response = await recorder.request(client, "POST", f"/events/{event_id}/book/{seat_id}", json=booking(i))
+        if response is not None and response.status_code == 200 and response.json()["status"] == "success":
+            winners[seat_id] += 1
+
+    await run_concurrently(args.random_requests, args.concurrency, book)
+    result = recorder.summary(scenario="random", seats=len(seat_ids), concurrency=args.concurrency)
+
+    booked = (await client.get(f"/events/{event_id}/seats")).json()["booked"]
+    double_booked = sum(1 for count in winners.values() if count > 1)
+    result.update(
+        wins=sum(winners.values()),
+        booked_in_seat_map=booked,
+        double_booked_seats=double_booked,
+        correct=double_booked == 0 and booked == sum(winners.values()),
+    )
+    state["booked"] = (event_id, sorted(winners))
+    return result
+
+
+async def reviews(client, args, rng, state):
+    # Reviews the seats the random scenario booked, if it ran.
+    event_id, seat_ids = state.get("booked", (None, []))
+    if not seat_ids:
+        event_id, seat_ids = await create_event(client, "Benchmark reviews", args.review_seats)
+        await run_concurrently(len(seat_ids), args.concurrency, lambda i: client.post(
+            f"/events/{event_id}/book/{seat_ids[i]}", json=booking(i)
+        ))
+
+    recorder = Recorder()
+    accepted = 0
+
+    async def submit(i):
+        nonlocal accepted
+        response = await recorder.request(
+            client, "POST", f"/events/{event_id}/review/{seat_ids[i]}", json=review_payload(rng, i + 1)
+        )
+        if response is not None and response.status_code in (200, 202):
+            accepted += 1
+
+    await run_concurrently(len(seat_ids), args.concurrency, submit)
+    mode = (await client.get("/stats")).json()["review_analysis"].get("mode", "background")
+    return recorder.summary(
+        scenario="reviews",
+        analysis_mode=mode,
+        concurrency=args.concurrency,
+        accepted=accepted,
+        correct=accepted == len(seat_ids),
+    )
+
+
+def bulk_reviews(rng, seat_ids, count):
+    lines = []
+    for i in range(count):
+        review = review_payload(rng, i + 1)
+        review["seat_id"] = rng.choice(seat_ids)
+        lines.append(json.dumps(review))
+    return "\n".join(lines) + "\n"
+
+
+async def poll(client, args, name, size, url, headers=None):
+    recorder = Recorder()
+    await run_concurrently(
+        args.poll_requests, args.poll_concurrency, lambda i: recorder.request(client, "GET", url, headers=headers)
+    )
+    return recorder.summary(scenario="scaling", endpoint=name, size=size, concurrency=args.poll_concurrency)
+
+
+async def scaling(client, args, rng, state):
+    results = []
+    for size in args.sizes:
+        event_id, seat_ids = await create_event(client, f"Benchmark {size} seats", size)
+        prefix = f"/events/{event_id}"
+
+        review_count = int(size * args.reviews_per_seat)
+        if review_count:
+            response = await client.post(
+                f"{prefix}/reviews/bulk?format=ndjson",
+                content=bulk_reviews(rng, seat_ids, review_count),
+                timeout=None,
+            )
+            loaded = response.json().get("inserted", 0)
+        else:
+            loaded = 0
+
+        etag = (await client.get(f"{prefix}/seats")).headers.get("etag")
+        for name, url, headers in [
+            ("/seats", f"{prefix}/seats", None),
+            ("/seats (If-None-Match)", f"{prefix}/seats", {"If-None-Match": etag}),
+            ("/analytics", f"{prefix}/analytics", None),
+            ("/analytics/timeseries", f"{prefix}/analytics/timeseries", None),
+            ("/analytics/seats", f"{prefix}/analytics/seats", None),
+        ]:
+            result = await poll(client, args, name, size, url, headers)
+            result["reviews"] = loaded
+            results.append(result)
+    return results
+
+
+RUNNERS = {"storm": storm, "random": random_booking, "reviews": reviews, "scaling": scaling}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def app_server(args):
+    if args.url:
+        yield args.url
+        return
+
+    if not os.environ.get("DATABASE_URL"):
+        sys.exit("DATABASE_URL is required unless --url is given")
+
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"{url}/stats").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if proc.poll() is not None or time.monotonic() > deadline:
+                sys.exit("The app did not start")
+            time.sleep(0.2)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def result_key(result):
+    return (result["scenario"], result.get("endpoint"), result.get("size"))
+
+
+def compare(results, baseline_path, tolerance):
+    """Print throughput/p99 changes against a saved run; returns how many regressed beyond ``tolerance``."""
+    with open(baseline_path) as f:
+        baseline = {result_key(result): result for result in json.load(f)["results"]}
+
+    regressions = 0
+    for result in results:
+        before = baseline.get(result_key(result))
+        if before is None:
+            continue
+        throughput = result["requests_per_second"] / before["requests_per_second"] - 1 if before["requests_per_second"] else 0.0
+        p99 = result["latency_ms"]["p99"] / before["latency_ms"]["p99"] - 1 if before["latency_ms"]["p99"] else 0.0
+        regressed = throughput < -tolerance or p99 > tolerance
+        regressions += regressed
+        print(
+            f"{' '.join(str(part) for part in result_key(result) if part is not None):<40} "
+            f"throughput {throughput:+7.1%}  p99 {p99:+7.1%}" + ("  REGRESSION" if regressed else "")
+        )
+    return regressions
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    results, state = [], {}
+    with app_server(args) as url:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+            for name in args.scenario or SCENARIOS:
+                outcome = await RUNNERS[name](client, args, rng, state)
+                results.extend(outcome if isinstance(outcome, list) else [outcome])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="benchmark a running app instead of starting one")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append")
+    parser.add_argument("--concurrency", type=int, default=50, help="clients for the random and review scenarios")
+    parser.add_argument("--storm-concurrency", type=int, default=500)
+    parser.add_argument("--storm-rounds", type=int, default=10)
+    parser.add_argument("--random-seats", type=int, default=5000)
+    parser.add_argument("--random-requests", type=int, default=5000)
+    parser.add_argument("--review-seats", type=int, default=500, help="seats to book and review when run without 'random'")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[1000, 10000, 50000])
+    parser.add_argument("--reviews-per-seat", type=float, default=0.1)
+    parser.add_argument("--poll-requests", type=int, default=500)
+    parser.add_argument("--poll-concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="a previous --output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative throughput/p99 change")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    for result in results:
+        label = " ".join(str(part) for part in result_key(result) if part is not None)
+        print(
+            f"{label:<40} {result['requests_per_second']:>9} req/s  "
+            f"p50 {result['latency_ms']['p50']:>9} ms  p99 {result['latency_ms']['p99']:>9} ms  "
+            f"{result['statuses']}" + ("" if result.get("correct", True) else "  INCORRECT")
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "load_suite", "args": vars(args), "results": results}, f, indent=2)
+
+    failed = sum(not result.get("correct", True) for result in results)
+    if args.compare:
+        failed += compare(results, args.compare, args.tolerance)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Texts/second per sentiment backend, scoring in batches.
+
+Generates short, review-like texts (a few words up to a few sentences), scores
+them with every backend in ``sentiment.BACKENDS`` and reports throughput plus
+how often each backend's label agrees with TextBlob's.
+
+    python benchmarks/sentiment_backends.py --texts 20000 --batch-size 500
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sentiment import BACKENDS, SentimentEngine, create_backend  # noqa: E402
+
+PHRASES = [
+    "great", "too loud", "ok", "the view was amazing", "seats were not comfortable",
+    "staff were friendly and helpful", "terrible booking experience", "very clean hall",
+    "overpriced for what you get", "sound was perfect", "could not see the stage at all",
+    "it was fine I guess", "never coming back, awful service", "wonderful evening with family",
+    "the seat was too high and cramped", "good value for money", "not bad", "really loved the show",
+]
+
+
+def make_texts(count, seed):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        sentences = rng.choice([1, 1, 1, 2, 3, 5])
+        texts.append(". ".join(rng.choice(PHRASES) for _ in range(sentences)))
+    return texts
+
+
+def run_backend(name, texts, batch_size):
+    engine = SentimentEngine(create_backend(name))
+    engine.score(texts[:batch_size])
+
+    started = time.perf_counter()
+    results = []
+    for start in range(0, len(texts), batch_size):
+        results.extend(engine.score(texts[start:start + batch_size]))
+    elapsed = time.perf_counter() - started
+
+    return results, {
+        "backend": name,
+        "version": engine.backend.version,
+        "texts": len(texts),
+        "batch_size": batch_size,
+        "seconds": round(elapsed, 4),
+        "texts_per_second": round(len(texts) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), action="append")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.seed)
+    names = args.backend or sorted(BACKENDS)
+
+    labels, results = {}, []
+    for name in names:
+        scored, result = run_backend(name, texts, args.batch_size)
+        labels[name] = [label for _, label in scored]
+        results.append(result)
+
+    for result in results:
+        if "textblob" in labels and result["backend"] != "textblob":
+            same = sum(a == b for a, b in zip(labels[result["backend"]], labels["textblob"]))
+            result["label_agreement_with_textblob"] = round(same / len(texts), 4)
+
+        print(
+            f"{result['backend']:>9}: {result['texts_per_second']:>10} texts/s "
+            f"({result['texts']} texts in {result['seconds']} s)"
+            + (f"  agreement {result['label_agreement_with_textblob']:.1%}" if "label_agreement_with_textblob" in result else "")
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "sentiment_backends", "args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
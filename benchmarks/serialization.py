@@ -0,0 +1,135 @@
+"""Milliseconds to serialize 10k listing rows: FastAPI's default path vs orjson.
+
+Builds seat rows shaped like the ``/seats`` cache and review rows shaped like
+``/reviews`` (with the aspects object), then times, per 10k rows:
+
+* ``jsonable_encoder``: what FastAPI does with a returned dict, followed by
+  Starlette's ``JSONResponse`` rendering;
+* ``orjson``: ``responses.dumps_bytes``, what the listing endpoints now use;
+* ``gzip``/``br``: compressing that body, with the compressed size.
+
+No database is needed.
+
+    python benchmarks/serialization.py --rows 10000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aspects import ASPECT_NAMES  # noqa: E402
+from responses import BROTLI_AVAILABLE, ORJSON_AVAILABLE, ENCODINGS, compress, dumps_bytes  # noqa: E402
+
+PHRASES = ["great", "too loud", "the view was amazing", "seats were not comfortable", "good value for money"]
+
+
+def seat_rows(count, rng):
+    started = datetime(2026, 1, 1)
+    rows = []
+    for i in range(count):
+        booked = rng.random() < 0.6
+        rows.append({
+            "id": i + 1,
+            "seat_number": f"{chr(65 + i // 1000 % 26)}{i % 1000 + 1}",
+            "status": "booked" if booked else "available",
+            "user_id": rng.randrange(1, 100000) if booked else None,
+            "user_name": f"user{i}" if booked else None,
+            "booked_at": started + timedelta(seconds=i, microseconds=rng.randrange(1000000)) if booked else None,
+        })
+    return {"total_seats": count, "available": 0, "held": 0, "booked": 0, "seats": rows}
+
+
+def review_rows(count, rng):
+    started = datetime(2026, 1, 1)
+    rows = []
+    for i in range(count):
+        aspects = {
+            aspect: {"text": ". ".join(rng.choice(PHRASES) for _ in range(rng.randint(1, 3))), "score": rng.uniform(-1, 1), "label": "positive"}
+            for aspect in ASPECT_NAMES if aspect == ASPECT_NAMES[0] or rng.random() < 0.4
+        }
+        created = started + timedelta(seconds=i, microseconds=rng.randrange(1000000))
+        rows.append({
+            "review_id": i + 1, "seat_id": rng.randrange(1, 10000), "seat_number": f"B{i % 500}",
+            "user_id": i, "user_name": f"user{i}", "aspects": aspects,
+            "average_score": rng.uniform(-1, 1), "overall_rating": "good", "analysis_status": "complete",
+            "analyzed_at": created, "created_at": created,
+        })
+    return {"count": count, "limit": count, "next_cursor": None, "reviews": rows}
+
+
+def fastapi_default(payload):
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def run_shape(name, payload, rows, repeat):
+    per_10k = 10000 / rows
+    default_seconds, default_body = best_of(repeat, fastapi_default, payload)
+    orjson_seconds, body = best_of(repeat, dumps_bytes, payload)
+    if json.loads(default_body) != json.loads(body):
+        raise SystemExit(f"{name}: orjson output differs from the default path")
+
+    result = {
+        "shape": name,
+        "rows": rows,
+        "bytes": len(body),
+        "jsonable_encoder_ms_per_10k": round(default_seconds * 1000 * per_10k, 2),
+        "orjson_ms_per_10k": round(orjson_seconds * 1000 * per_10k, 2),
+        "speedup": round(default_seconds / orjson_seconds, 1),
+    }
+    for encoding in ENCODINGS:
+        seconds, compressed = best_of(repeat, compress, body, encoding)
+        result[f"{encoding}_ms_per_10k"] = round(seconds * 1000 * per_10k, 2)
+        result[f"{encoding}_bytes"] = len(compressed)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5, help="best of this many runs")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = [
+        run_shape("seats", seat_rows(args.rows, rng), args.rows, args.repeat),
+        run_shape("reviews", review_rows(args.rows, rng), args.rows, args.repeat),
+    ]
+
+    for result in results:
+        print(
+            f"{result['shape']:>8}: jsonable_encoder {result['jsonable_encoder_ms_per_10k']:>8} ms/10k  "
+            f"orjson {result['orjson_ms_per_10k']:>7} ms/10k  ({result['speedup']}x, {result['bytes']} bytes)  "
+            + "  ".join(f"{e} {result[f'{e}_ms_per_10k']} ms/10k -> {result[f'{e}_bytes']} bytes" for e in ENCODINGS)
+        )
+    if not ORJSON_AVAILABLE:
+        print("orjson is not installed; the 'orjson' column is the stdlib fallback")
+    if not BROTLI_AVAILABLE:
+        print("brotli is not installed; only gzip was measured")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "serialization", "args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,642 @@
+import asyncio
+import io
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+
+import anyio
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+
+from metrics import observe_phase, record_query
+
+logger = logging.getLogger(__name__)
+
+LISTEN_RETRY_DELAY = 1.0
+
+# The TIMESTAMP columns hold naive UTC. Aware parameters and CURRENT_TIMESTAMP
+# defaults are converted to the session TimeZone, so every pool connection
+# pins it rather than inheriting the server's or the client's (PGTZ).
+SESSION_SETUP_SQL = "SET TIME ZONE 'UTC';"
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class DatabasePool:
+    """Bounded, thread-safe psycopg2 connection pool.
+
+    Connections are opened lazily up to ``max_size`` and callers block for at
+    most ``timeout`` seconds when every connection is in use. Connections that
+    sat idle longer than ``health_check_interval`` are pinged before reuse.
+    """
+
+    def __init__(self, dsn, min_size=2, max_size=10, timeout=5.0, health_check_interval=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: need 0 <= min_size <= max_size and max_size >= 1")
+
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._acquired = 0
+        self._timeouts = 0
+        self._replaced = 0
+        self._acquire_total = 0.0
+        self._acquire_max = 0.0
+        self._acquire_samples = deque(maxlen=1024)
+
+    def open(self):
+        for _ in range(self.min_size):
+            conn = self._connect()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for conn, _ in idle:
+            conn.close()
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(SESSION_SETUP_SQL)
+            conn.commit()
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+
+                    if self._idle:
+                        conn, idle_since = self._idle.pop()
+                        break
+
+                    if self._size < self.max_size:
+                        self._size += 1
+                        conn, idle_since = None, None
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"Timed out after {timeout}s waiting for a database connection")
+
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        try:
+            if conn is not None and not self._is_healthy(conn, idle_since):
+                conn.close()
+                conn = None
+                with self._cond:
+                    self._replaced += 1
+
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._in_use += 1
+            self._acquired += 1
+            self._acquire_total += elapsed
+            self._acquire_max = max(self._acquire_max, elapsed)
+            self._acquire_samples.append(elapsed)
+
+        return conn
+
+    def release(self, conn):
+        discard = conn.closed or self._closed
+
+        if not discard and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        if discard and not conn.closed:
+            conn.close()
+
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._cond:
+            samples = sorted(self._acquire_samples)
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "acquired_total": self._acquired,
+                "timeouts_total": self._timeouts,
+                "replaced_unhealthy": self._replaced,
+                "acquire_latency_ms": {
+                    "avg": round(self._acquire_total / self._acquired * 1000, 3) if self._acquired else 0.0,
+                    "p50": round(_percentile(samples, 0.50) * 1000, 3),
+                    "p99": round(_percentile(samples, 0.99) * 1000, 3),
+                    "max": round(self._acquire_max * 1000, 3),
+                },
+            }
+
+
+def naive_utc(value):
+    """``value`` as the naive UTC datetime the TIMESTAMP columns hold.
+
+    Bound parameters need no help: they go over as timestamptz and land in
+    the session TimeZone, which the pools pin to UTC. A literal typed as
+    TIMESTAMP, as in COPY's text format, has its offset ignored instead, so
+    aware datetimes are converted here; naive ones are taken to be UTC
+    already.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    if isinstance(value, datetime):
+        return naive_utc(value).isoformat(sep=" ")
+    return str(value)
+
+
+def _copy_text(records):
+    """Encode records in COPY's default text format."""
+    return "".join("\t".join(_copy_value(value) for value in record) + "\n" for record in records)
+
+
+def _copy_sql(table, columns):
+    return f"COPY {table} ({', '.join(columns)}) FROM STDIN;"
+
+
+class SyncTransaction:
+    """Runs blocking psycopg2 calls for one transaction on the worker threadpool."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _run(self, sql, params, fetch):
+        started = time.perf_counter()
+        try:
+            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(sql, params)
+                if fetch == "all":
+                    return [dict(row) for row in cur.fetchall()]
+                if fetch == "one":
+                    row = cur.fetchone()
+                    return dict(row) if row is not None else None
+                return cur.rowcount
+        finally:
+            record_query(time.perf_counter() - started)
+
+    async def fetch(self, sql, params=None):
+        return await anyio.to_thread.run_sync(self._run, sql, params, "all")
+
+    async def fetchrow(self, sql, params=None):
+        return await anyio.to_thread.run_sync(self._run, sql, params, "one")
+
+    async def fetchval(self, sql, params=None):
+        row = await self.fetchrow(sql, params)
+        return next(iter(row.values())) if row else None
+
+    async def execute(self, sql, params=None):
+        return await anyio.to_thread.run_sync(self._run, sql, params, None)
+
+    async def executemany(self, sql, params_seq):
+        def run():
+            with self.conn.cursor() as cur:
+                cur.executemany(sql, params_seq)
+
+        started = time.perf_counter()
+        try:
+            await anyio.to_thread.run_sync(run)
+        finally:
+            record_query(time.perf_counter() - started)
+
+    async def copy_records(self, table, columns, records):
+        def run():
+            with self.conn.cursor() as cur:
+                cur.copy_expert(_copy_sql(table, columns), io.StringIO(_copy_text(records)))
+
+        started = time.perf_counter()
+        try:
+            await anyio.to_thread.run_sync(run)
+        finally:
+            record_query(time.perf_counter() - started)
+
+
+class AsyncTransaction:
+    """Same interface as SyncTransaction on top of a psycopg 3 async connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def _cursor(self):
+        started = time.perf_counter()
+        try:
+            async with self.conn.cursor() as cur:
+                yield cur
+        finally:
+            record_query(time.perf_counter() - started)
+
+    async def fetch(self, sql, params=None):
+        async with self._cursor() as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchall()
+
+    async def fetchrow(self, sql, params=None):
+        async with self._cursor() as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchone()
+
+    async def fetchval(self, sql, params=None):
+        row = await self.fetchrow(sql, params)
+        return next(iter(row.values())) if row else None
+
+    async def execute(self, sql, params=None):
+        async with self._cursor() as cur:
+            await cur.execute(sql, params)
+            return cur.rowcount
+
+    async def executemany(self, sql, params_seq):
+        async with self._cursor() as cur:
+            await cur.executemany(sql, params_seq)
+
+    async def copy_records(self, table, columns, records):
+        async with self._cursor() as cur:
+            async with cur.copy(_copy_sql(table, columns)) as copy:
+                await copy.write(_copy_text(records))
+
+
+class Database:
+    """Async facade shared by the request handlers regardless of driver.
+
+    ``transaction()`` yields an object with ``fetch``/``fetchrow``/``fetchval``/
+    ``execute``/``executemany``/``copy_records``; it commits when the block exits normally and
+    rolls back when it raises. Queries use psycopg's ``%s`` placeholders and
+    rows come back as dicts for both backends.
+
+    ``stream()`` yields the rows of a large query through a server-side
+    cursor, holding only ``batch_size`` rows at a time; it keeps its pool
+    connection until the generator is exhausted or closed.
+    """
+
+    backend = None
+
+    async def fetch(self, sql, params=None):
+        async with self.transaction() as tx:
+            return await tx.fetch(sql, params)
+
+    async def fetchrow(self, sql, params=None):
+        async with self.transaction() as tx:
+            return await tx.fetchrow(sql, params)
+
+    async def fetchval(self, sql, params=None):
+        async with self.transaction() as tx:
+            return await tx.fetchval(sql, params)
+
+    async def execute(self, sql, params=None):
+        async with self.transaction() as tx:
+            return await tx.execute(sql, params)
+
+    async def listen(self, channel, handler):
+        """LISTEN on ``channel`` over a dedicated connection until cancelled.
+
+        ``handler`` is called with each payload on the event loop. If the
+        connection is lost it is re-established and ``handler(None)`` tells the
+        caller that notifications may have been missed in between.
+        """
+        connected_before = False
+        while True:
+            try:
+                await self._listen_once(channel, handler, connected_before)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("LISTEN %s connection lost; reconnecting", channel)
+            connected_before = True
+            await asyncio.sleep(LISTEN_RETRY_DELAY)
+
+
+class SyncDatabase(Database):
+    backend = "sync"
+
+    def __init__(self, dsn, min_size=2, max_size=10, timeout=5.0, health_check_interval=30.0):
+        self.pool = DatabasePool(
+            dsn,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            health_check_interval=health_check_interval,
+        )
+        # Callers queue for a connection here, on the event loop, and only
+        # call the blocking pool.acquire once one is theirs. A caller parked
+        # in pool.acquire would hold one of anyio's worker threads, which the
+        # transactions that already have a connection need to finish.
+        self._slots = asyncio.Semaphore(max_size)
+        self._queued = 0
+        self._timeouts = 0
+
+    async def open(self):
+        await anyio.to_thread.run_sync(self.pool.open)
+
+    async def close(self):
+        await anyio.to_thread.run_sync(self.pool.close)
+
+    async def _acquire(self):
+        started = time.perf_counter()
+        try:
+            self._queued += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.pool.timeout)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise PoolTimeout(f"Timed out after {self.pool.timeout}s waiting for a database connection") from None
+            finally:
+                self._queued -= 1
+
+            try:
+                remaining = max(0.0, self.pool.timeout - (time.perf_counter() - started))
+                return await anyio.to_thread.run_sync(self.pool.acquire, remaining)
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            observe_phase("connection", time.perf_counter() - started)
+
+    async def _release(self, conn):
+        try:
+            await anyio.to_thread.run_sync(self.pool.release, conn)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def transaction(self):
+        conn = await self._acquire()
+        try:
+            yield SyncTransaction(conn)
+            await anyio.to_thread.run_sync(conn.commit)
+        except BaseException:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(conn.rollback)
+            raise
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self._release(conn)
+
+    async def stream(self, sql, params=None, batch_size=500):
+        conn = await self._acquire()
+        cur = conn.cursor(name="stream", cursor_factory=RealDictCursor)
+        try:
+            await anyio.to_thread.run_sync(cur.execute, sql, params)
+            while True:
+                rows = await anyio.to_thread.run_sync(cur.fetchmany, batch_size)
+                for row in rows:
+                    yield dict(row)
+                if len(rows) < batch_size:
+                    break
+        finally:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(cur.close)
+                await anyio.to_thread.run_sync(conn.rollback)
+                await self._release(conn)
+
+    async def _listen_once(self, channel, handler, reconnected):
+        conn = await anyio.to_thread.run_sync(psycopg2.connect, self.pool.dsn)
+        conn.autocommit = True
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {channel};")
+            if reconnected:
+                handler(None)
+
+            loop.add_reader(conn.fileno(), readable.set)
+            try:
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    conn.poll()
+                    while conn.notifies:
+                        handler(conn.notifies.pop(0).payload)
+            finally:
+                loop.remove_reader(conn.fileno())
+        finally:
+            conn.close()
+
+    def stats(self):
+        stats = self.pool.stats()
+        stats["waiting"] += self._queued
+        stats["timeouts_total"] += self._timeouts
+        return {"backend": self.backend, **stats}
+
+
+class AsyncDatabase(Database):
+    backend = "async"
+
+    def __init__(self, dsn, min_size=2, max_size=10, timeout=5.0, health_check_interval=30.0):
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool, PoolTimeout as DriverPoolTimeout
+
+        self._driver_timeout = DriverPoolTimeout
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._returned_at = weakref.WeakKeyDictionary()
+        self._acquired = 0
+        self._acquire_total = 0.0
+        self._acquire_max = 0.0
+        self._acquire_samples = deque(maxlen=1024)
+
+        self.pool = AsyncConnectionPool(
+            dsn,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            kwargs={"row_factory": dict_row},
+            configure=self._configure,
+            check=self._check,
+            reset=self._reset,
+            open=False,
+        )
+
+    async def _configure(self, conn):
+        await conn.execute(SESSION_SETUP_SQL)
+        await conn.commit()
+
+    async def _check(self, conn):
+        returned_at = self._returned_at.get(conn)
+        if returned_at is None or time.monotonic() - returned_at >= self.health_check_interval:
+            await self.pool.check_connection(conn)
+
+    async def _reset(self, conn):
+        self._returned_at[conn] = time.monotonic()
+
+    async def open(self):
+        await self.pool.open(wait=True, timeout=self.timeout)
+
+    async def close(self):
+        await self.pool.close()
+
+    @asynccontextmanager
+    async def _connection(self):
+        started = time.perf_counter()
+        try:
+            async with self.pool.connection() as conn:
+                elapsed = time.perf_counter() - started
+                observe_phase("connection", elapsed)
+                self._acquired += 1
+                self._acquire_total += elapsed
+                self._acquire_max = max(self._acquire_max, elapsed)
+                self._acquire_samples.append(elapsed)
+                yield conn
+        except self._driver_timeout as e:
+            raise PoolTimeout(str(e)) from e
+
+    @asynccontextmanager
+    async def transaction(self):
+        async with self._connection() as conn:
+            try:
+                yield AsyncTransaction(conn)
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+
+    async def stream(self, sql, params=None, batch_size=500):
+        async with self._connection() as conn:
+            try:
+                async with conn.cursor(name="stream") as cur:
+                    await cur.execute(sql, params)
+                    while True:
+                        rows = await cur.fetchmany(batch_size)
+                        for row in rows:
+                            yield row
+                        if len(rows) < batch_size:
+                            break
+            finally:
+                await conn.rollback()
+
+    async def _listen_once(self, channel, handler, reconnected):
+        import psycopg
+
+        async with await psycopg.AsyncConnection.connect(self.pool.conninfo, autocommit=True) as conn:
+            await conn.execute(f"LISTEN {channel};")
+            if reconnected:
+                handler(None)
+
+            async for notify in conn.notifies():
+                handler(notify.payload)
+
+    def stats(self):
+        driver = self.pool.get_stats()
+        samples = sorted(self._acquire_samples)
+        return {
+            "backend": self.backend,
+            "min_size": self.pool.min_size,
+            "max_size": self.pool.max_size,
+            "size": driver.get("pool_size", 0),
+            "idle": driver.get("pool_available", 0),
+            "in_use": driver.get("pool_size", 0) - driver.get("pool_available", 0),
+            "waiting": driver.get("requests_waiting", 0),
+            "acquired_total": self._acquired,
+            "timeouts_total": driver.get("requests_errors", 0),
+            "replaced_unhealthy": driver.get("connections_lost", 0),
+            "acquire_latency_ms": {
+                "avg": round(self._acquire_total / self._acquired * 1000, 3) if self._acquired else 0.0,
+                "p50": round(_percentile(samples, 0.50) * 1000, 3),
+                "p99": round(_percentile(samples, 0.99) * 1000, 3),
+                "max": round(self._acquire_max * 1000, 3),
+            },
+        }
+
+
+def create_database(backend, dsn, **pool_options):
+    if backend == "sync":
+        return SyncDatabase(dsn, **pool_options)
+    if backend == "async":
+        return AsyncDatabase(dsn, **pool_options)
+    raise ValueError(f"Unknown DB_BACKEND {backend!r}; expected 'sync' or 'async'")
+
+
+def _percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
@@ -0,0 +1,122 @@
+import time
+
+# The show that existed before events did; migration 7 turns the original
+# seats into its inventory, and the unprefixed routes still address it.
+DEFAULT_EVENT_ID = 1
+
+# Rows are labelled A-Z, then AA-ZZ.
+MAX_SEAT_ROWS = 26 * 27
+
+VENUES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS venues (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+EVENTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS events (
+        id SERIAL PRIMARY KEY,
+        venue_id INTEGER NOT NULL REFERENCES venues(id),
+        name VARCHAR(200) NOT NULL,
+        starts_at TIMESTAMP,
+        seat_count INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+# ``seats`` is list-partitioned by event_id, one partition per event, so a
+# hot on-sale only ever touches its own table and indexes. Every statement
+# must filter on event_id for the planner to prune to that partition.
+SEATS_TABLE_SQL = """
+    CREATE TABLE seats (
+        id INTEGER NOT NULL DEFAULT nextval('seats_id_seq'),
+        event_id INTEGER NOT NULL REFERENCES events(id),
+        seat_number VARCHAR(10) NOT NULL,
+        status VARCHAR(20) DEFAULT 'available',
+        user_id INTEGER,
+        user_name VARCHAR(100),
+        booked_at TIMESTAMP,
+        version BIGINT NOT NULL DEFAULT nextval('seat_map_version_seq'),
+        PRIMARY KEY (event_id, id),
+        UNIQUE (event_id, seat_number)
+    ) PARTITION BY LIST (event_id);
+"""
+
+SEATS_INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS seats_version_idx ON seats (version);",
+    "CREATE INDEX IF NOT EXISTS seats_status_idx ON seats (status);",
+    "CREATE INDEX IF NOT EXISTS seats_available_idx ON seats (seat_number) WHERE status = 'available';",
+]
+
+_ROW_LABEL_SQL = "CASE WHEN r < 26 THEN chr(65 + r) ELSE chr(64 + r / 26) || chr(65 + mod(r, 26)) END"
+
+
+def seat_partition(event_id):
+    return f"seats_event_{int(event_id)}"
+
+
+def _seat_partition_sql(event_id):
+    """Build the event's partition on the side and attach it.
+
+    CREATE TABLE ... PARTITION OF would lock ``seats`` exclusively and stall
+    every other event's bookings until commit; ATTACH only takes a SHARE
+    UPDATE EXCLUSIVE lock, and the CHECK constraint spares it the validation
+    scan. The partition's indexes are built once, after the bulk insert.
+    """
+    partition = seat_partition(event_id)
+    return [
+        f"CREATE TABLE {partition} (LIKE seats INCLUDING DEFAULTS);",
+        f"""
+        INSERT INTO {partition} (event_id, seat_number)
+        SELECT %(event_id)s, {_ROW_LABEL_SQL} || n
+        FROM generate_series(0, %(rows)s - 1) AS r, generate_series(1, %(seats_per_row)s) AS n
+        ORDER BY r, n;
+        """,
+        f"ALTER TABLE {partition} ADD CONSTRAINT {partition}_event_check CHECK (event_id = {int(event_id)});",
+        f"ALTER TABLE seats ATTACH PARTITION {partition} FOR VALUES IN ({int(event_id)});",
+    ]
+
+
+async def create_venue(db, name):
+    return await db.fetchrow("INSERT INTO venues (name) VALUES (%s) RETURNING *;", (name,))
+
+
+async def create_event(db, venue_id, name, starts_at, rows, seats_per_row):
+    """Create an event and generate its ``rows`` x ``seats_per_row`` seat map; None if the venue does not exist."""
+    started = time.perf_counter()
+    async with db.transaction() as tx:
+        if await tx.fetchrow("SELECT id FROM venues WHERE id = %s;", (venue_id,)) is None:
+            return None
+
+        event = await tx.fetchrow("""
+            INSERT INTO events (venue_id, name, starts_at, seat_count)
+            VALUES (%s, %s, %s, %s)
+            RETURNING *;
+        """, (venue_id, name, starts_at, rows * seats_per_row))
+
+        params = {"event_id": event['id'], "rows": rows, "seats_per_row": seats_per_row}
+        for sql in _seat_partition_sql(event['id']):
+            await tx.execute(sql, params if "%(" in sql else None)
+
+    return {**event, "generation_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+
+async def get_event(db, event_id):
+    return await db.fetchrow("""
+        SELECT e.*, v.name AS venue_name
+        FROM events e
+        JOIN venues v ON v.id = e.venue_id
+        WHERE e.id = %s;
+    """, (event_id,))
+
+
+async def list_events(db, venue_id=None):
+    return await db.fetch("""
+        SELECT e.*, v.name AS venue_name
+        FROM events e
+        JOIN venues v ON v.id = e.venue_id
+        WHERE %(venue_id)s::int IS NULL OR e.venue_id = %(venue_id)s
+        ORDER BY e.starts_at NULLS LAST, e.id;
+    """, {"venue_id": venue_id})
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# The lease lives in its own table so the hold token never reaches the seat
+# rows that are broadcast to every stream subscriber; ``seats.status = 'held'``
+# is the publicly visible part.
+SEAT_HOLDS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS seat_holds (
+        seat_id INTEGER PRIMARY KEY REFERENCES seats(id),
+        hold_token UUID NOT NULL DEFAULT gen_random_uuid(),
+        user_id INTEGER NOT NULL,
+        user_name VARCHAR(100),
+        created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+        expires_at TIMESTAMP NOT NULL
+    );
+"""
+
+# Migration 7 adds event_id and points the seat reference at (event_id, seat_id).
+
+# The sweeper only ever reads the oldest expiries.
+SEAT_HOLDS_EXPIRY_INDEX_SQL = "CREATE INDEX IF NOT EXISTS seat_holds_expires_at_idx ON seat_holds (expires_at);"
+
+# Same single-statement claim as CLAIM_SEAT_SQL in main.py, but the seat
+# becomes 'held' and a lease row records who holds it until when.
+HOLD_SEAT_SQL = """
+    WITH candidate AS (
+        SELECT id FROM seats
+        WHERE event_id = %(event_id)s AND id = %(seat_id)s AND status = 'available'
+        FOR UPDATE SKIP LOCKED
+    ), held AS (
+        UPDATE seats
+        SET status = 'held',
+            version = nextval('seat_map_version_seq')
+        FROM candidate
+        WHERE seats.event_id = %(event_id)s AND seats.id = candidate.id
+        RETURNING seats.*
+    ), lease AS (
+        INSERT INTO seat_holds (event_id, seat_id, user_id, user_name, expires_at)
+        SELECT event_id, id, %(user_id)s, %(user_name)s, LOCALTIMESTAMP + make_interval(secs => %(hold_seconds)s)
+        FROM held
+        RETURNING hold_token, expires_at
+    )
+    SELECT
+        held.*,
+        lease.hold_token,
+        lease.expires_at,
+        EXISTS (SELECT 1 FROM seats WHERE event_id = %(event_id)s AND id = %(seat_id)s) AS seat_exists,
+        EXISTS (
+            SELECT 1 FROM seats WHERE event_id = %(event_id)s AND id = %(seat_id)s AND status = 'available'
+        ) AS seat_available
+    FROM (SELECT 1) AS one
+    LEFT JOIN held ON true
+    LEFT JOIN lease ON true;
+"""
+
+# Consumes an unexpired lease and books the seat for its holder. A lease
+# that has expired but not been swept yet cannot be confirmed.
+CONFIRM_HOLD_SQL = """
+    WITH lease AS (
+        DELETE FROM seat_holds
+        WHERE event_id = %(event_id)s
+          AND seat_id = %(seat_id)s
+          AND hold_token = %(hold_token)s::uuid
+          AND expires_at > LOCALTIMESTAMP
+        RETURNING event_id, seat_id, user_id, user_name
+    ), confirmed AS (
+        UPDATE seats
+        SET status = 'booked',
+            user_id = lease.user_id,
+            user_name = lease.user_name,
+            booked_at = %(booked_at)s,
+            version = nextval('seat_map_version_seq')
+        FROM lease
+        WHERE seats.event_id = %(event_id)s AND seats.id = lease.seat_id
+        RETURNING seats.*
+    )
+    SELECT
+        confirmed.*,
+        EXISTS (SELECT 1 FROM seats WHERE event_id = %(event_id)s AND id = %(seat_id)s) AS seat_exists
+    FROM (SELECT 1) AS one
+    LEFT JOIN confirmed ON true;
+"""
+
+# Releases up to one batch of the oldest expired leases. SKIP LOCKED lets the
+# sweepers of several workers share the backlog, and a lease being confirmed
+# right now is simply left to the confirmation.
+SWEEP_EXPIRED_HOLDS_SQL = """
+    WITH expired AS (
+        SELECT seat_id FROM seat_holds
+        WHERE expires_at <= LOCALTIMESTAMP
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ), released AS (
+        DELETE FROM seat_holds
+        USING expired
+        WHERE seat_holds.seat_id = expired.seat_id
+        RETURNING seat_holds.event_id, seat_holds.seat_id, seat_holds.expires_at
+    )
+    UPDATE seats
+    SET status = 'available',
+        version = nextval('seat_map_version_seq')
+    FROM released
+    WHERE seats.event_id = released.event_id AND seats.id = released.seat_id AND seats.status = 'held'
+    RETURNING seats.*, EXTRACT(EPOCH FROM clock_timestamp()::timestamp - released.expires_at) AS release_lag;
+"""
+
+
+class SeatHolds:
+    """Short seat leases for checkout, and the sweeper that reclaims expired ones.
+
+    ``hold`` flips an available seat to ``held`` for a few seconds and hands
+    out a token; ``confirm`` turns an unexpired hold into a booking. Nothing
+    on the request path checks for expiry: every ``sweep_interval`` seconds
+    the sweeper releases the expired leases in batches of ``batch_size``,
+    oldest first, via the ``expires_at`` index, and passes the released seat
+    rows to ``on_release``.
+    """
+
+    def __init__(self, db, sweep_interval=1.0, batch_size=500, on_release=None):
+        self.db = db
+        self.sweep_interval = sweep_interval
+        self.batch_size = batch_size
+        self.on_release = on_release
+
+        self._sweeper = None
+        self._started = time.monotonic()
+
+        self.requested = 0
+        self.granted = 0
+        self.confirmed = 0
+        self.confirm_failures = 0
+        self.expired = 0
+        self.sweeps = 0
+        self.sweep_errors = 0
+        self._sweep_total = 0.0
+        self._sweep_max = 0.0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+
+    async def hold(self, event_id, seat_id, user_id, user_name, hold_seconds):
+        """The held seat row plus ``hold_token``/``expires_at``; ``seat_number`` is None if it was not available."""
+        row = await self.db.fetchrow(HOLD_SEAT_SQL, {
+            "event_id": event_id,
+            "seat_id": seat_id,
+            "user_id": user_id,
+            "user_name": user_name,
+            "hold_seconds": hold_seconds,
+        })
+        self.requested += 1
+        if row['seat_number'] is not None:
+            self.granted += 1
+        return row
+
+    async def confirm(self, event_id, seat_id, hold_token, booked_at):
+        """The booked seat row; ``seat_number`` is None if the hold is unknown, expired or already used."""
+        row = await self.db.fetchrow(CONFIRM_HOLD_SQL, {
+            "event_id": event_id,
+            "seat_id": seat_id,
+            "hold_token": str(hold_token),
+            "booked_at": booked_at,
+        })
+        if row['seat_number'] is not None:
+            self.confirmed += 1
+        else:
+            self.confirm_failures += 1
+        return row
+
+    def start(self):
+        self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Sweeping expired seat holds failed")
+                self.sweep_errors += 1
+
+    async def sweep(self):
+        """Release every lease that has expired by now; returns how many seats were released."""
+        started = time.perf_counter()
+        released = 0
+        while True:
+            rows = [dict(row) for row in await self.db.fetch(SWEEP_EXPIRED_HOLDS_SQL, (self.batch_size,))]
+            for row in rows:
+                lag = float(row.pop('release_lag'))
+                self._lag_total += lag
+                self._lag_max = max(self._lag_max, lag)
+
+            released += len(rows)
+            if rows and self.on_release is not None:
+                self.on_release(rows)
+            if len(rows) < self.batch_size:
+                break
+
+        elapsed = time.perf_counter() - started
+        self.sweeps += 1
+        self.expired += released
+        self._sweep_total += elapsed
+        self._sweep_max = max(self._sweep_max, elapsed)
+        return released
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self):
+        uptime = time.monotonic() - self._started
+        return {
+            "requested": self.requested,
+            "granted": self.granted,
+            "confirmed": self.confirmed,
+            "confirm_failures": self.confirm_failures,
+            "expired": self.expired,
+            "grant_rate": round(self.granted / self.requested, 4) if self.requested else 0.0,
+            "confirm_rate": round(self.confirmed / self.granted, 4) if self.granted else 0.0,
+            "holds_per_second": round(self.granted / uptime, 3) if uptime else 0.0,
+            "sweep_interval_seconds": self.sweep_interval,
+            "sweeps": self.sweeps,
+            "sweep_errors": self.sweep_errors,
+            "avg_sweep_ms": round(self._sweep_total / self.sweeps * 1000, 3) if self.sweeps else 0.0,
+            "max_sweep_ms": round(self._sweep_max * 1000, 3),
+            "avg_release_lag_ms": round(self._lag_total / self.expired * 1000, 3) if self.expired else 0.0,
+            "max_release_lag_ms": round(self._lag_max * 1000, 3),
+        }
@@ -0,0 +1,251 @@
+"""Bulk review ingestion: NDJSON or CSV in, COPY into Postgres in chunks.
+
+Each row is a ``ReviewRequest`` plus ``seat_id`` and an optional historical
+``created_at``; a load goes into one event. Rows are validated one by one; invalid rows are reported by
+line number and skipped. Valid rows are scored with one sentiment engine call
+per chunk and loaded with two COPYs (reviews, then review_aspects) in one
+transaction per chunk, so a failing chunk does not abort the rest of the
+load.
+
+    python ingest.py reviews.ndjson
+    python ingest.py partner_export.csv --event 42 --format csv --chunk-size 2000
+"""
+
+import csv
+import itertools
+import json
+import time
+from datetime import datetime
+from typing import Optional
+
+import anyio
+from pydantic import ValidationError
+
+from aspects import ASPECT_NAMES, ReviewRequest, aspect_texts
+from events import DEFAULT_EVENT_ID
+from metrics import span
+from sentiment import score_review_batch
+
+FORMATS = ("ndjson", "csv")
+
+REVIEW_COPY_COLUMNS = (
+    "review_id", "event_id", "seat_id", "user_id", "user_name",
+    "average_score", "overall_rating", "analysis_status", "analyzed_at", "created_at",
+)
+ASPECT_COPY_COLUMNS = ("review_id", "aspect", "text", "score", "label")
+
+
+class IngestedReview(ReviewRequest):
+    seat_id: int
+    created_at: Optional[datetime] = None
+
+
+def _ndjson_records(lines):
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def _csv_records(lines):
+    reader = csv.DictReader(lines)
+    for record in reader:
+        # Empty cells are missing optional aspects, not empty reviews.
+        yield reader.line_num, {key: value for key, value in record.items() if key and value != ""}, None
+
+
+def read_reviews(lines, format="ndjson"):
+    """Yield ``(line_number, IngestedReview or None, error or None)`` for each input row."""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}; expected one of {FORMATS}")
+
+    undecodable = lines.undecodable if isinstance(lines, DecodedLines) else {}
+    records = _ndjson_records(lines) if format == "ndjson" else _csv_records(lines)
+    previous = 0
+    for line_number, record, error in records:
+        # A CSV record may span several physical lines.
+        first, previous = previous + 1, line_number
+        bad = [undecodable.pop(n) for n in range(first, line_number + 1) if n in undecodable]
+        if bad:
+            error = bad[0]
+        if error is not None:
+            yield line_number, None, error
+            continue
+        try:
+            yield line_number, IngestedReview.model_validate(record), None
+        except ValidationError as e:
+            yield line_number, None, "; ".join(
+                f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
+            )
+
+
+class IngestReport:
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors = []
+        self._started = time.perf_counter()
+
+    def error(self, line_number, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line_number, "error": message})
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self._started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.inserted / elapsed, 1) if elapsed else 0.0,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def _load_chunk(db, event_id, chunk, report):
+    seat_ids = list({review.seat_id for _, review in chunk})
+    known = {
+        row['id']
+        for row in await db.fetch("SELECT id FROM seats WHERE event_id = %s AND id = ANY(%s);", (event_id, seat_ids))
+    }
+
+    valid = []
+    for line_number, review in chunk:
+        if review.seat_id in known:
+            valid.append((line_number, review))
+        else:
+            report.error(line_number, f"Seat {review.seat_id} not found")
+    if not valid:
+        return
+
+    texts = [aspect_texts(review) for _, review in valid]
+    with span("sentiment"):
+        scored = await anyio.to_thread.run_sync(score_review_batch, texts)
+
+    try:
+        async with db.transaction() as tx:
+            allocated = await tx.fetch("""
+                SELECT nextval(pg_get_serial_sequence('reviews', 'review_id')) AS review_id,
+                       LOCALTIMESTAMP AS now
+                FROM generate_series(1, %s);
+            """, (len(valid),))
+
+            reviews, aspects = [], []
+            for (_, review), review_texts, (results, avg_score, overall_rating), row in zip(valid, texts, scored, allocated):
+                reviews.append((
+                    row['review_id'], event_id, review.seat_id, review.user_id, review.user_name,
+                    avg_score, overall_rating, "complete", row['now'], review.created_at or row['now'],
+                ))
+                for aspect, text, (score, label) in zip(ASPECT_NAMES, review_texts, results):
+                    if text is not None:
+                        aspects.append((row['review_id'], aspect, text, score, label))
+
+            await tx.copy_records("reviews", REVIEW_COPY_COLUMNS, reviews)
+            await tx.copy_records("review_aspects", ASPECT_COPY_COLUMNS, aspects)
+    except Exception as e:
+        first, last = valid[0][0], valid[-1][0]
+        for line_number, _ in valid:
+            report.error(line_number, f"Chunk of lines {first}-{last} failed: {e}")
+        return
+
+    report.inserted += len(valid)
+
+
+async def ingest_reviews(db, event_id, lines, format="ndjson", chunk_size=1000, max_errors=1000):
+    """Validate, score and COPY reviews of one event from an iterable of text lines; returns the load report.
+
+    ``lines`` is consumed on a worker thread, so it may be a blocking file.
+    """
+    report = IngestReport(max_errors)
+    rows = read_reviews(lines, format)
+
+    while True:
+        batch = await anyio.to_thread.run_sync(lambda: list(itertools.islice(rows, chunk_size)))
+        if not batch:
+            break
+
+        report.rows += len(batch)
+        chunk = []
+        for line_number, review, error in batch:
+            if error is not None:
+                report.error(line_number, error)
+            else:
+                chunk.append((line_number, review))
+
+        if chunk:
+            await _load_chunk(db, event_id, chunk, report)
+        report.chunks += 1
+
+    return report.as_dict()
+
+
+class DecodedLines:
+    """The lines of a binary file, each decoded from UTF-8 on its own.
+
+    A line that does not decode is passed on with replacement characters and
+    its error kept in ``undecodable`` by line number, for ``read_reviews`` to
+    report as that row's error instead of aborting the load. Lines are split
+    at newline bytes only, so quoted CSV fields keep their line breaks.
+    """
+
+    def __init__(self, binary_file):
+        self._file = binary_file
+        self.undecodable = {}
+
+    def __iter__(self):
+        for line_number, line in enumerate(self._file, start=1):
+            try:
+                yield line.decode("utf-8")
+            except UnicodeDecodeError as e:
+                self.undecodable[line_number] = f"Invalid UTF-8 at byte {e.start}: {e.reason}"
+                yield line.decode("utf-8", errors="replace")
+
+
+def text_lines(binary_file):
+    """Decode an uploaded binary file to lines; see ``DecodedLines``."""
+    return DecodedLines(binary_file)
+
+
+async def _main():
+    import argparse
+    import os
+
+    from db import create_database
+
+    parser = argparse.ArgumentParser(description="Bulk-load reviews from an NDJSON or CSV file.")
+    parser.add_argument("path")
+    parser.add_argument("--event", type=int, default=DEFAULT_EVENT_ID)
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--max-errors", type=int, default=1000)
+    args = parser.parse_args()
+
+    format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    db = create_database(os.environ.get("DB_BACKEND", "sync"), os.environ["DATABASE_URL"], min_size=1, max_size=2)
+    await db.open()
+    try:
+        with open(args.path, "rb") as f:
+            report = await ingest_reviews(db, args.event, text_lines(f), format, args.chunk_size, args.max_errors)
+        print(json.dumps(report, indent=2))
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    asyncio.run(_main())
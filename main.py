@@ -1,157 +1,378 @@
+import asyncio
+import base64
+import contextlib
+import logging
 import os
-import psycopg2
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
-from psycopg2.extras import RealDictCursor
+import re
+import tempfile
+import time
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
-from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional, Union
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
 
-try:
-    from textblob import TextBlob
-    TEXTBLOB_AVAILABLE = True
-except:
-    TEXTBLOB_AVAILABLE = False
+from admission import SEAT_ADVISORY_GATE_SQL, AdmissionController, Overloaded
+from db import PoolTimeout, create_database, naive_utc
+from events import DEFAULT_EVENT_ID, MAX_SEAT_ROWS, create_event, create_venue, get_event, list_events
+from holds import SeatHolds
+from ingest import FORMATS, ingest_reviews, text_lines
+from metrics import MetricsMiddleware, TimedRoute, render_metrics, span
+from migrations import migrate
+from realtime import (
+    RESYNC,
+    SEAT_CHANGES_CHANNEL,
+    SeatBroadcaster,
+    decode_seat_changes,
+    dumps,
+)
+from responses import CompressionMiddleware, JSONBytesResponse, choose_encoding, compress, dumps_bytes
+from seatmap import SeatMapCaches
+from aggregates import read_review_stats, read_seat_row_stats, read_seat_stats, read_timeseries
+from analysis import ReviewAnalysisWorker
+from aspects import ASPECT_NAMES, OVERALL_ASPECT, ReviewRequest, aspect_texts, format_analysis, insert_review_aspects
+from sentiment import cache_stats, readiness, score_review_texts, warm_up
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is required")
 
+DB_BACKEND = os.environ.get("DB_BACKEND", "sync")
+MAX_BATCH_SEATS = int(os.environ.get("MAX_BATCH_SEATS", "20"))
+SEAT_CACHE_TTL = float(os.environ.get("SEAT_CACHE_TTL", "1"))
+SEAT_CACHE_FULL_RELOAD_INTERVAL = float(os.environ.get("SEAT_CACHE_FULL_RELOAD_INTERVAL", "60"))
+SEAT_CACHE_MAX_EVENTS = int(os.environ.get("SEAT_CACHE_MAX_EVENTS", "100"))
+MAX_EVENT_SEATS = int(os.environ.get("MAX_EVENT_SEATS", "100000"))
+SEAT_STREAM_BUFFER_SIZE = int(os.environ.get("SEAT_STREAM_BUFFER_SIZE", "64"))
+SEAT_STREAM_HEARTBEAT = float(os.environ.get("SEAT_STREAM_HEARTBEAT", "15"))
+REVIEW_ANALYSIS_MODE = os.environ.get("REVIEW_ANALYSIS_MODE", "inline")
+REVIEW_ANALYSIS_PROCESSES = int(os.environ.get("REVIEW_ANALYSIS_PROCESSES", "0")) or None
+REVIEW_ANALYSIS_BATCH_SIZE = int(os.environ.get("REVIEW_ANALYSIS_BATCH_SIZE", "50"))
+REVIEW_ANALYSIS_FLUSH_INTERVAL = float(os.environ.get("REVIEW_ANALYSIS_FLUSH_INTERVAL", "0.2"))
+REVIEWS_PAGE_SIZE = int(os.environ.get("REVIEWS_PAGE_SIZE", "50"))
+REVIEWS_MAX_PAGE_SIZE = int(os.environ.get("REVIEWS_MAX_PAGE_SIZE", "500"))
+REVIEWS_EXPORT_BATCH_SIZE = int(os.environ.get("REVIEWS_EXPORT_BATCH_SIZE", "500"))
+SEAT_STATS_PAGE_SIZE = int(os.environ.get("SEAT_STATS_PAGE_SIZE", "200"))
+SEAT_STATS_MAX_PAGE_SIZE = int(os.environ.get("SEAT_STATS_MAX_PAGE_SIZE", "2000"))
+SEAT_HOLD_SECONDS = int(os.environ.get("SEAT_HOLD_SECONDS", "120"))
+SEAT_HOLD_MAX_SECONDS = int(os.environ.get("SEAT_HOLD_MAX_SECONDS", "900"))
+SEAT_HOLD_SWEEP_INTERVAL = float(os.environ.get("SEAT_HOLD_SWEEP_INTERVAL", "1"))
+SEAT_HOLD_SWEEP_BATCH_SIZE = int(os.environ.get("SEAT_HOLD_SWEEP_BATCH_SIZE", "500"))
+INGEST_CHUNK_SIZE = int(os.environ.get("INGEST_CHUNK_SIZE", "1000"))
+INGEST_SPOOL_SIZE = int(os.environ.get("INGEST_SPOOL_SIZE", str(16 * 1024 * 1024)))
+ANALYTICS_TIMESERIES_MAX_BUCKETS = int(os.environ.get("ANALYTICS_TIMESERIES_MAX_BUCKETS", "1000"))
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "5"))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+BOOKING_MAX_CONCURRENCY = int(os.environ.get("BOOKING_MAX_CONCURRENCY", str(max(1, DB_POOL_MAX_SIZE // 2))))
+BOOKING_QUEUE_SIZE = int(os.environ.get("BOOKING_QUEUE_SIZE", "1000"))
+BOOKING_QUEUE_TIMEOUT = float(os.environ.get("BOOKING_QUEUE_TIMEOUT", "2"))
+BOOKING_ADVISORY_LOCKS = os.environ.get("BOOKING_ADVISORY_LOCKS", "0") == "1"
+REQUEST_PROFILING = os.environ.get("REQUEST_PROFILING", "1") == "1"
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+SENTIMENT_WARMUP = os.environ.get("SENTIMENT_WARMUP", "background")
+READY_DB_TIMEOUT = float(os.environ.get("READY_DB_TIMEOUT", "1"))
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 3)
+
+async def warm_sentiment(app, started):
+    """Load the sentiment model where reviews will be scored: here, or in the analysis processes."""
+    if app.state.review_worker is not None:
+        await app.state.review_worker.warm_up()
+    else:
+        await run_in_threadpool(warm_up)
+    app.state.startup["warm_after_ms"] = elapsed_ms(started)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor()
-    
-    cur.execute("DROP TABLE IF EXISTS reviews CASCADE;")
-    cur.execute("DROP TABLE IF EXISTS seats CASCADE;")
-    
-    cur.execute("""
-        CREATE TABLE seats (
-            id SERIAL PRIMARY KEY,
-            seat_number VARCHAR(10) UNIQUE NOT NULL,
-            status VARCHAR(20) DEFAULT 'available',
-            user_id INTEGER,
-            user_name VARCHAR(100),
-            booked_at TIMESTAMP
-        );
-    """)
-    
-    cur.execute("""
-        CREATE TABLE reviews (
-            review_id SERIAL PRIMARY KEY,
-            seat_id INTEGER REFERENCES seats(id),
-            user_id INTEGER NOT NULL,
-            user_name VARCHAR(100),
-            
-            overall_experience TEXT,
-            overall_sentiment_score FLOAT,
-            overall_sentiment_label VARCHAR(20),
-            
-            sound_quality_review TEXT,
-            sound_quality_score FLOAT,
-            sound_quality_label VARCHAR(20),
-            
-            seat_comfort_review TEXT,
-            seat_comfort_score FLOAT,
-            seat_comfort_label VARCHAR(20),
-            
-            seat_height_review TEXT,
-            seat_height_score FLOAT,
-            seat_height_label VARCHAR(20),
-            
-            view_quality_review TEXT,
-            view_quality_score FLOAT,
-            view_quality_label VARCHAR(20),
-            
-            booking_service_review TEXT,
-            booking_service_score FLOAT,
-            booking_service_label VARCHAR(20),
-            
-            staff_behavior_review TEXT,
-            staff_behavior_score FLOAT,
-            staff_behavior_label VARCHAR(20),
-            
-            cleanliness_review TEXT,
-            cleanliness_score FLOAT,
-            cleanliness_label VARCHAR(20),
-            
-            value_for_money_review TEXT,
-            value_for_money_score FLOAT,
-            value_for_money_label VARCHAR(20),
-            
-            average_score FLOAT,
-            overall_rating VARCHAR(20),
-            
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
+    if SENTIMENT_WARMUP not in ("background", "blocking", "off"):
+        raise ValueError(f"Unknown SENTIMENT_WARMUP {SENTIMENT_WARMUP!r}; expected 'background', 'blocking' or 'off'")
+    
+    started = time.perf_counter()
+    app.state.startup = startup = {"sentiment_warmup": SENTIMENT_WARMUP}
+    db = create_database(
+        DB_BACKEND,
+        DATABASE_URL,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+    )
+    await db.open()
+    startup["pool_open_ms"] = elapsed_ms(started)
+    app.state.db = db
+    app.state.seat_caches = SeatMapCaches(
+        max_events=SEAT_CACHE_MAX_EVENTS,
+        ttl=SEAT_CACHE_TTL,
+        full_reload_interval=SEAT_CACHE_FULL_RELOAD_INTERVAL,
+    )
     
-    seats = [(f'A{i}',) for i in range(1, 11)] + [(f'B{i}',) for i in range(1, 11)] + [(f'C{i}',) for i in range(1, 11)]
-    cur.executemany("INSERT INTO seats (seat_number) VALUES (%s);", seats)
+    app.state.broadcaster = SeatBroadcaster(buffer_size=SEAT_STREAM_BUFFER_SIZE)
+    app.state.admission = AdmissionController(
+        max_concurrent=BOOKING_MAX_CONCURRENCY,
+        max_queue=BOOKING_QUEUE_SIZE,
+        queue_timeout=BOOKING_QUEUE_TIMEOUT,
+    )
     
-    conn.commit()
-    cur.close()
-    conn.close()
+    app.state.migrations = await migrate(db)
+    startup["migrations_ms"] = app.state.migrations["duration_ms"]
+    
+    listener = asyncio.create_task(
+        db.listen(SEAT_CHANGES_CHANNEL, lambda payload: on_seat_notification(app, payload))
+    )
+    
+    app.state.seat_holds = SeatHolds(
+        db,
+        sweep_interval=SEAT_HOLD_SWEEP_INTERVAL,
+        batch_size=SEAT_HOLD_SWEEP_BATCH_SIZE,
+        on_release=lambda rows: publish_seat_changes(app, rows),
+    )
+    app.state.seat_holds.start()
+    
+    app.state.review_worker = None
+    if REVIEW_ANALYSIS_MODE == "background":
+        app.state.review_worker = ReviewAnalysisWorker(
+            db,
+            processes=REVIEW_ANALYSIS_PROCESSES,
+            batch_size=REVIEW_ANALYSIS_BATCH_SIZE,
+            flush_interval=REVIEW_ANALYSIS_FLUSH_INTERVAL,
+        )
+        app.state.review_worker.start()
+        await app.state.review_worker.recover()
+    elif REVIEW_ANALYSIS_MODE != "inline":
+        raise ValueError(f"Unknown REVIEW_ANALYSIS_MODE {REVIEW_ANALYSIS_MODE!r}; expected 'inline' or 'background'")
+    
+    # In the background mode requests are served while the model loads and
+    # /ready reports 503 until it has; "blocking" holds startup until then.
+    warmup = None
+    if SENTIMENT_WARMUP == "blocking":
+        await warm_sentiment(app, started)
+    elif SENTIMENT_WARMUP == "background":
+        warmup = asyncio.create_task(warm_sentiment(app, started))
+    startup["serving_after_ms"] = elapsed_ms(started)
     
     yield
+    
+    if warmup is not None:
+        warmup.cancel()
+        try:
+            await warmup
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # A failed warmup must not skip the rest of the shutdown.
+            logger.exception("Sentiment warmup failed")
+    if app.state.review_worker is not None:
+        await app.state.review_worker.close()
+    await app.state.seat_holds.close()
+    listener.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await listener
+    app.state.broadcaster.close()
+    await db.close()
+
+def on_seat_notification(app, payload):
+    changes = RESYNC if payload is None else decode_seat_changes(payload)
+    
+    if changes is RESYNC:
+        app.state.seat_caches.invalidate()
+        app.state.broadcaster.publish_resync()
+    else:
+        publish_seat_changes(app, changes)
+
+def publish_seat_changes(app, rows):
+    app.state.seat_caches.apply(rows)
+    app.state.broadcaster.publish(rows)
 
 app = FastAPI(
     title="Advanced Booking & Review System",
     description="Seat booking with comprehensive multi-aspect review analysis",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=JSONBytesResponse,
 )
+app.router.route_class = TimedRoute
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+# Send ``X-Profile: 1`` to get a Server-Timing breakdown of the request back.
+app.add_middleware(MetricsMiddleware, profiling=REQUEST_PROFILING)
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+def get_db(request: Request):
+    return request.app.state.db
+
+def event_id_of(connection):
+    # The unprefixed routes address the show that existed before events did.
+    return connection.path_params.get("event_id", DEFAULT_EVENT_ID)
+
+def get_event_id(request: Request):
+    return event_id_of(request)
+
+def event_path(request, path):
+    """``path`` under the same event prefix the request came in on."""
+    event_id = request.path_params.get("event_id")
+    return path if event_id is None else f"/events/{event_id}{path}"
+
+def get_seat_caches(request: Request):
+    return request.app.state.seat_caches
+
+def get_broadcaster(request: Request):
+    return request.app.state.broadcaster
+
+def get_review_worker(request: Request):
+    return request.app.state.review_worker
+
+def get_seat_holds(request: Request):
+    return request.app.state.seat_holds
+
+def get_admission(request: Request):
+    return request.app.state.admission
+
+# Every seat, booking, review and analytics route lives on this router, which
+# is mounted under /events/{event_id} and, for the default event, at the root.
+router = APIRouter(route_class=TimedRoute)
+
+class VenueRequest(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+
+class EventRequest(BaseModel):
+    venue_id: int
+    name: str = Field(..., min_length=1, max_length=200)
+    starts_at: Optional[datetime] = None
+    rows: int = Field(..., ge=1, le=MAX_SEAT_ROWS, description="Seat rows, labelled A-Z then AA-ZZ")
+    seats_per_row: int = Field(..., ge=1)
+    
+    @model_validator(mode="after")
+    def check_size(self):
+        if self.rows * self.seats_per_row > MAX_EVENT_SEATS:
+            raise ValueError(f"At most {MAX_EVENT_SEATS} seats per event")
+        return self
 
 class BookingRequest(BaseModel):
     user_id: int
     user_name: str
 
-class ReviewRequest(BaseModel):
+class HoldRequest(BookingRequest):
+    hold_seconds: int = Field(SEAT_HOLD_SECONDS, ge=1, le=SEAT_HOLD_MAX_SECONDS)
+
+class ConfirmHoldRequest(BaseModel):
+    hold_token: UUID
+
+SEAT_RANGE_PATTERN = re.compile(r"^\s*([A-Za-z]+)(\d+)\s*[-\u2013]\s*([A-Za-z]+)(\d+)\s*$")
+
+def seat_range_bounds(seat_range):
+    match = SEAT_RANGE_PATTERN.match(seat_range)
+    if not match:
+        raise ValueError("seat_range must look like 'B3-B7'")
+    
+    row, first, end_row, last = match.group(1).upper(), int(match.group(2)), match.group(3).upper(), int(match.group(4))
+    if row != end_row:
+        raise ValueError("seat_range must stay within one row")
+    if first > last:
+        first, last = last, first
+    
+    return row, first, last
+
+def parse_seat_range(seat_range):
+    row, first, last = seat_range_bounds(seat_range)
+    return [f"{row}{n}" for n in range(first, last + 1)]
+
+class BatchBookingRequest(BaseModel):
     user_id: int
     user_name: str
     
-    overall_experience: str = Field(..., description="Your overall experience")
-    sound_quality_review: Optional[str] = Field(None, description="Review about sound/audio quality")
-    seat_comfort_review: Optional[str] = Field(None, description="Review about seat comfort")
-    seat_height_review: Optional[str] = Field(None, description="Review about seat height/position")
-    view_quality_review: Optional[str] = Field(None, description="Review about view/visibility")
-    booking_service_review: Optional[str] = Field(None, description="Review about booking service")
-    staff_behavior_review: Optional[str] = Field(None, description="Review about staff behavior")
-    cleanliness_review: Optional[str] = Field(None, description="Review about cleanliness")
-    value_for_money_review: Optional[str] = Field(None, description="Review about value for money")
-
-def analyze_sentiment(text):
-    if not text or not TEXTBLOB_AVAILABLE:
-        return 0.0, "neutral"
+    seat_ids: Optional[List[int]] = Field(None, description="Seat ids to book together")
+    seat_range: Optional[str] = Field(None, description="Contiguous block in one row, e.g. 'B3-B7'")
     
-    try:
-        blob = TextBlob(text)
-        score = blob.sentiment.polarity
+    @model_validator(mode="after")
+    def check_seats(self):
+        if (self.seat_ids is None) == (self.seat_range is None):
+            raise ValueError("Provide exactly one of seat_ids or seat_range")
         
-        if score > 0.1:
-            label = "positive"
-        elif score < -0.1:
-            label = "negative"
+        if self.seat_ids is not None:
+            count = len(set(self.seat_ids))
         else:
-            label = "neutral"
+            # Sized from the bounds, so an oversized range is never expanded.
+            _, first, last = seat_range_bounds(self.seat_range)
+            count = last - first + 1
+        if count == 0:
+            raise ValueError("At least one seat is required")
+        if count > MAX_BATCH_SEATS:
+            raise ValueError(f"At most {MAX_BATCH_SEATS} seats can be booked at once")
         
-        return score, label
-    except:
-        return 0.0, "neutral"
-
-def get_overall_rating(avg_score):
-    if avg_score >= 0.6:
-        return "excellent"
-    elif avg_score >= 0.3:
-        return "good"
-    elif avg_score >= 0.0:
-        return "average"
-    elif avg_score >= -0.3:
-        return "poor"
-    else:
-        return "very_poor"
+        return self
+
+class SeatOut(BaseModel):
+    id: int
+    seat_number: str
+    status: str
+    user_id: Optional[int] = None
+    user_name: Optional[str] = None
+    booked_at: Optional[datetime] = None
+
+class SeatMapResponse(BaseModel):
+    total_seats: int
+    available: int
+    held: int
+    booked: int
+    seats: List[SeatOut]
+
+class SeatChangesResponse(BaseModel):
+    version: int
+    since: int
+    total_seats: int
+    available: int
+    held: int
+    booked: int
+    changes: List[SeatOut]
+
+class AspectTextOut(BaseModel):
+    text: str
+    score: Optional[float] = None
+    label: Optional[str] = None
+
+class ReviewOut(BaseModel):
+    """A review row; /reviews?fields= returns only some of the optional fields."""
+    review_id: int
+    created_at: datetime
+    event_id: Optional[int] = None
+    seat_id: Optional[int] = None
+    seat_number: Optional[str] = None
+    user_id: Optional[int] = None
+    user_name: Optional[str] = None
+    aspects: Optional[Dict[str, AspectTextOut]] = None
+    average_score: Optional[float] = None
+    overall_rating: Optional[str] = None
+    analysis_status: Optional[str] = None
+    analyzed_at: Optional[datetime] = None
+
+class ReviewPage(BaseModel):
+    count: int
+    limit: int
+    next_cursor: Optional[str] = None
+    reviews: List[ReviewOut]
+
+class SeatReviewsResponse(BaseModel):
+    seat_id: int
+    reviews: List[ReviewOut]
 
 @app.get("/", response_class=HTMLResponse, include_in_schema=False)
 def home():
@@ -282,295 +503,827 @@ def home():
     """
     return HTMLResponse(content=html)
 
-@app.get("/seats")
-def get_seats():
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+@app.post("/venues", status_code=201)
+async def add_venue(venue: VenueRequest, db=Depends(get_db)):
+    return await create_venue(db, venue.name)
+
+@app.post("/events", status_code=201)
+async def add_event(event: EventRequest, db=Depends(get_db)):
+    """Create an event and its whole seat map (one partition of ``seats``) in one transaction."""
+    created = await create_event(db, event.venue_id, event.name, event.starts_at, event.rows, event.seats_per_row)
     
-    cur.execute("SELECT * FROM seats ORDER BY seat_number;")
-    seats = cur.fetchall()
+    if created is None:
+        raise HTTPException(status_code=404, detail="Venue not found")
     
-    available = sum(1 for s in seats if s['status'] == 'available')
+    return created
+
+@app.get("/events")
+async def get_events(venue_id: Optional[int] = None, db=Depends(get_db)):
+    return {"events": await list_events(db, venue_id)}
+
+@app.get("/events/{event_id}")
+async def get_event_details(event_id: int, db=Depends(get_db)):
+    event = await get_event(db, event_id)
     
-    cur.close()
-    conn.close()
+    if event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
     
-    return {
-        "total_seats": len(seats),
-        "available": available,
-        "booked": len(seats) - available,
-        "seats": seats
+    return event
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+@router.get("/seats", response_model=Union[SeatMapResponse, SeatChangesResponse])
+async def get_seats(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, le=2**63 - 1),
+    event_id=Depends(get_event_id),
+    db=Depends(get_db),
+    seat_caches=Depends(get_seat_caches),
+):
+    with span("seat_map"):
+        seat_map = await seat_caches.get(event_id, db)
+    if not seat_map.seats:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    etag = seat_map.etag
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    counts = {
+        "total_seats": len(seat_map.seats),
+        "available": seat_map.available,
+        "held": seat_map.held,
+        "booked": len(seat_map.seats) - seat_map.available - seat_map.held,
     }
+    
+    if since is not None:
+        return JSONBytesResponse({
+            "version": seat_map.version,
+            "since": since,
+            **counts,
+            "changes": seat_map.changes_since(since)
+        }, headers={"ETag": etag})
+    
+    # Every poller between two changes gets the same bytes, so the full map
+    # is encoded (and compressed) once per change instead of once per request.
+    with span("serialize"):
+        body = seat_map.rendered("identity", lambda: dumps_bytes({**counts, "seats": seat_map.seats}))
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding is not None and len(body) >= COMPRESSION_MIN_SIZE:
+        with span("compress"):
+            body = seat_map.rendered(encoding, lambda: compress(body, encoding))
+        headers["Content-Encoding"] = encoding
+    
+    return Response(body, media_type="application/json", headers=headers)
+
+def format_sse(event, version, data):
+    return f"id: {version}\nevent: {event}\ndata: {data}\n\n"
+
+@router.get("/seats/stream")
+async def stream_seats(
+    request: Request,
+    db=Depends(get_db),
+    event_id=Depends(get_event_id),
+    seat_caches=Depends(get_seat_caches),
+    broadcaster=Depends(get_broadcaster),
+):
+    subscription = broadcaster.subscribe(event_id)
+    seat_map = await seat_caches.get(event_id, db)
+    if not seat_map.seats:
+        subscription.close()
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    last_event_id = request.headers.get("last-event-id", "")
+    
+    async def events():
+        try:
+            if last_event_id.isdigit():
+                changes = seat_map.changes_since(int(last_event_id))
+                if changes:
+                    yield format_sse("seats", seat_map.version, dumps({"version": seat_map.version, "seats": changes}))
+            else:
+                yield format_sse("version", seat_map.version, dumps({"version": seat_map.version}))
+            
+            async for message in subscription.messages(heartbeat=SEAT_STREAM_HEARTBEAT):
+                if message is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield format_sse(*message)
+            
+            if subscription.dropped:
+                yield format_sse("dropped", broadcaster.version, dumps({"reason": "client too slow"}))
+        finally:
+            subscription.close()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-@app.post("/book/{seat_id}")
-def book_seat(seat_id: int, booking: BookingRequest):
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor()
+@router.websocket("/seats/ws")
+async def seats_websocket(websocket: WebSocket):
+    await websocket.accept()
+    event_id = event_id_of(websocket)
+    seat_map = await websocket.app.state.seat_caches.get(event_id, websocket.app.state.db)
+    if not seat_map.seats:
+        await websocket.close(code=1008, reason="event not found")
+        return
+    
+    subscription = websocket.app.state.broadcaster.subscribe(event_id)
     
     try:
-        cur.execute(
-            "SELECT status FROM seats WHERE id = %s FOR UPDATE;",
-            (seat_id,)
-        )
-        row = cur.fetchone()
+        await websocket.send_text(dumps({"event": "version", "version": seat_map.version}))
         
-        if not row:
-            conn.rollback()
-            raise HTTPException(status_code=404, detail="Seat not found")
-        
-        if row[0] != 'available':
-            conn.rollback()
-            return {
-                "status": "failed",
-                "message": "Seat already booked - Race condition prevented! Only first person gets the seat."
-            }
-        
-        cur.execute("""
-            UPDATE seats 
-            SET status = 'booked', 
-                user_id = %s,
-                user_name = %s,
-                booked_at = %s
-            WHERE id = %s;
-        """, (booking.user_id, booking.user_name, datetime.now(), seat_id))
-        
-        conn.commit()
+        async for message in subscription.messages(heartbeat=SEAT_STREAM_HEARTBEAT):
+            if message is None:
+                await websocket.send_text('{"event": "keep-alive"}')
+                continue
+            
+            event, version, data = message
+            await websocket.send_text(f'{{"event": "{event}", "version": {version}, "data": {data}}}')
         
-        cur.execute(
-            "SELECT seat_number FROM seats WHERE id = %s;",
-            (seat_id,)
-        )
-        seat_number = cur.fetchone()[0]
+        if subscription.dropped:
+            await websocket.close(code=1013, reason="client too slow")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+
+# Locks every requested seat in id order, so two overlapping group bookings
+# always acquire their locks in the same sequence and cannot deadlock.
+LOCK_SEATS_BY_ID_SQL = """
+    SELECT id, seat_number, status FROM seats
+    WHERE event_id = %s AND id = ANY(%s)
+    ORDER BY id
+    FOR UPDATE;
+"""
+
+LOCK_SEATS_BY_NUMBER_SQL = """
+    SELECT id, seat_number, status FROM seats
+    WHERE event_id = %s AND seat_number = ANY(%s)
+    ORDER BY id
+    FOR UPDATE;
+"""
+
+@router.post("/book/batch")
+async def book_seats_batch(
+    request: Request,
+    booking: BatchBookingRequest,
+    event_id=Depends(get_event_id),
+    db=Depends(get_db),
+    admission=Depends(get_admission),
+):
+    async with admission.slot(), db.transaction() as tx:
+        try:
+            if booking.seat_ids is not None:
+                requested = sorted(set(booking.seat_ids))
+                with span("lock_wait"):
+                    locked = await tx.fetch(LOCK_SEATS_BY_ID_SQL, (event_id, requested))
+                found = {s['id'] for s in locked}
+                missing = [{"seat_id": i, "seat_number": None, "status": "not_found"} for i in requested if i not in found]
+            else:
+                requested = parse_seat_range(booking.seat_range)
+                with span("lock_wait"):
+                    locked = await tx.fetch(LOCK_SEATS_BY_NUMBER_SQL, (event_id, requested))
+                found = {s['seat_number'] for s in locked}
+                missing = [{"seat_id": None, "seat_number": n, "status": "not_found"} for n in requested if n not in found]
+            
+            all_available = not missing and all(s['status'] == 'available' for s in locked)
+            
+            if all_available:
+                booked = await tx.fetch("""
+                    UPDATE seats 
+                    SET status = 'booked', 
+                        user_id = %s,
+                        user_name = %s,
+                        booked_at = %s,
+                        version = nextval('seat_map_version_seq')
+                    WHERE event_id = %s AND id = ANY(%s)
+                    RETURNING *;
+                """, (booking.user_id, booking.user_name, datetime.now(), event_id, [s['id'] for s in locked]))
         
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    if all_available:
+        publish_seat_changes(request.app, booked)
+    
+    seats = [
+        {
+            "seat_id": s['id'],
+            "seat_number": s['seat_number'],
+            "status": "booked" if all_available else ("available" if s['status'] == 'available' else "unavailable"),
+        }
+        for s in locked
+    ] + missing
+    
+    if not all_available:
         return {
-            "status": "success",
-            "message": "Seat booked successfully! Please submit your review.",
-            "seat_number": seat_number,
-            "seat_id": seat_id,
+            "status": "failed",
+            "message": "Not every seat could be booked - no seats were booked.",
             "user_id": booking.user_id,
             "user_name": booking.user_name,
-            "next_step": f"POST /review/{seat_id} to submit your detailed review"
+            "seats": seats
         }
     
-    except HTTPException:
+    return {
+        "status": "success",
+        "message": f"{len(seats)} seats booked successfully! Please submit your reviews.",
+        "user_id": booking.user_id,
+        "user_name": booking.user_name,
+        "seats": seats
+    }
+
+# Claims the seat in one statement that is committed straight away, so the
+# row lock is never held across client round trips. SKIP LOCKED lets
+# contenders that arrive while another claim is in flight report "taken"
+# immediately instead of queueing on the lock (a plain conditional UPDATE
+# would make every loser lock the row until its own commit). seat_exists
+# tells "not found" apart from "already booked", and seat_available tells a
+# row that was only skipped because another transaction holds its lock (a
+# batch booking or a hold that may yet roll back) apart from one that is
+# taken. With BOOKING_ADVISORY_LOCKS the seat's advisory lock gates the row,
+# coalescing contenders from other workers the way the admission controller
+# does within this one.
+CLAIM_SEAT_SQL = f"""
+    WITH candidate AS (
+        SELECT id FROM seats
+        WHERE event_id = %(event_id)s AND id = %(seat_id)s AND status = 'available'
+          {f"AND {SEAT_ADVISORY_GATE_SQL}" if BOOKING_ADVISORY_LOCKS else ""}
+        FOR UPDATE SKIP LOCKED
+    ), claimed AS (
+        UPDATE seats
+        SET status = 'booked',
+            user_id = %(user_id)s,
+            user_name = %(user_name)s,
+            booked_at = %(booked_at)s,
+            version = nextval('seat_map_version_seq')
+        FROM candidate
+        WHERE seats.event_id = %(event_id)s AND seats.id = candidate.id
+        RETURNING seats.*
+    )
+    SELECT
+        claimed.*,
+        EXISTS (SELECT 1 FROM seats WHERE event_id = %(event_id)s AND id = %(seat_id)s) AS seat_exists,
+        EXISTS (
+            SELECT 1 FROM seats WHERE event_id = %(event_id)s AND id = %(seat_id)s AND status = 'available'
+        ) AS seat_available
+    FROM (SELECT 1) AS one
+    LEFT JOIN claimed ON true;
+"""
+
+# A claim that skipped a locked seat is worth retrying as soon as the other
+# transaction, a single statement or a short batch, has finished.
+SEAT_BUSY_RETRY_AFTER = 1
+
+def raise_if_seat_busy(row):
+    # The statement's snapshot still shows the seat available, so it was
+    # skipped for its lock rather than taken.
+    if row['seat_number'] is None and row['seat_available']:
+        raise HTTPException(
+            status_code=409,
+            detail="Seat is being claimed by another request - try again",
+            headers={"Retry-After": str(SEAT_BUSY_RETRY_AFTER)},
+        )
+
+@router.post("/book/{seat_id}")
+async def book_seat(
+    request: Request,
+    seat_id: int,
+    booking: BookingRequest,
+    event_id=Depends(get_event_id),
+    db=Depends(get_db),
+    admission=Depends(get_admission),
+):
+    taken = {
+        "status": "failed",
+        "message": "Seat already booked - Race condition prevented! Only first person gets the seat."
+    }
+    
+    async def claim():
+        try:
+            async with admission.slot():
+                with span("claim"):
+                    return await db.fetchrow(CLAIM_SEAT_SQL, {
+                        "event_id": event_id,
+                        "seat_id": seat_id,
+                        "user_id": booking.user_id,
+                        "user_name": booking.user_name,
+                        "booked_at": datetime.now(),
+                    })
+        except (PoolTimeout, Overloaded):
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    # Only one contender per seat reaches the database; the rest get its
+    # outcome, and lost the race only if it won.
+    row, claimed = await admission.claim((event_id, seat_id), claim)
+    
+    if not row['seat_exists']:
+        raise HTTPException(status_code=404, detail="Seat not found")
+    
+    raise_if_seat_busy(row)
+    
+    if row['seat_number'] is None or not claimed:
+        return taken
+    
+    publish_seat_changes(request.app, [row])
+    
+    return {
+        "status": "success",
+        "message": "Seat booked successfully! Please submit your review.",
+        "seat_number": row['seat_number'],
+        "seat_id": seat_id,
+        "user_id": booking.user_id,
+        "user_name": booking.user_name,
+        "next_step": f"POST {event_path(request, f'/review/{seat_id}')} to submit your detailed review"
+    }
+
+@router.post("/hold/{seat_id}")
+async def hold_seat(
+    request: Request,
+    seat_id: int,
+    hold: HoldRequest,
+    event_id=Depends(get_event_id),
+    seat_holds=Depends(get_seat_holds),
+    admission=Depends(get_admission),
+):
+    unavailable = {
+        "status": "failed",
+        "message": "Seat is not available - it is already held or booked."
+    }
+    
+    async def claim():
+        try:
+            async with admission.slot():
+                with span("claim"):
+                    return await seat_holds.hold(event_id, seat_id, hold.user_id, hold.user_name, hold.hold_seconds)
+        except (PoolTimeout, Overloaded):
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    row, claimed = await admission.claim((event_id, seat_id), claim)
+    
+    if not row['seat_exists']:
+        raise HTTPException(status_code=404, detail="Seat not found")
+    
+    raise_if_seat_busy(row)
+    
+    if row['seat_number'] is None or not claimed:
+        return unavailable
+    
+    # The hold token must not reach the seat stream.
+    seat = {column: value for column, value in row.items() if column not in ("hold_token", "expires_at")}
+    publish_seat_changes(request.app, [seat])
+    
+    return {
+        "status": "held",
+        "message": f"Seat held for {hold.hold_seconds} seconds. Confirm it to complete the booking.",
+        "seat_number": row['seat_number'],
+        "seat_id": seat_id,
+        "user_id": hold.user_id,
+        "user_name": hold.user_name,
+        "hold_token": str(row['hold_token']),
+        "expires_at": row['expires_at'],
+        "next_step": f"POST {event_path(request, f'/hold/{seat_id}/confirm')} with the hold_token before it expires"
+    }
+
+@router.post("/hold/{seat_id}/confirm")
+async def confirm_hold(request: Request, seat_id: int, confirmation: ConfirmHoldRequest, event_id=Depends(get_event_id), seat_holds=Depends(get_seat_holds)):
+    try:
+        row = await seat_holds.confirm(event_id, seat_id, confirmation.hold_token, datetime.now())
+    except PoolTimeout:
         raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     
-    finally:
-        cur.close()
-        conn.close()
+    if not row['seat_exists']:
+        raise HTTPException(status_code=404, detail="Seat not found")
+    
+    if row['seat_number'] is None:
+        raise HTTPException(status_code=409, detail="Hold not found or expired")
+    
+    publish_seat_changes(request.app, [row])
+    
+    return {
+        "status": "success",
+        "message": "Seat booked successfully! Please submit your review.",
+        "seat_number": row['seat_number'],
+        "seat_id": seat_id,
+        "user_id": row['user_id'],
+        "user_name": row['user_name'],
+        "next_step": f"POST {event_path(request, f'/review/{seat_id}')} to submit your detailed review"
+    }
 
-@app.post("/review/{seat_id}")
-def submit_review(seat_id: int, review: ReviewRequest):
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor()
+@router.post("/review/{seat_id}")
+async def submit_review(
+    request: Request,
+    seat_id: int,
+    review: ReviewRequest,
+    event_id=Depends(get_event_id),
+    db=Depends(get_db),
+    review_worker=Depends(get_review_worker),
+):
+    texts = aspect_texts(review)
     
-    try:
-        cur.execute("SELECT status, user_id FROM seats WHERE id = %s;", (seat_id,))
-        seat_data = cur.fetchone()
-        
-        if not seat_data:
-            raise HTTPException(status_code=404, detail="Seat not found")
-        
-        if seat_data[0] != 'booked':
-            raise HTTPException(status_code=400, detail="Cannot review an unbooked seat")
-        
-        overall_score, overall_label = analyze_sentiment(review.overall_experience)
-        sound_score, sound_label = analyze_sentiment(review.sound_quality_review)
-        comfort_score, comfort_label = analyze_sentiment(review.seat_comfort_review)
-        height_score, height_label = analyze_sentiment(review.seat_height_review)
-        view_score, view_label = analyze_sentiment(review.view_quality_review)
-        booking_score, booking_label = analyze_sentiment(review.booking_service_review)
-        staff_score, staff_label = analyze_sentiment(review.staff_behavior_review)
-        clean_score, clean_label = analyze_sentiment(review.cleanliness_review)
-        value_score, value_label = analyze_sentiment(review.value_for_money_review)
-        
-        scores = [overall_score, sound_score, comfort_score, height_score, view_score, 
-                  booking_score, staff_score, clean_score, value_score]
-        valid_scores = [s for s in scores if s != 0.0 or review.overall_experience]
-        
-        avg_score = sum(valid_scores) / len(valid_scores) if valid_scores else 0.0
-        overall_rating = get_overall_rating(avg_score)
-        
-        cur.execute("""
-            INSERT INTO reviews (
-                seat_id, user_id, user_name,
-                overall_experience, overall_sentiment_score, overall_sentiment_label,
-                sound_quality_review, sound_quality_score, sound_quality_label,
-                seat_comfort_review, seat_comfort_score, seat_comfort_label,
-                seat_height_review, seat_height_score, seat_height_label,
-                view_quality_review, view_quality_score, view_quality_label,
-                booking_service_review, booking_service_score, booking_service_label,
-                staff_behavior_review, staff_behavior_score, staff_behavior_label,
-                cleanliness_review, cleanliness_score, cleanliness_label,
-                value_for_money_review, value_for_money_score, value_for_money_label,
-                average_score, overall_rating
-            ) VALUES (
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s,
-                %s, %s
-            );
-        """, (
-            seat_id, review.user_id, review.user_name,
-            review.overall_experience, overall_score, overall_label,
-            review.sound_quality_review, sound_score, sound_label,
-            review.seat_comfort_review, comfort_score, comfort_label,
-            review.seat_height_review, height_score, height_label,
-            review.view_quality_review, view_score, view_label,
-            review.booking_service_review, booking_score, booking_label,
-            review.staff_behavior_review, staff_score, staff_label,
-            review.cleanliness_review, clean_score, clean_label,
-            review.value_for_money_review, value_score, value_label,
-            avg_score, overall_rating
-        ))
-        
-        conn.commit()
+    async with db.transaction() as tx:
+        try:
+            seat_data = await tx.fetchrow(
+                "SELECT status, user_id FROM seats WHERE event_id = %s AND id = %s;", (event_id, seat_id)
+            )
+            
+            if not seat_data:
+                raise HTTPException(status_code=404, detail="Seat not found")
+            
+            if seat_data['status'] != 'booked':
+                raise HTTPException(status_code=400, detail="Cannot review an unbooked seat")
+            
+            if review_worker is not None:
+                review_id = await tx.fetchval("""
+                    INSERT INTO reviews (event_id, seat_id, user_id, user_name, analysis_status)
+                    VALUES (%s, %s, %s, %s, 'pending')
+                    RETURNING review_id;
+                """, (event_id, seat_id, review.user_id, review.user_name))
+                await insert_review_aspects(tx, review_id, texts)
+            else:
+                with span("sentiment"):
+                    results, avg_score, overall_rating = await run_in_threadpool(score_review_texts, texts)
+                
+                review_id = await tx.fetchval("""
+                    INSERT INTO reviews (event_id, seat_id, user_id, user_name, average_score, overall_rating, analyzed_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    RETURNING review_id;
+                """, (event_id, seat_id, review.user_id, review.user_name, avg_score, overall_rating))
+                await insert_review_aspects(tx, review_id, texts, results)
         
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    if review_worker is not None:
+        review_worker.submit(review_id, texts)
+        return JSONResponse(status_code=202, content={
+            "status": "accepted",
+            "message": "Review submitted successfully! Sentiment analysis is in progress.",
+            "review_id": review_id,
+            "analysis_status": "pending",
+            "status_url": event_path(request, f"/review/{review_id}/analysis")
+        })
+    
+    return {
+        "status": "success",
+        "message": "Review submitted successfully!",
+        "review_id": review_id,
+        "review_analysis": {
+            **{aspect: {"score": round(score, 3), "sentiment": label} for aspect, (score, label) in zip(ASPECT_NAMES, results)},
+            "average_score": round(avg_score, 3),
+            "overall_rating": overall_rating
+        }
+    }
+
+@router.get("/review/{review_id}/analysis")
+async def get_review_analysis(review_id: int, event_id=Depends(get_event_id), db=Depends(get_db)):
+    row = await db.fetchrow("SELECT * FROM reviews WHERE review_id = %s AND event_id = %s;", (review_id, event_id))
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Review not found")
+    
+    if row['analysis_status'] != 'complete':
         return {
-            "status": "success",
-            "message": "Review submitted successfully!",
-            "review_analysis": {
-                "overall_experience": {"score": round(overall_score, 3), "sentiment": overall_label},
-                "sound_quality": {"score": round(sound_score, 3), "sentiment": sound_label},
-                "seat_comfort": {"score": round(comfort_score, 3), "sentiment": comfort_label},
-                "seat_height": {"score": round(height_score, 3), "sentiment": height_label},
-                "view_quality": {"score": round(view_score, 3), "sentiment": view_label},
-                "booking_service": {"score": round(booking_score, 3), "sentiment": booking_label},
-                "staff_behavior": {"score": round(staff_score, 3), "sentiment": staff_label},
-                "cleanliness": {"score": round(clean_score, 3), "sentiment": clean_label},
-                "value_for_money": {"score": round(value_score, 3), "sentiment": value_label},
-                "average_score": round(avg_score, 3),
-                "overall_rating": overall_rating
-            }
+            "review_id": review_id,
+            "analysis_status": row['analysis_status']
         }
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "review_id": review_id,
+        "analysis_status": row['analysis_status'],
+        "analyzed_at": row['analyzed_at'],
+        "review_analysis": {
+            **format_analysis(await db.fetch("SELECT aspect, score, label FROM review_aspects WHERE review_id = %s;", (review_id,))),
+            "average_score": round(row['average_score'], 3),
+            "overall_rating": row['overall_rating']
+        }
+    }
+
+# Projectable /reviews fields; review_id and created_at are always returned for the cursor.
+REVIEW_FIELDS = [
+    "review_id", "seat_id", "seat_number", "user_id", "user_name", "aspects",
+    "average_score", "overall_rating", "analysis_status", "analyzed_at", "created_at",
+]
+
+# A review's aspects as {aspect: {"text", "score", "label"}}; only the aspects it has.
+REVIEW_ASPECTS_SQL = """
+    (SELECT json_object_agg(a.aspect, json_build_object('text', a.text, 'score', a.score, 'label', a.label))
+     FROM review_aspects a
+     WHERE a.review_id = r.review_id) AS aspects
+"""
+
+def review_column(field):
+    if field == "seat_number":
+        return "s.seat_number"
+    if field == "aspects":
+        return REVIEW_ASPECTS_SQL
+    return f"r.{field}"
+
+def encode_review_cursor(row):
+    token = f"{row['created_at'].isoformat()}|{row['review_id']}"
+    return base64.urlsafe_b64encode(token.encode()).decode()
+
+def decode_review_cursor(cursor):
+    try:
+        created_at, review_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(review_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def review_select_list(fields):
+    if fields is None:
+        selected = REVIEW_FIELDS
+    else:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = sorted(set(requested) - set(REVIEW_FIELDS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown review fields: {', '.join(unknown)}")
+        selected = ["review_id", "created_at"] + [field for field in requested if field not in ("review_id", "created_at")]
     
-    finally:
-        cur.close()
-        conn.close()
+    return ", ".join(review_column(field) for field in selected)
 
-@app.get("/reviews")
-def get_all_reviews():
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+@router.get("/reviews", response_model=ReviewPage)
+async def get_all_reviews(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. 'seat_number,average_score'; omit 'aspects' to skip the review texts"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    event_id=Depends(get_event_id),
+    db=Depends(get_db),
+):
+    """Newest reviews first, keyset-paginated on (created_at, review_id).
     
-    cur.execute("""
-        SELECT 
-            r.*,
-            s.seat_number
+    Pass the returned ``next_cursor`` back as ``cursor`` for the following
+    page. ``format=ndjson`` streams every matching review (or ``limit`` of
+    them) one JSON object per line through a server-side cursor.
+    """
+    conditions = "WHERE r.event_id = %s"
+    params = [event_id]
+    if cursor is not None:
+        conditions += " AND (r.created_at, r.review_id) < (%s, %s)"
+        params.extend(decode_review_cursor(cursor))
+    
+    sql = f"""
+        SELECT {review_select_list(fields)}
         FROM reviews r
-        JOIN seats s ON r.seat_id = s.id
-        ORDER BY r.created_at DESC;
-    """)
+        JOIN seats s ON s.event_id = r.event_id AND s.id = r.seat_id
+        {conditions}
+        ORDER BY r.created_at DESC, r.review_id DESC
+    """
     
-    reviews = cur.fetchall()
+    if format == "ndjson":
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        
+        async def lines():
+            async for row in db.stream(sql, params, batch_size=REVIEWS_EXPORT_BATCH_SIZE):
+                yield dumps_bytes(row) + b"\n"
+        
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
     
-    cur.close()
-    conn.close()
+    limit = min(limit or REVIEWS_PAGE_SIZE, REVIEWS_MAX_PAGE_SIZE)
+    # One extra row tells whether another page exists without a COUNT(*).
+    reviews = await db.fetch(sql + " LIMIT %s", params + [limit + 1])
+    has_more = len(reviews) > limit
+    reviews = reviews[:limit]
     
-    return {
-        "total_reviews": len(reviews),
+    return JSONBytesResponse({
+        "count": len(reviews),
+        "limit": limit,
+        "next_cursor": encode_review_cursor(reviews[-1]) if has_more else None,
         "reviews": reviews
-    }
+    })
 
-@app.get("/reviews/{seat_id}")
-def get_seat_review(seat_id: int):
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+@router.post("/reviews/bulk")
+async def bulk_ingest_reviews(
+    request: Request,
+    format: Optional[str] = Query(None, pattern=f"^({'|'.join(FORMATS)})$"),
+    chunk_size: int = Query(INGEST_CHUNK_SIZE, ge=1, le=10000),
+    event_id=Depends(get_event_id),
+    db=Depends(get_db),
+):
+    """Load many reviews from an NDJSON or CSV body (see ingest.py); per-row errors do not abort the load."""
+    format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
     
-    cur.execute("""
+    # Spooled to disk past INGEST_SPOOL_SIZE so large uploads are not held in memory.
+    with tempfile.SpooledTemporaryFile(max_size=INGEST_SPOOL_SIZE) as body:
+        async for part in request.stream():
+            body.write(part)
+        body.seek(0)
+        
+        return await ingest_reviews(db, event_id, text_lines(body), format, chunk_size)
+
+@router.get("/reviews/{seat_id}", response_model=SeatReviewsResponse)
+async def get_seat_review(seat_id: int, event_id=Depends(get_event_id), db=Depends(get_db)):
+    reviews = await db.fetch(f"""
         SELECT 
             r.*,
-            s.seat_number
+            s.seat_number,
+            {REVIEW_ASPECTS_SQL}
         FROM reviews r
-        JOIN seats s ON r.seat_id = s.id
-        WHERE r.seat_id = %s
+        JOIN seats s ON s.event_id = r.event_id AND s.id = r.seat_id
+        WHERE r.event_id = %s AND r.seat_id = %s
         ORDER BY r.created_at DESC;
-    """, (seat_id,))
-    
-    reviews = cur.fetchall()
-    
-    cur.close()
-    conn.close()
+    """, (event_id, seat_id))
     
     if not reviews:
         raise HTTPException(status_code=404, detail="No reviews found for this seat")
     
-    return {
+    return JSONBytesResponse({
         "seat_id": seat_id,
         "reviews": reviews
-    }
+    })
 
-@app.get("/analytics")
-def get_analytics():
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+# Legacy /analytics statistic names for the original aspects' averages.
+ASPECT_STAT_KEYS = {
+    "overall_experience": "avg_overall_score",
+    "sound_quality": "avg_sound_score",
+    "seat_comfort": "avg_comfort_score",
+    "seat_height": "avg_height_score",
+    "view_quality": "avg_view_score",
+    "booking_service": "avg_booking_score",
+    "staff_behavior": "avg_staff_score",
+    "cleanliness": "avg_clean_score",
+    "value_for_money": "avg_value_score",
+}
+
+@router.get("/analytics")
+async def get_analytics(event_id=Depends(get_event_id), db=Depends(get_db)):
+    with span("rollups"):
+        metrics = await read_review_stats(db, event_id)
     
-    cur.execute("""
-        SELECT 
-            COUNT(*) as total_reviews,
-            AVG(overall_sentiment_score) as avg_overall_score,
-            AVG(sound_quality_score) as avg_sound_score,
-            AVG(seat_comfort_score) as avg_comfort_score,
-            AVG(seat_height_score) as avg_height_score,
-            AVG(view_quality_score) as avg_view_score,
-            AVG(booking_service_score) as avg_booking_score,
-            AVG(staff_behavior_score) as avg_staff_score,
-            AVG(cleanliness_score) as avg_clean_score,
-            AVG(value_for_money_score) as avg_value_score,
-            AVG(average_score) as overall_avg_score,
-            COUNT(*) FILTER (WHERE overall_sentiment_label = 'positive') as positive_overall,
-            COUNT(*) FILTER (WHERE overall_sentiment_label = 'negative') as negative_overall,
-            COUNT(*) FILTER (WHERE overall_sentiment_label = 'neutral') as neutral_overall,
-            COUNT(*) FILTER (WHERE overall_rating = 'excellent') as excellent_ratings,
-            COUNT(*) FILTER (WHERE overall_rating = 'good') as good_ratings,
-            COUNT(*) FILTER (WHERE overall_rating = 'average') as average_ratings,
-            COUNT(*) FILTER (WHERE overall_rating = 'poor') as poor_ratings,
-            COUNT(*) FILTER (WHERE overall_rating = 'very_poor') as very_poor_ratings
-        FROM reviews;
-    """)
-    
-    stats = cur.fetchone()
-    
-    cur.execute("""
-        SELECT 
-            overall_sentiment_label as category,
-            COUNT(*) as count
-        FROM reviews
-        GROUP BY overall_sentiment_label;
-    """)
+    def average(metric):
+        total, count = metrics.get(metric, (0.0, 0))
+        return total / count if count else None
+    
+    def count(metric):
+        return metrics.get(metric, (0.0, 0))[1]
     
-    sentiment_breakdown = cur.fetchall()
+    aspects = {aspect: {"reviews": 0, "average_score": average(f"aspect:{aspect}"), "labels": {}} for aspect in ASPECT_NAMES}
+    for metric, (_, value_count) in sorted(metrics.items()):
+        if metric.startswith("label:"):
+            _, aspect, label = metric.split(":", 2)
+            if aspect in aspects:
+                aspects[aspect]["reviews"] += value_count
+                aspects[aspect]["labels"][label] = value_count
     
-    cur.close()
-    conn.close()
+    stats = {"total_reviews": count("reviews")}
+    for aspect, key in ASPECT_STAT_KEYS.items():
+        stats[key] = aspects.get(aspect, {}).get("average_score")
+    stats["overall_avg_score"] = average("average_score")
+    for label in ("positive", "negative", "neutral"):
+        stats[f"{label}_overall"] = aspects[OVERALL_ASPECT]["labels"].get(label, 0)
+    for rating in ("excellent", "good", "average", "poor", "very_poor"):
+        stats[f"{rating}_ratings"] = count(f"rating:{rating}")
     
     return {
         "overall_statistics": stats,
-        "sentiment_breakdown": sentiment_breakdown,
+        "sentiment_breakdown": [
+            {"category": None if label == "none" else label, "count": value_count}
+            for label, value_count in aspects[OVERALL_ASPECT]["labels"].items()
+        ],
         "category_scores": {
-            "sound_quality": round(stats['avg_sound_score'] or 0, 3),
-            "seat_comfort": round(stats['avg_comfort_score'] or 0, 3),
-            "seat_height": round(stats['avg_height_score'] or 0, 3),
-            "view_quality": round(stats['avg_view_score'] or 0, 3),
-            "booking_service": round(stats['avg_booking_score'] or 0, 3),
-            "staff_behavior": round(stats['avg_staff_score'] or 0, 3),
-            "cleanliness": round(stats['avg_clean_score'] or 0, 3),
-            "value_for_money": round(stats['avg_value_score'] or 0, 3)
-        }
+            aspect: round(summary["average_score"] or 0, 3)
+            for aspect, summary in aspects.items()
+            if aspect != OVERALL_ASPECT
+        },
+        "aspects": aspects
+    }
+
+# Bucket width and the default window when ``since`` is not given.
+TIMESERIES_BUCKETS = {
+    "hour": (timedelta(hours=1), timedelta(hours=48)),
+    "day": (timedelta(days=1), timedelta(days=30)),
+}
+
+@router.get("/analytics/timeseries")
+async def get_analytics_timeseries(
+    bucket: str = Query("hour", pattern="^(hour|day)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    event_id=Depends(get_event_id),
+    db=Depends(get_db),
+):
+    width, default_window = TIMESERIES_BUCKETS[bucket]
+    until = naive_utc(until) or naive_utc(datetime.now(timezone.utc))
+    since = naive_utc(since) or until - default_window
+    
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if (until - since) / width > ANALYTICS_TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"At most {ANALYTICS_TIMESERIES_MAX_BUCKETS} buckets per request")
+    
+    with span("rollups"):
+        series = await read_timeseries(db, event_id, bucket, since, until)
+    
+    return {
+        "bucket": bucket,
+        "since": since,
+        "until": until,
+        "series": series
     }
+
+@router.get("/analytics/seats")
+async def get_analytics_seats(
+    after: Optional[int] = Query(None, ge=0, le=2**31 - 1),
+    limit: Optional[int] = Query(None, ge=1),
+    event_id=Depends(get_event_id),
+    db=Depends(get_db),
+):
+    """Per-seat summaries in seat_id order, keyset-paginated on seat_id.
+    
+    Pass the returned ``next_after`` back as ``after`` for the following
+    page. The per-row summaries cover the whole event and come with the
+    first page only.
+    """
+    limit = min(limit or SEAT_STATS_PAGE_SIZE, SEAT_STATS_MAX_PAGE_SIZE)
+    with span("rollups"):
+        seats, next_after = await read_seat_stats(db, event_id, limit, after)
+        page = {"count": len(seats), "limit": limit, "next_after": next_after, "seats": seats}
+        if after is None:
+            page["rows"] = await read_seat_row_stats(db, event_id)
+    
+    return page
+
+@app.get("/stats")
+def get_stats(
+    request: Request,
+    db=Depends(get_db),
+    broadcaster=Depends(get_broadcaster),
+    review_worker=Depends(get_review_worker),
+    seat_holds=Depends(get_seat_holds),
+    admission=Depends(get_admission),
+):
+    return {
+        "pool": db.stats(),
+        "booking_admission": admission.stats(),
+        "seat_cache": request.app.state.seat_caches.stats(),
+        "seat_stream": broadcaster.stats(),
+        "seat_holds": seat_holds.stats(),
+        "review_analysis": review_worker.stats() if review_worker is not None else {"mode": "inline"},
+        "sentiment_cache": review_worker.cache_stats() if review_worker is not None else cache_stats(),
+        "migrations": request.app.state.migrations,
+        "startup": request.app.state.startup,
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(
+    request: Request,
+    db=Depends(get_db),
+    broadcaster=Depends(get_broadcaster),
+    seat_holds=Depends(get_seat_holds),
+    admission=Depends(get_admission),
+):
+    """Prometheus text format: request/phase/query histograms plus the /stats counters as gauges."""
+    return PlainTextResponse(render_metrics({
+        "db_pool": db.stats(),
+        "booking_admission": admission.stats(),
+        "seat_cache": request.app.state.seat_caches.stats(),
+        "seat_stream": broadcaster.stats(),
+        "seat_holds": seat_holds.stats(),
+    }), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def get_ready(request: Request, db=Depends(get_db), review_worker=Depends(get_review_worker)):
+    """503 until the database answers and, unless warmup is off, the sentiment model is loaded."""
+    pool = db.stats()
+    database = {"connections": pool["size"], "min_size": pool["min_size"]}
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.fetchval("SELECT 1;"), READY_DB_TIMEOUT)
+        database.update(state="ready", latency_ms=elapsed_ms(started))
+    except Exception as e:
+        database.update(state="unavailable", error=str(e) or type(e).__name__)
+    
+    sentiment = review_worker.readiness() if review_worker is not None else readiness()
+    ready = database["state"] == "ready" and (SENTIMENT_WARMUP == "off" or sentiment["state"] == "warm")
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "database": database,
+            "sentiment": sentiment,
+            "startup": request.app.state.startup,
+        },
+    )
+
+app.include_router(router, prefix="/events/{event_id:int}")
+app.include_router(router)
@@ -0,0 +1,280 @@
+"""Request timing: per-phase spans, Prometheus histograms and the profiling header.
+
+``MetricsMiddleware`` gives every HTTP request a ``RequestProfile`` in a
+context variable. ``TimedRoute`` labels it with the route template and times
+the endpoint itself; the JSON response class wraps rendering in
+``serialize_span()``. Everything below the handlers reports into the current
+profile through ``span()``/``observe_phase()`` (admission wait, sentiment,
+lock wait) and ``record_query()``/``observe_phase("connection", ...)`` from
+db.py, so a phase costs nothing but a context variable lookup when there is
+no request, e.g. in the background workers.
+
+When the request carries ``X-Profile: 1`` the response gets a
+``Server-Timing`` header with the request's breakdown.
+"""
+
+import bisect
+import contextvars
+import functools
+import inspect
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi.routing import APIRoute
+
+PROFILE_HEADER = b"x-profile"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+UNMATCHED_ROUTE = "<unmatched>"
+NO_ROUTE = "<background>"
+
+
+class Histogram:
+    """A labelled Prometheus histogram; safe to observe from worker threads."""
+
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), count, total) for labels, (counts, count, total) in self._series.items())
+
+        for label_values, counts, count, total in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to finishing its response.",
+    ("method", "route", "status"),
+)
+REQUEST_PHASES = Histogram(
+    "http_request_phase_seconds", "Time a request spent in each phase, summed over the request.",
+    ("route", "phase"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database statements issued per request.",
+    ("route",), buckets=QUERY_COUNT_BUCKETS,
+)
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Database statement execution time, including fetching the rows.",
+    ("route",),
+)
+
+HISTOGRAMS = [REQUEST_DURATION, REQUEST_PHASES, REQUEST_QUERIES, QUERY_DURATION]
+
+
+class RequestProfile:
+    def __init__(self):
+        self.route = UNMATCHED_ROUTE
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.queries = 0
+        self.handler_finished = None
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self):
+        entries = [f"total;dur={(time.perf_counter() - self.started) * 1000:.3f}"]
+        for phase, seconds in self.phases.items():
+            entry = f"{phase};dur={seconds * 1000:.3f}"
+            if phase == "db":
+                entry += f';desc="{self.queries} queries"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+
+_current = contextvars.ContextVar("request_profile", default=None)
+
+
+def observe_phase(phase, seconds):
+    profile = _current.get()
+    if profile is not None:
+        profile.add(phase, seconds)
+
+
+@contextmanager
+def span(phase):
+    """Time the block as ``phase`` of the current request; usable around awaits too."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_phase(phase, time.perf_counter() - started)
+
+
+def record_query(seconds):
+    profile = _current.get()
+    QUERY_DURATION.observe(seconds, profile.route if profile is not None else NO_ROUTE)
+    if profile is not None:
+        profile.queries += 1
+        profile.add("db", seconds)
+
+
+class MetricsMiddleware:
+    """Pure ASGI, so the profile is visible to the whole request (and streaming bodies)."""
+
+    def __init__(self, app, profiling=True):
+        self.app = app
+        self.profiling = profiling
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        wants_profile = self.profiling and any(
+            name == PROFILE_HEADER and value not in (b"", b"0") for name, value in scope["headers"]
+        )
+        status = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if wants_profile:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", profile.server_timing().encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _current.reset(token)
+            REQUEST_DURATION.observe(time.perf_counter() - profile.started, scope["method"], profile.route, str(status))
+            REQUEST_QUERIES.observe(profile.queries, profile.route)
+            for phase, seconds in profile.phases.items():
+                REQUEST_PHASES.observe(seconds, profile.route, phase)
+
+
+def _timed_endpoint(endpoint):
+    # The original is kept so including a router wraps it again rather
+    # than wrapping the wrapper.
+    endpoint = getattr(endpoint, "_untimed", endpoint)
+
+    def start():
+        return _current.get(), time.perf_counter()
+
+    def finish(profile, started):
+        if profile is not None:
+            profile.handler_finished = time.perf_counter()
+            profile.add("handler", profile.handler_finished - started)
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            profile, started = start()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                finish(profile, started)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            profile, started = start()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                finish(profile, started)
+
+    timed._untimed = endpoint
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """Labels the request with its route template before validation, and times the endpoint.
+
+    The label is the template the route was declared with, so a router
+    mounted under several prefixes reports each handler as one series.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        self.route_label = getattr(endpoint, "_route_label", None) or re.sub(r":\w+}", "}", path)
+        endpoint = _timed_endpoint(endpoint)
+        endpoint._route_label = self.route_label
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def labelled(request):
+            profile = _current.get()
+            if profile is not None:
+                profile.route = self.route_label
+            return await handler(request)
+
+        return labelled
+
+
+@contextmanager
+def serialize_span():
+    """Time rendering a response body as ``serialize``.
+
+    If the handler returned plain data, the phase starts when it returned,
+    so FastAPI's encoding of the value counts too.
+    """
+    profile = _current.get()
+    started = time.perf_counter()
+    if profile is not None and profile.handler_finished is not None:
+        started, profile.handler_finished = profile.handler_finished, None
+    try:
+        yield
+    finally:
+        observe_phase("serialize", time.perf_counter() - started)
+
+
+def _flatten(prefix, stats):
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def render_metrics(gauges):
+    """Prometheus text format: the histograms plus ``gauges``, {prefix: stats dict} flattened to numbers."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for prefix, stats in gauges.items():
+        for name, value in _flatten(prefix, stats):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
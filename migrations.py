@@ -0,0 +1,301 @@
+import logging
+import time
+
+from aggregates import (
+    EVENT_REVIEW_STATS_TABLES_SQL,
+    REBUILD_REVIEW_ROLLUPS_SQL,
+    REBUILD_REVIEW_STATS_SQL,
+    REVIEW_STATS_FUNCTION_SQL,
+)
+from events import DEFAULT_EVENT_ID, EVENTS_TABLE_SQL, SEATS_INDEXES_SQL, SEATS_TABLE_SQL, VENUES_TABLE_SQL, seat_partition
+from holds import SEAT_HOLDS_EXPIRY_INDEX_SQL, SEAT_HOLDS_TABLE_SQL
+from realtime import SEAT_CHANGES_FUNCTION_SQL, SEAT_CHANGES_TRIGGER_SQL
+from schema_history import MAINTAINED_REVIEW_STATS_SQL, NARROW_REVIEW_ASPECTS_STATS_SQL, REVIEW_ROLLUPS_SQL
+
+logger = logging.getLogger(__name__)
+
+# Held for the duration of each migration transaction so that workers
+# starting together apply every migration exactly once.
+MIGRATION_LOCK_ID = 0x5EA7_0001
+
+SCHEMA_MIGRATIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        duration_ms FLOAT
+    );
+"""
+
+# The wide per-aspect (text, score, label) columns reviews had before migration 5.
+_LEGACY_ASPECT_COLUMNS_BY_ASPECT = [
+    ("overall_experience", "overall_experience", "overall_sentiment_score", "overall_sentiment_label"),
+    ("sound_quality", "sound_quality_review", "sound_quality_score", "sound_quality_label"),
+    ("seat_comfort", "seat_comfort_review", "seat_comfort_score", "seat_comfort_label"),
+    ("seat_height", "seat_height_review", "seat_height_score", "seat_height_label"),
+    ("view_quality", "view_quality_review", "view_quality_score", "view_quality_label"),
+    ("booking_service", "booking_service_review", "booking_service_score", "booking_service_label"),
+    ("staff_behavior", "staff_behavior_review", "staff_behavior_score", "staff_behavior_label"),
+    ("cleanliness", "cleanliness_review", "cleanliness_score", "cleanliness_label"),
+    ("value_for_money", "value_for_money_review", "value_for_money_score", "value_for_money_label"),
+]
+_LEGACY_ASPECT_COLUMNS = [column for _, *columns in _LEGACY_ASPECT_COLUMNS_BY_ASPECT for column in columns]
+_LEGACY_ASPECT_VALUES = ",\n            ".join(
+    f"('{aspect}', r.{text}, r.{score}, r.{label})" for aspect, text, score, label in _LEGACY_ASPECT_COLUMNS_BY_ASPECT
+)
+
+# (version, name, statements). Append new migrations; never edit applied ones.
+# Definitions shared with other modules (the stats function and its rebuild)
+# only hold what the latest migration using them needs; the statements of
+# earlier migrations that used an older definition are frozen in
+# schema_history.py.
+# The first one uses IF NOT EXISTS throughout so that databases created by the
+# old drop-and-recreate startup are adopted without losing data: their seats
+# and reviews tables predate some columns, which it adds before indexing them.
+MIGRATIONS = [
+    (1, "initial schema", [
+        "CREATE SEQUENCE IF NOT EXISTS seat_map_version_seq;",
+        """
+        CREATE TABLE IF NOT EXISTS seats (
+            id SERIAL PRIMARY KEY,
+            seat_number VARCHAR(10) UNIQUE NOT NULL,
+            status VARCHAR(20) DEFAULT 'available',
+            user_id INTEGER,
+            user_name VARCHAR(100),
+            booked_at TIMESTAMP,
+            version BIGINT NOT NULL DEFAULT nextval('seat_map_version_seq')
+        );
+        """,
+        # A volatile default is evaluated per existing row, so adopted seats
+        # get their versions from the sequence as the column is added.
+        "ALTER TABLE seats ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT nextval('seat_map_version_seq');",
+        "CREATE INDEX IF NOT EXISTS seats_version_idx ON seats (version);",
+        SEAT_CHANGES_FUNCTION_SQL,
+        "DROP TRIGGER IF EXISTS seats_notify_changes ON seats;",
+        SEAT_CHANGES_TRIGGER_SQL,
+        """
+        CREATE TABLE IF NOT EXISTS reviews (
+            review_id SERIAL PRIMARY KEY,
+            seat_id INTEGER REFERENCES seats(id),
+            user_id INTEGER NOT NULL,
+            user_name VARCHAR(100),
+
+            overall_experience TEXT,
+            overall_sentiment_score FLOAT,
+            overall_sentiment_label VARCHAR(20),
+
+            sound_quality_review TEXT,
+            sound_quality_score FLOAT,
+            sound_quality_label VARCHAR(20),
+
+            seat_comfort_review TEXT,
+            seat_comfort_score FLOAT,
+            seat_comfort_label VARCHAR(20),
+
+            seat_height_review TEXT,
+            seat_height_score FLOAT,
+            seat_height_label VARCHAR(20),
+
+            view_quality_review TEXT,
+            view_quality_score FLOAT,
+            view_quality_label VARCHAR(20),
+
+            booking_service_review TEXT,
+            booking_service_score FLOAT,
+            booking_service_label VARCHAR(20),
+
+            staff_behavior_review TEXT,
+            staff_behavior_score FLOAT,
+            staff_behavior_label VARCHAR(20),
+
+            cleanliness_review TEXT,
+            cleanliness_score FLOAT,
+            cleanliness_label VARCHAR(20),
+
+            value_for_money_review TEXT,
+            value_for_money_score FLOAT,
+            value_for_money_label VARCHAR(20),
+
+            average_score FLOAT,
+            overall_rating VARCHAR(20),
+
+            analysis_status VARCHAR(20) DEFAULT 'complete',
+            analyzed_at TIMESTAMP,
+
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        # The old startup analysed every review before inserting it.
+        """
+        ALTER TABLE reviews
+            ADD COLUMN IF NOT EXISTS analysis_status VARCHAR(20) DEFAULT 'complete',
+            ADD COLUMN IF NOT EXISTS analyzed_at TIMESTAMP;
+        """,
+        "UPDATE reviews SET analyzed_at = created_at WHERE analyzed_at IS NULL AND analysis_status = 'complete';",
+        """
+        CREATE TABLE IF NOT EXISTS sentiment_cache (
+            text_hash UUID PRIMARY KEY,
+            backend VARCHAR(20) NOT NULL,
+            backend_version VARCHAR(40) NOT NULL,
+            text TEXT NOT NULL,
+            score FLOAT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        INSERT INTO seats (seat_number)
+        SELECT seat_row || n
+        FROM unnest(ARRAY['A', 'B', 'C']) AS seat_row, generate_series(1, 10) AS n
+        ORDER BY seat_row, n
+        ON CONFLICT (seat_number) DO NOTHING;
+        """,
+    ]),
+    (2, "query indexes", [
+        # Keyset pagination of /reviews.
+        "CREATE INDEX IF NOT EXISTS reviews_created_at_idx ON reviews (created_at, review_id);",
+        # /reviews/{seat_id}, newest first.
+        "CREATE INDEX IF NOT EXISTS reviews_seat_id_idx ON reviews (seat_id, created_at DESC);",
+        # ReviewAnalysisWorker.recover() only ever looks at the few pending rows.
+        "CREATE INDEX IF NOT EXISTS reviews_pending_idx ON reviews (review_id) WHERE analysis_status = 'pending';",
+        "CREATE INDEX IF NOT EXISTS seats_status_idx ON seats (status);",
+        "CREATE INDEX IF NOT EXISTS seats_available_idx ON seats (seat_number) WHERE status = 'available';",
+    ]),
+    (3, "maintained review stats", MAINTAINED_REVIEW_STATS_SQL),
+    (4, "hourly and per-seat review rollups", REVIEW_ROLLUPS_SQL),
+    (5, "narrow review aspects", [
+        """
+        CREATE TABLE IF NOT EXISTS review_aspects (
+            review_id INTEGER NOT NULL REFERENCES reviews(review_id),
+            aspect VARCHAR(50) NOT NULL,
+            text TEXT NOT NULL,
+            score FLOAT,
+            label VARCHAR(20),
+            PRIMARY KEY (review_id, aspect)
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS review_aspects_aspect_idx ON review_aspects (aspect) INCLUDE (score, label);",
+        f"""
+        INSERT INTO review_aspects (review_id, aspect, text, score, label)
+        SELECT r.review_id, v.aspect, v.text, v.score, v.label
+        FROM reviews r
+        CROSS JOIN LATERAL (VALUES
+            {_LEGACY_ASPECT_VALUES}
+        ) AS v(aspect, text, score, label)
+        WHERE v.text IS NOT NULL
+        ON CONFLICT DO NOTHING;
+        """,
+        *(f"ALTER TABLE reviews DROP COLUMN IF EXISTS {column};" for column in _LEGACY_ASPECT_COLUMNS),
+        *NARROW_REVIEW_ASPECTS_STATS_SQL,
+    ]),
+    (6, "seat holds", [
+        SEAT_HOLDS_TABLE_SQL,
+        SEAT_HOLDS_EXPIRY_INDEX_SQL,
+    ]),
+    (7, "events and seats partitioned by event", [
+        VENUES_TABLE_SQL,
+        EVENTS_TABLE_SQL,
+        "INSERT INTO venues (id, name) VALUES (1, 'Main hall') ON CONFLICT DO NOTHING;",
+        f"""
+        INSERT INTO events (id, venue_id, name, seat_count)
+        SELECT {DEFAULT_EVENT_ID}, 1, 'Opening show', COUNT(*) FROM seats
+        ON CONFLICT DO NOTHING;
+        """,
+        "SELECT setval(pg_get_serial_sequence('venues', 'id'), (SELECT MAX(id) FROM venues));",
+        "SELECT setval(pg_get_serial_sequence('events', 'id'), (SELECT MAX(id) FROM events));",
+        # The existing seats table becomes the default event's partition in
+        # place: drop what belongs on the partitioned parent, then attach it.
+        "ALTER TABLE reviews DROP CONSTRAINT IF EXISTS reviews_seat_id_fkey;",
+        "ALTER TABLE seat_holds DROP CONSTRAINT IF EXISTS seat_holds_seat_id_fkey;",
+        "DROP TRIGGER IF EXISTS seats_notify_changes ON seats;",
+        "ALTER TABLE seats DROP CONSTRAINT IF EXISTS seats_pkey;",
+        "ALTER TABLE seats DROP CONSTRAINT IF EXISTS seats_seat_number_key;",
+        "DROP INDEX IF EXISTS seats_version_idx, seats_status_idx, seats_available_idx;",
+        f"ALTER TABLE seats ADD COLUMN event_id INTEGER NOT NULL DEFAULT {DEFAULT_EVENT_ID};",
+        "ALTER TABLE seats ALTER COLUMN event_id DROP DEFAULT;",
+        f"ALTER TABLE seats RENAME TO {seat_partition(DEFAULT_EVENT_ID)};",
+        "ALTER SEQUENCE seats_id_seq OWNED BY NONE;",
+        SEATS_TABLE_SQL,
+        "ALTER SEQUENCE seats_id_seq OWNED BY seats.id;",
+        f"ALTER TABLE seats ATTACH PARTITION {seat_partition(DEFAULT_EVENT_ID)} FOR VALUES IN ({DEFAULT_EVENT_ID});",
+        *SEATS_INDEXES_SQL,
+        SEAT_CHANGES_TRIGGER_SQL,
+        # Reviews and holds carry the event so their seat references (and
+        # every lookup through them) can prune to one partition. A constant
+        # default is a catalog-only change: no rewrite, no stats triggers.
+        f"ALTER TABLE reviews ADD COLUMN event_id INTEGER NOT NULL DEFAULT {DEFAULT_EVENT_ID};",
+        "ALTER TABLE reviews ALTER COLUMN event_id DROP DEFAULT;",
+        "ALTER TABLE reviews ADD FOREIGN KEY (event_id, seat_id) REFERENCES seats (event_id, id);",
+        "DROP INDEX IF EXISTS reviews_created_at_idx;",
+        "CREATE INDEX IF NOT EXISTS reviews_event_created_at_idx ON reviews (event_id, created_at, review_id);",
+        f"ALTER TABLE seat_holds ADD COLUMN event_id INTEGER NOT NULL DEFAULT {DEFAULT_EVENT_ID};",
+        "ALTER TABLE seat_holds ALTER COLUMN event_id DROP DEFAULT;",
+        "ALTER TABLE seat_holds ADD FOREIGN KEY (event_id, seat_id) REFERENCES seats (event_id, id);",
+        # Review stats gain the event as their leading key.
+        "DROP TABLE IF EXISTS review_stats, review_stats_hourly, review_stats_by_seat;",
+        *EVENT_REVIEW_STATS_TABLES_SQL,
+        REVIEW_STATS_FUNCTION_SQL,
+        # Backfill the summary and rollups from the reviews already present.
+        *REBUILD_REVIEW_STATS_SQL,
+        *REBUILD_REVIEW_ROLLUPS_SQL,
+    ]),
+]
+
+
+async def migrate(db, migrations=MIGRATIONS):
+    """Apply pending migrations in order, one transaction each.
+
+    Returns the schema version and the time each applied migration took.
+    """
+    started = time.perf_counter()
+    applied = []
+
+    while True:
+        async with db.transaction() as tx:
+            await tx.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+            await tx.execute(SCHEMA_MIGRATIONS_SQL)
+            current = await tx.fetchval("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations;")
+
+            pending = [migration for migration in migrations if migration[0] > current]
+            if not pending:
+                break
+
+            version, name, statements = pending[0]
+            migration_started = time.perf_counter()
+            for sql in statements:
+                await tx.execute(sql)
+            duration_ms = round((time.perf_counter() - migration_started) * 1000, 3)
+
+            await tx.execute(
+                "INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s);",
+                (version, name, duration_ms),
+            )
+
+        logger.info("Applied migration %d (%s) in %.1f ms", version, name, duration_ms)
+        applied.append({"version": version, "name": name, "duration_ms": duration_ms})
+
+    return {
+        "version": current,
+        "applied": applied,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+async def _main():
+    import json
+    import os
+
+    from db import create_database
+
+    db = create_database(os.environ.get("DB_BACKEND", "sync"), os.environ["DATABASE_URL"], min_size=0, max_size=1)
+    await db.open()
+    try:
+        print(json.dumps(await migrate(db), indent=2))
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
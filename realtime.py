@@ -0,0 +1,198 @@
+import asyncio
+import json
+from datetime import datetime
+
+SEAT_CHANGES_CHANNEL = "seat_changes"
+
+# Fired once per UPDATE statement on seats, so a group booking is a single
+# notification. NOTIFY payloads are capped at 8000 bytes; anything larger is
+# replaced by a resync marker and listeners re-read the seat map instead.
+SEAT_CHANGES_FUNCTION_SQL = f"""
+    CREATE OR REPLACE FUNCTION notify_seat_changes() RETURNS trigger AS $$
+    DECLARE
+        payload TEXT;
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM changed) THEN
+            RETURN NULL;
+        END IF;
+
+        SELECT json_build_object('seats', json_agg(row_to_json(changed)))::text
+        INTO payload
+        FROM changed;
+
+        IF octet_length(payload) > 7900 THEN
+            payload := json_build_object('resync', true)::text;
+        END IF;
+
+        PERFORM pg_notify('{SEAT_CHANGES_CHANNEL}', payload);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+SEAT_CHANGES_TRIGGER_SQL = """
+    CREATE TRIGGER seats_notify_changes
+    AFTER UPDATE ON seats
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_seat_changes();
+"""
+
+RESYNC = object()
+_CLOSED = object()
+
+
+def decode_seat_changes(payload):
+    """Turn a NOTIFY payload into seat rows, or RESYNC if the map must be re-read."""
+    message = json.loads(payload)
+    if message.get("resync"):
+        return RESYNC
+
+    seats = message.get("seats") or []
+    for seat in seats:
+        if seat.get("booked_at"):
+            seat["booked_at"] = datetime.fromisoformat(seat["booked_at"])
+    return seats
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    return json.dumps(data, default=_encode)
+
+
+class Subscription:
+    def __init__(self, broadcaster, event_id, buffer_size):
+        self._broadcaster = broadcaster
+        self.event_id = event_id
+        self._queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = False
+
+    def _offer(self, message):
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _close(self, dropped=False):
+        self.dropped = dropped
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(_CLOSED)
+
+    async def messages(self, heartbeat=None):
+        """Yield (event, version, data) tuples until closed, and None every idle ``heartbeat`` seconds."""
+        while True:
+            try:
+                message = await asyncio.wait_for(self._queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+
+            if message is _CLOSED:
+                return
+            yield message
+
+    def close(self):
+        self._broadcaster._unsubscribe(self)
+
+
+class SeatBroadcaster:
+    """Fans committed seat changes out to the stream subscribers of their event in this worker.
+
+    Each change is JSON-encoded once and offered to every subscriber's bounded
+    queue without awaiting, so publishing never waits on a client. A
+    subscriber whose queue is full is disconnected instead of buffering
+    without limit. Changes are de-duplicated by per-seat version because the
+    same booking arrives both from the local commit and from NOTIFY; they are
+    only tracked for events that currently have subscribers.
+    """
+
+    def __init__(self, buffer_size=64):
+        self.buffer_size = buffer_size
+        self.version = 0
+
+        self._subscribers = {}
+        self._versions = {}
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+        self.subscribed_total = 0
+
+    def subscribe(self, event_id):
+        subscription = Subscription(self, event_id, self.buffer_size)
+        self._subscribers.setdefault(event_id, set()).add(subscription)
+        self._versions.setdefault(event_id, {})
+        self.subscribed_total += 1
+        return subscription
+
+    def _discard(self, subscription):
+        subscribers = self._subscribers.get(subscription.event_id)
+        if subscribers is None or subscription not in subscribers:
+            return False
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.event_id]
+            del self._versions[subscription.event_id]
+        return True
+
+    def _unsubscribe(self, subscription):
+        if self._discard(subscription):
+            subscription._close()
+
+    def publish(self, rows):
+        fresh = {}
+        for row in rows:
+            versions = self._versions.get(row['event_id'])
+            if versions is not None and row['version'] > versions.get(row['id'], 0):
+                versions[row['id']] = row['version']
+                fresh.setdefault(row['event_id'], []).append(row)
+
+        if not fresh:
+            return
+
+        self.version = max(self.version, max(row['version'] for seats in fresh.values() for row in seats))
+        for event_id, seats in fresh.items():
+            self._fan_out(event_id, "seats", {"version": self.version, "seats": seats})
+
+    def publish_resync(self):
+        for event_id in list(self._subscribers):
+            self._fan_out(event_id, "resync", {"version": self.version})
+
+    def _fan_out(self, event_id, event, data):
+        subscribers = self._subscribers.get(event_id)
+        if not subscribers:
+            return
+
+        message = (event, self.version, dumps(data))
+        self.published += 1
+
+        for subscription in list(subscribers):
+            if subscription._offer(message):
+                self.delivered += 1
+            else:
+                self._discard(subscription)
+                subscription._close(dropped=True)
+                self.dropped_subscribers += 1
+
+    def close(self):
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                self._unsubscribe(subscription)
+
+    def stats(self):
+        return {
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "events": len(self._subscribers),
+            "subscribed_total": self.subscribed_total,
+            "buffer_size": self.buffer_size,
+            "version": self.version,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
@@ -0,0 +1,143 @@
+"""JSON encoding and compression of response bodies.
+
+Rows come back from both database backends as plain dicts of str, int,
+float, datetime and None, which orjson encodes directly. Handlers of large
+listings return ``JSONBytesResponse`` themselves so FastAPI's
+``jsonable_encoder`` pass over every row is skipped; their response models
+describe the payload for the docs but are not re-validated. Without orjson
+the stdlib encoder is used with the same output.
+
+``CompressionMiddleware`` compresses single-body responses of at least
+``minimum_size`` bytes with brotli (if installed) or gzip, whichever the
+client prefers. Streaming responses (SSE, NDJSON exports) are left alone.
+"""
+
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+from metrics import serialize_span, span
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+ENCODINGS = ("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if not ORJSON_AVAILABLE and isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(data):
+    # Non-str keys (None, ints) become strings the way the stdlib does it.
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class JSONBytesResponse(JSONResponse):
+    def render(self, content):
+        with serialize_span():
+            return dumps_bytes(content)
+
+
+def choose_encoding(accept_encoding):
+    """The best encoding we support that ``accept_encoding`` allows, or None for identity."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+
+    candidates = [
+        (accepted.get(encoding, accepted.get("*", 0.0)), -rank, encoding)
+        for rank, encoding in enumerate(ENCODINGS)
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(
+            next((value.decode("latin-1") for name, value in scope["headers"] if name == b"accept-encoding"), None)
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether it is worth compressing.
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            initial, start = start, None
+            body = message.get("body", b"")
+            headers = [(name, value) for name, value in initial.get("headers", [])]
+            already_encoded = any(name.lower() == b"content-encoding" for name, value in headers)
+
+            if message.get("more_body") or already_encoded or len(body) < self.minimum_size:
+                await send(initial)
+                await send(message)
+                return
+
+            with span("compress"):
+                body = compress(body, encoding)
+            headers = [(name, value) for name, value in headers if name.lower() != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**initial, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,956 @@
+"""SQL of applied migrations, frozen as it shipped.
+
+The live definitions in aggregates.py keep changing with the schema, but a
+migration that has run somewhere must keep doing exactly what it did, or a
+fresh database ends up different from an upgraded one. When a definition an
+applied migration uses changes, its statements are copied here verbatim
+first. Never edit these; add a migration instead.
+"""
+
+# Migration 3, as of the review summary: the sharded summary table, the
+# trigger function over the wide per-aspect review columns, its statement
+# triggers and the backfill.
+MAINTAINED_REVIEW_STATS_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS review_stats (
+        shard SMALLINT NOT NULL,
+        metric VARCHAR(100) NOT NULL,
+        value_sum FLOAT NOT NULL DEFAULT 0,
+        value_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (shard, metric)
+    );
+""",
+    """
+    CREATE OR REPLACE FUNCTION maintain_review_stats() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            
+        INSERT INTO review_stats (shard, metric, value_sum, value_count)
+        SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+        FROM (SELECT metric, value, 1 AS sign FROM (
+        SELECT m.metric, m.value
+        FROM new_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS new_rows_metrics) AS delta
+        GROUP BY metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY metric
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count;
+    
+        ELSIF TG_OP = 'DELETE' THEN
+            
+        INSERT INTO review_stats (shard, metric, value_sum, value_count)
+        SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+        FROM (SELECT metric, value, -1 AS sign FROM (
+        SELECT m.metric, m.value
+        FROM old_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS old_rows_metrics) AS delta
+        GROUP BY metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY metric
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count;
+    
+        ELSE
+            
+        INSERT INTO review_stats (shard, metric, value_sum, value_count)
+        SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+        FROM (SELECT metric, value, 1 AS sign FROM (
+        SELECT m.metric, m.value
+        FROM new_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS new_rows_metrics UNION ALL SELECT metric, value, -1 AS sign FROM (
+        SELECT m.metric, m.value
+        FROM old_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS old_rows_metrics) AS delta
+        GROUP BY metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY metric
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count;
+    
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+""",
+    """
+    CREATE TRIGGER reviews_stats_insert AFTER INSERT ON reviews
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_review_stats();
+    """,
+    """
+    CREATE TRIGGER reviews_stats_update AFTER UPDATE ON reviews
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_review_stats();
+    """,
+    """
+    CREATE TRIGGER reviews_stats_delete AFTER DELETE ON reviews
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_review_stats();
+    """,
+    "LOCK TABLE reviews IN SHARE MODE;",
+    "DELETE FROM review_stats;",
+    """
+    INSERT INTO review_stats (shard, metric, value_sum, value_count)
+    SELECT 0, metric, COALESCE(SUM(value), 0), COUNT(*)
+    FROM (
+        SELECT m.metric, m.value
+        FROM reviews r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS review_metrics
+    GROUP BY metric;
+    """,
+]
+
+# Migration 4, as of the hourly and per-seat rollups: their tables, the
+# trigger function feeding all three tables and the rollup backfill.
+REVIEW_ROLLUPS_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS review_stats_hourly (
+        bucket TIMESTAMP NOT NULL,
+        shard SMALLINT NOT NULL,
+        metric VARCHAR(100) NOT NULL,
+        value_sum FLOAT NOT NULL DEFAULT 0,
+        value_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket, shard, metric)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS review_stats_by_seat (
+        seat_id INTEGER NOT NULL,
+        metric VARCHAR(100) NOT NULL,
+        value_sum FLOAT NOT NULL DEFAULT 0,
+        value_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (seat_id, metric)
+    );
+    """,
+    """
+    CREATE OR REPLACE FUNCTION maintain_review_stats() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            
+        WITH delta AS (
+            SELECT seat_id, bucket, metric, value, 1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM new_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS new_rows_metrics
+        ), summary AS (
+            INSERT INTO review_stats (shard, metric, value_sum, value_count)
+            SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY metric
+            
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count
+    
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+            SELECT seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+            GROUP BY seat_id, metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY seat_id, metric
+            
+        ON CONFLICT (seat_id, metric) DO UPDATE SET
+            value_sum = review_stats_by_seat.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_by_seat.value_count + EXCLUDED.value_count
+    
+        )
+        INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+        SELECT bucket, pg_backend_pid() % 4, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+        GROUP BY bucket, metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY bucket, metric
+        
+        ON CONFLICT (bucket, shard, metric) DO UPDATE SET
+            value_sum = review_stats_hourly.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_hourly.value_count + EXCLUDED.value_count
+    ;
+    
+        ELSIF TG_OP = 'DELETE' THEN
+            
+        WITH delta AS (
+            SELECT seat_id, bucket, metric, value, -1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM old_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS old_rows_metrics
+        ), summary AS (
+            INSERT INTO review_stats (shard, metric, value_sum, value_count)
+            SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY metric
+            
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count
+    
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+            SELECT seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+            GROUP BY seat_id, metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY seat_id, metric
+            
+        ON CONFLICT (seat_id, metric) DO UPDATE SET
+            value_sum = review_stats_by_seat.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_by_seat.value_count + EXCLUDED.value_count
+    
+        )
+        INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+        SELECT bucket, pg_backend_pid() % 4, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+        GROUP BY bucket, metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY bucket, metric
+        
+        ON CONFLICT (bucket, shard, metric) DO UPDATE SET
+            value_sum = review_stats_hourly.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_hourly.value_count + EXCLUDED.value_count
+    ;
+    
+        ELSE
+            
+        WITH delta AS (
+            SELECT seat_id, bucket, metric, value, 1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM new_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS new_rows_metrics UNION ALL SELECT seat_id, bucket, metric, value, -1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM old_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS old_rows_metrics
+        ), summary AS (
+            INSERT INTO review_stats (shard, metric, value_sum, value_count)
+            SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY metric
+            
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count
+    
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+            SELECT seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+            GROUP BY seat_id, metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY seat_id, metric
+            
+        ON CONFLICT (seat_id, metric) DO UPDATE SET
+            value_sum = review_stats_by_seat.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_by_seat.value_count + EXCLUDED.value_count
+    
+        )
+        INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+        SELECT bucket, pg_backend_pid() % 4, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+        GROUP BY bucket, metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY bucket, metric
+        
+        ON CONFLICT (bucket, shard, metric) DO UPDATE SET
+            value_sum = review_stats_hourly.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_hourly.value_count + EXCLUDED.value_count
+    ;
+    
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+""",
+    "LOCK TABLE reviews IN SHARE MODE;",
+    "DELETE FROM review_stats_by_seat;",
+    "DELETE FROM review_stats_hourly;",
+    """
+    INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+    SELECT seat_id, metric, COALESCE(SUM(value), 0), COUNT(*)
+    FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM reviews r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS review_metrics
+    WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+    GROUP BY seat_id, metric;
+    """,
+    """
+    INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+    SELECT bucket, 0, metric, COALESCE(SUM(value), 0), COUNT(*)
+    FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM reviews r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('aspect:overall_experience', r.overall_sentiment_score),
+                ('aspect:sound_quality', r.sound_quality_score),
+                ('aspect:seat_comfort', r.seat_comfort_score),
+                ('aspect:seat_height', r.seat_height_score),
+                ('aspect:view_quality', r.view_quality_score),
+                ('aspect:booking_service', r.booking_service_score),
+                ('aspect:staff_behavior', r.staff_behavior_score),
+                ('aspect:cleanliness', r.cleanliness_score),
+                ('aspect:value_for_money', r.value_for_money_score),
+                ('overall_label:' || COALESCE(r.overall_sentiment_label, 'none'), 0.0::float8),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS review_metrics
+    WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+    GROUP BY bucket, metric;
+    """,
+]
+
+# Migration 5, as of the narrow review_aspects table: after moving the aspect
+# columns out of reviews, the trigger function reading aspects from
+# review_aspects, that table's statement triggers and the rebuild of the
+# summary and both rollups.
+NARROW_REVIEW_ASPECTS_STATS_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION maintain_review_stats() RETURNS trigger AS $$
+    BEGIN
+        IF TG_TABLE_NAME = 'reviews' THEN
+            IF TG_OP = 'INSERT' THEN
+                
+        WITH delta AS (
+            SELECT seat_id, bucket, metric, value, 1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM new_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+     UNION ALL 
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM review_aspects a
+        JOIN new_rows r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS metric_rows
+        ), summary AS (
+            INSERT INTO review_stats (shard, metric, value_sum, value_count)
+            SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY metric
+            
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count
+    
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+            SELECT seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+            GROUP BY seat_id, metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY seat_id, metric
+            
+        ON CONFLICT (seat_id, metric) DO UPDATE SET
+            value_sum = review_stats_by_seat.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_by_seat.value_count + EXCLUDED.value_count
+    
+        )
+        INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+        SELECT bucket, pg_backend_pid() % 4, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+        GROUP BY bucket, metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY bucket, metric
+        
+        ON CONFLICT (bucket, shard, metric) DO UPDATE SET
+            value_sum = review_stats_hourly.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_hourly.value_count + EXCLUDED.value_count
+    ;
+    
+            ELSIF TG_OP = 'DELETE' THEN
+                
+        WITH delta AS (
+            SELECT seat_id, bucket, metric, value, -1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM old_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+     UNION ALL 
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM review_aspects a
+        JOIN old_rows r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS metric_rows
+        ), summary AS (
+            INSERT INTO review_stats (shard, metric, value_sum, value_count)
+            SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY metric
+            
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count
+    
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+            SELECT seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+            GROUP BY seat_id, metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY seat_id, metric
+            
+        ON CONFLICT (seat_id, metric) DO UPDATE SET
+            value_sum = review_stats_by_seat.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_by_seat.value_count + EXCLUDED.value_count
+    
+        )
+        INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+        SELECT bucket, pg_backend_pid() % 4, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+        GROUP BY bucket, metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY bucket, metric
+        
+        ON CONFLICT (bucket, shard, metric) DO UPDATE SET
+            value_sum = review_stats_hourly.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_hourly.value_count + EXCLUDED.value_count
+    ;
+    
+            ELSE
+                
+        WITH delta AS (
+            SELECT seat_id, bucket, metric, value, 1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM new_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+     UNION ALL 
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM review_aspects a
+        JOIN new_rows r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS metric_rows UNION ALL SELECT seat_id, bucket, metric, value, -1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM old_rows r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+     UNION ALL 
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM review_aspects a
+        JOIN old_rows r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS metric_rows
+        ), summary AS (
+            INSERT INTO review_stats (shard, metric, value_sum, value_count)
+            SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY metric
+            
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count
+    
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+            SELECT seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+            GROUP BY seat_id, metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY seat_id, metric
+            
+        ON CONFLICT (seat_id, metric) DO UPDATE SET
+            value_sum = review_stats_by_seat.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_by_seat.value_count + EXCLUDED.value_count
+    
+        )
+        INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+        SELECT bucket, pg_backend_pid() % 4, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+        GROUP BY bucket, metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY bucket, metric
+        
+        ON CONFLICT (bucket, shard, metric) DO UPDATE SET
+            value_sum = review_stats_hourly.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_hourly.value_count + EXCLUDED.value_count
+    ;
+    
+            END IF;
+        ELSE
+            IF TG_OP = 'INSERT' THEN
+                
+        WITH delta AS (
+            SELECT seat_id, bucket, metric, value, 1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM new_rows a
+        JOIN reviews r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS metric_rows
+        ), summary AS (
+            INSERT INTO review_stats (shard, metric, value_sum, value_count)
+            SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY metric
+            
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count
+    
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+            SELECT seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+            GROUP BY seat_id, metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY seat_id, metric
+            
+        ON CONFLICT (seat_id, metric) DO UPDATE SET
+            value_sum = review_stats_by_seat.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_by_seat.value_count + EXCLUDED.value_count
+    
+        )
+        INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+        SELECT bucket, pg_backend_pid() % 4, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+        GROUP BY bucket, metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY bucket, metric
+        
+        ON CONFLICT (bucket, shard, metric) DO UPDATE SET
+            value_sum = review_stats_hourly.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_hourly.value_count + EXCLUDED.value_count
+    ;
+    
+            ELSIF TG_OP = 'DELETE' THEN
+                
+        WITH delta AS (
+            SELECT seat_id, bucket, metric, value, -1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM old_rows a
+        JOIN reviews r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS metric_rows
+        ), summary AS (
+            INSERT INTO review_stats (shard, metric, value_sum, value_count)
+            SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY metric
+            
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count
+    
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+            SELECT seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+            GROUP BY seat_id, metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY seat_id, metric
+            
+        ON CONFLICT (seat_id, metric) DO UPDATE SET
+            value_sum = review_stats_by_seat.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_by_seat.value_count + EXCLUDED.value_count
+    
+        )
+        INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+        SELECT bucket, pg_backend_pid() % 4, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+        GROUP BY bucket, metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY bucket, metric
+        
+        ON CONFLICT (bucket, shard, metric) DO UPDATE SET
+            value_sum = review_stats_hourly.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_hourly.value_count + EXCLUDED.value_count
+    ;
+    
+            ELSE
+                
+        WITH delta AS (
+            SELECT seat_id, bucket, metric, value, 1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM new_rows a
+        JOIN reviews r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS metric_rows UNION ALL SELECT seat_id, bucket, metric, value, -1 AS sign FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM old_rows a
+        JOIN reviews r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS metric_rows
+        ), summary AS (
+            INSERT INTO review_stats (shard, metric, value_sum, value_count)
+            SELECT pg_backend_pid() % 16, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            GROUP BY metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY metric
+            
+        ON CONFLICT (shard, metric) DO UPDATE SET
+            value_sum = review_stats.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats.value_count + EXCLUDED.value_count
+    
+        ), by_seat AS (
+            INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+            SELECT seat_id, metric, SUM(sign * value), SUM(sign)
+            FROM delta
+            WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+            GROUP BY seat_id, metric
+            HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+            ORDER BY seat_id, metric
+            
+        ON CONFLICT (seat_id, metric) DO UPDATE SET
+            value_sum = review_stats_by_seat.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_by_seat.value_count + EXCLUDED.value_count
+    
+        )
+        INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+        SELECT bucket, pg_backend_pid() % 4, metric, SUM(sign * value), SUM(sign)
+        FROM delta
+        WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+        GROUP BY bucket, metric
+        HAVING SUM(sign * value) <> 0 OR SUM(sign) <> 0
+        ORDER BY bucket, metric
+        
+        ON CONFLICT (bucket, shard, metric) DO UPDATE SET
+            value_sum = review_stats_hourly.value_sum + EXCLUDED.value_sum,
+            value_count = review_stats_hourly.value_count + EXCLUDED.value_count
+    ;
+    
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+""",
+    """
+        CREATE TRIGGER review_aspects_stats_insert AFTER INSERT ON review_aspects
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_review_stats();
+        """,
+    """
+        CREATE TRIGGER review_aspects_stats_update AFTER UPDATE ON review_aspects
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_review_stats();
+        """,
+    """
+        CREATE TRIGGER review_aspects_stats_delete AFTER DELETE ON review_aspects
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_review_stats();
+        """,
+    "LOCK TABLE reviews IN SHARE MODE;",
+    "DELETE FROM review_stats;",
+    """
+    INSERT INTO review_stats (shard, metric, value_sum, value_count)
+    SELECT 0, metric, COALESCE(SUM(value), 0), COUNT(*)
+    FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM reviews r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+     UNION ALL 
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM review_aspects a
+        JOIN reviews r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS review_metrics
+    GROUP BY metric;
+    """,
+    "LOCK TABLE reviews IN SHARE MODE;",
+    "DELETE FROM review_stats_by_seat;",
+    "DELETE FROM review_stats_hourly;",
+    """
+    INSERT INTO review_stats_by_seat (seat_id, metric, value_sum, value_count)
+    SELECT seat_id, metric, COALESCE(SUM(value), 0), COUNT(*)
+    FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM reviews r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+     UNION ALL 
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM review_aspects a
+        JOIN reviews r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS review_metrics
+    WHERE seat_id IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+    GROUP BY seat_id, metric;
+    """,
+    """
+    INSERT INTO review_stats_hourly (bucket, shard, metric, value_sum, value_count)
+    SELECT bucket, 0, metric, COALESCE(SUM(value), 0), COUNT(*)
+    FROM (
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM reviews r
+        CROSS JOIN LATERAL (VALUES
+                ('reviews', 0.0::float8),
+                ('average_score', r.average_score),
+                ('rating:' || COALESCE(r.overall_rating, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+     UNION ALL 
+        SELECT r.seat_id, date_trunc('hour', r.created_at) AS bucket, m.metric, m.value
+        FROM review_aspects a
+        JOIN reviews r ON r.review_id = a.review_id
+        CROSS JOIN LATERAL (VALUES
+                ('aspect:' || a.aspect, a.score),
+                ('label:' || a.aspect || ':' || COALESCE(a.label, 'none'), 0.0::float8)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL
+    ) AS review_metrics
+    WHERE bucket IS NOT NULL AND (metric IN ('reviews', 'average_score') OR metric LIKE 'aspect:%')
+    GROUP BY bucket, metric;
+    """,
+]
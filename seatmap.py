@@ -0,0 +1,243 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+SEAT_COLUMNS = ("id", "seat_number", "status", "user_id", "user_name", "booked_at")
+
+
+class SeatMapCache:
+    """In-process copy of one event's seat map with precomputed availability counts.
+
+    Every write to ``seats`` stamps the row with ``nextval('seat_map_version_seq')``,
+    so ``max(version)`` is a cheap, cluster-wide version of the whole map.
+    Local bookings are applied in place as soon as they commit; once the
+    snapshot is older than ``ttl`` seconds it is revalidated against the
+    database and only rows with a newer version are re-read, which picks up
+    bookings made by other workers.
+
+    Sequence values are handed out before commit, so a slow transaction can
+    become visible after a higher version was already read. Each delta
+    therefore starts from the version synced one revalidation earlier, and
+    the whole map is reloaded every ``full_reload_interval`` seconds.
+    """
+
+    def __init__(self, event_id, ttl=1.0, full_reload_interval=60.0):
+        self.event_id = event_id
+        self.ttl = ttl
+        self.full_reload_interval = full_reload_interval
+        self.version = 0
+
+        self._seats = []
+        self._by_id = {}
+        self._versions = {}
+        self._available = 0
+        self._held = 0
+        self._loaded = False
+        self._checked_at = 0.0
+        self._reloaded_at = 0.0
+        self._synced_version = 0
+        self._delta_floor = 0
+        self._refresh_lock = asyncio.Lock()
+        self._rendered = {}
+
+        self.hits = 0
+        self.revalidations = 0
+        self.delta_refreshes = 0
+        self.full_reloads = 0
+        self.local_updates = 0
+
+    @property
+    def available(self):
+        return self._available
+
+    @property
+    def held(self):
+        return self._held
+
+    @property
+    def seats(self):
+        return self._seats
+
+    def _is_fresh(self):
+        return self._loaded and time.monotonic() - self._checked_at < self.ttl
+
+    async def get(self, db):
+        if self._is_fresh():
+            self.hits += 1
+            return self
+
+        async with self._refresh_lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self
+
+            if not self._loaded or time.monotonic() - self._reloaded_at >= self.full_reload_interval:
+                await self._reload(db)
+            else:
+                await self._revalidate(db)
+
+            self._checked_at = time.monotonic()
+
+        return self
+
+    async def _reload(self, db):
+        rows = await db.fetch("SELECT * FROM seats WHERE event_id = %s ORDER BY seat_number;", (self.event_id,))
+
+        self._seats = [{column: row[column] for column in SEAT_COLUMNS} for row in rows]
+        self._by_id = {seat['id']: seat for seat in self._seats}
+        self._versions = {row['id']: row['version'] for row in rows}
+        self._available = sum(1 for seat in self._seats if seat['status'] == 'available')
+        self._held = sum(1 for seat in self._seats if seat['status'] == 'held')
+        self.version = max(self._versions.values(), default=0)
+        self._synced_version = self._delta_floor = self.version
+        self._loaded = True
+        self._reloaded_at = time.monotonic()
+        self._rendered.clear()
+        self.full_reloads += 1
+
+    async def _revalidate(self, db):
+        self.revalidations += 1
+
+        latest = await db.fetchval(
+            "SELECT COALESCE(MAX(version), 0) AS version FROM seats WHERE event_id = %s;", (self.event_id,)
+        )
+        if latest <= self._delta_floor:
+            return
+
+        rows = await db.fetch(
+            "SELECT * FROM seats WHERE event_id = %s AND version > %s;", (self.event_id, self._delta_floor)
+        )
+        if any(row['id'] not in self._by_id for row in rows):
+            await self._reload(db)
+            return
+
+        self._merge(rows)
+        self._delta_floor, self._synced_version = self._synced_version, latest
+        self.delta_refreshes += 1
+
+    def invalidate(self):
+        self._loaded = False
+
+    @property
+    def etag(self):
+        return f'"seats-{self.event_id}-{self.version}"'
+
+    def rendered(self, key, render):
+        """``render()``, memoized under ``key`` until the map next changes (e.g. the encoded /seats body)."""
+        body = self._rendered.get(key)
+        if body is None:
+            body = self._rendered[key] = render()
+        return body
+
+    def changes_since(self, version):
+        return [seat for seat in self._seats if self._versions[seat['id']] > version]
+
+    def apply(self, rows):
+        self.local_updates += self._merge(rows)
+
+    def _merge(self, rows):
+        merged = 0
+        for row in rows:
+            seat = self._by_id.get(row['id'])
+            if seat is None:
+                # A seat this worker has never seen; let the next read reload.
+                self._loaded = False
+                continue
+
+            if row['version'] <= self._versions.get(row['id'], 0):
+                continue
+
+            was_available, was_held = seat['status'] == 'available', seat['status'] == 'held'
+            for column in SEAT_COLUMNS:
+                seat[column] = row[column]
+            self._available += (seat['status'] == 'available') - was_available
+            self._held += (seat['status'] == 'held') - was_held
+
+            self._versions[row['id']] = row['version']
+            self.version = max(self.version, row['version'])
+            merged += 1
+
+        if merged:
+            self._rendered.clear()
+        return merged
+
+    def stats(self):
+        requests = self.hits + self.revalidations + self.full_reloads
+        return {
+            "event_id": self.event_id,
+            "version": self.version,
+            "seats": len(self._seats),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "delta_refreshes": self.delta_refreshes,
+            "full_reloads": self.full_reloads,
+            "local_updates": self.local_updates,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+        }
+
+
+class SeatMapCaches:
+    """One ``SeatMapCache`` per event, created on first use.
+
+    Only the ``max_events`` most recently used events stay cached, so
+    thousands of events cost memory only for the ones being browsed. A new
+    event's map joins them only if it has seats, so requests for events that
+    do not exist cannot evict the real ones. Changes are routed to the cache
+    of the seat's event, if it is cached at all.
+    """
+
+    def __init__(self, max_events=100, **cache_options):
+        self.max_events = max_events
+        self.cache_options = cache_options
+        self._caches = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, event_id, db):
+        """The event's seat map, loaded or revalidated as ``SeatMapCache.get`` does; no seats means no event."""
+        cache = self._caches.get(event_id)
+        if cache is not None:
+            self._caches.move_to_end(event_id)
+            return await cache.get(db)
+
+        cache = await SeatMapCache(event_id, **self.cache_options).get(db)
+        if not cache.seats:
+            return cache
+
+        # Another request may have cached the event while this one loaded it.
+        if event_id in self._caches:
+            return self._caches[event_id]
+        self._caches[event_id] = cache
+        if len(self._caches) > self.max_events:
+            self._caches.popitem(last=False)
+            self.evictions += 1
+        return cache
+
+    def apply(self, rows):
+        by_event = {}
+        for row in rows:
+            by_event.setdefault(row['event_id'], []).append(row)
+        for event_id, event_rows in by_event.items():
+            cache = self._caches.get(event_id)
+            if cache is not None:
+                cache.apply(event_rows)
+
+    def invalidate(self):
+        for cache in self._caches.values():
+            cache.invalidate()
+
+    def stats(self):
+        caches = [cache.stats() for cache in self._caches.values()]
+        totals = {
+            key: sum(cache[key] for cache in caches)
+            for key in ("seats", "hits", "revalidations", "delta_refreshes", "full_reloads", "local_updates")
+        }
+        requests = totals["hits"] + totals["revalidations"] + totals["full_reloads"]
+        return {
+            "events": len(caches),
+            "max_events": self.max_events,
+            "evictions": self.evictions,
+            "ttl_seconds": self.cache_options.get("ttl"),
+            **totals,
+            "hit_rate": round(totals["hits"] / requests, 4) if requests else 0.0,
+        }
@@ -0,0 +1,450 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict, defaultdict
+from importlib import metadata, util
+
+# TextBlob pulls in NLTK, a few hundred milliseconds of imports; it is only
+# looked up here and imported when the backend first scores something.
+_TEXTBLOB_SPEC = util.find_spec("textblob")
+TEXTBLOB_AVAILABLE = _TEXTBLOB_SPEC is not None
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_BACKEND = os.environ.get("SENTIMENT_BACKEND", "textblob")
+SENTIMENT_CACHE_SIZE = int(os.environ.get("SENTIMENT_CACHE_SIZE", "10000"))
+SENTIMENT_CACHE_MAX_TEXT_LENGTH = int(os.environ.get("SENTIMENT_CACHE_MAX_TEXT_LENGTH", "280"))
+SENTIMENT_CACHE_PERSIST = os.environ.get("SENTIMENT_CACHE_PERSIST", "0") == "1"
+
+WARMUP_TEXT = "The view was great but the seats were not comfortable."
+
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+def label_for(score):
+    if score > POSITIVE_THRESHOLD:
+        return "positive"
+    elif score < NEGATIVE_THRESHOLD:
+        return "negative"
+    else:
+        return "neutral"
+
+class SentimentBackend:
+    """Scores a batch of non-empty texts to polarities in [-1.0, 1.0]."""
+
+    name = None
+    version = "1"
+
+    def score_batch(self, texts):
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Load whatever the first real score would, off the request path."""
+        self.score_batch([WARMUP_TEXT])
+
+class TextBlobBackend(SentimentBackend):
+    name = "textblob"
+
+    def __init__(self):
+        self.version = metadata.version("textblob") if TEXTBLOB_AVAILABLE else "unavailable"
+        self._blob = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._blob is None:
+            with self._lock:
+                if self._blob is None:
+                    from textblob import TextBlob
+                    self._blob = TextBlob
+        return self._blob
+
+    def score_batch(self, texts):
+        if not TEXTBLOB_AVAILABLE:
+            return [0.0] * len(texts)
+
+        TextBlob = self._load()
+        scores = []
+        for text in texts:
+            try:
+                scores.append(TextBlob(text).sentiment.polarity)
+            except Exception:
+                logger.exception("TextBlob could not score %r; treating it as neutral", text[:80])
+                scores.append(0.0)
+        return scores
+
+# Used when TextBlob's adjective lexicon is not installed.
+FALLBACK_LEXICON = {
+    "amazing": 0.6, "awesome": 1.0, "bad": -0.7, "best": 1.0, "brilliant": 0.9,
+    "broken": -0.4, "clean": 0.37, "comfortable": 0.4, "cramped": -0.4, "dirty": -0.6,
+    "disappointing": -0.6, "excellent": 1.0, "fantastic": 0.4, "fine": 0.42, "friendly": 0.38,
+    "good": 0.7, "great": 0.8, "happy": 0.8, "horrible": -1.0, "loud": 0.1,
+    "love": 0.5, "loved": 0.7, "nice": 0.6, "ok": 0.5, "okay": 0.5,
+    "overpriced": -0.5, "perfect": 1.0, "poor": -0.4, "rude": -0.3, "terrible": -1.0,
+    "uncomfortable": -0.5, "wonderful": 1.0, "worst": -1.0, "awful": -1.0, "slow": -0.3,
+}
+
+NEGATIONS = frozenset(("no", "not", "n't", "never"))
+TOKEN_PATTERN = re.compile(r"n't|[a-z]+(?:'[a-z]+)?")
+
+def load_textblob_lexicon():
+    """Average polarity per word form from TextBlob's bundled en-sentiment.xml."""
+    if not TEXTBLOB_AVAILABLE:
+        return None
+
+    path = os.path.join(os.path.dirname(_TEXTBLOB_SPEC.origin), "en", "en-sentiment.xml")
+    if not os.path.exists(path):
+        return None
+
+    polarities = defaultdict(list)
+    for word in ElementTree.parse(path).getroot().iter("word"):
+        polarities[word.attrib["form"].lower()].append(float(word.attrib.get("polarity", 0.0)))
+    return {form: sum(values) / len(values) for form, values in polarities.items()}
+
+class LexiconBackend(SentimentBackend):
+    """Token lookup scorer: mean polarity of known words, negations flip and damp.
+
+    A whole batch is tokenized into one flat array of word ids and reduced
+    per text with ``numpy.bincount``, so the per-text Python overhead is just
+    tokenization. Falls back to a plain loop when NumPy is missing.
+    """
+
+    name = "lexicon"
+
+    def __init__(self, lexicon=None):
+        lexicon = lexicon or load_textblob_lexicon() or FALLBACK_LEXICON
+        self.version = f"1-{len(lexicon)}"
+        self.lexicon = lexicon
+
+        self._ids = {word: index for index, word in enumerate(lexicon)}
+        self._unknown = len(self._ids)
+        if NUMPY_AVAILABLE:
+            self._polarity = np.array(list(lexicon.values()) + [0.0])
+
+    def _tokenize(self, text):
+        return TOKEN_PATTERN.findall(text.lower())
+
+    def score_batch(self, texts):
+        if not NUMPY_AVAILABLE:
+            return [self._score_one(text) for text in texts]
+
+        ids, docs, negated = [], [], []
+        for doc, text in enumerate(texts):
+            previous = None
+            for token in self._tokenize(text):
+                ids.append(self._ids.get(token, self._unknown))
+                docs.append(doc)
+                negated.append(previous in NEGATIONS)
+                previous = token
+
+        if not ids:
+            return [0.0] * len(texts)
+
+        ids = np.asarray(ids)
+        docs = np.asarray(docs)
+        polarity = self._polarity[ids] * np.where(negated, -0.5, 1.0)
+        known = (ids != self._unknown).astype(float)
+
+        totals = np.bincount(docs, weights=polarity * known, minlength=len(texts))
+        counts = np.bincount(docs, weights=known, minlength=len(texts))
+        scores = np.divide(totals, counts, out=np.zeros(len(texts)), where=counts > 0)
+        return np.clip(scores, -1.0, 1.0).tolist()
+
+    def _score_one(self, text):
+        total, count, previous = 0.0, 0, None
+        for token in self._tokenize(text):
+            if token in self.lexicon:
+                total += self.lexicon[token] * (-0.5 if previous in NEGATIONS else 1.0)
+                count += 1
+            previous = token
+        return max(-1.0, min(1.0, total / count)) if count else 0.0
+
+BACKENDS = {
+    "textblob": TextBlobBackend,
+    "lexicon": LexiconBackend,
+}
+
+def create_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown SENTIMENT_BACKEND {name!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+def normalize_text(text):
+    return " ".join(text.lower().split())
+
+class PostgresSentimentStore:
+    """Scores shared by every worker and kept across restarts in ``sentiment_cache``."""
+
+    def __init__(self, dsn, max_connections=4):
+        from db import DatabasePool
+
+        self.pool = DatabasePool(dsn, min_size=0, max_size=max_connections)
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.md5("\x1f".join(key).encode()).hexdigest()
+
+    def get_many(self, keys):
+        digests = {self._digest(key): key for key in keys}
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT text_hash::text, score FROM sentiment_cache WHERE text_hash = ANY(%s::uuid[]);",
+                (list(digests),),
+            )
+            return {digests[text_hash.replace("-", "")]: score for text_hash, score in cur.fetchall()}
+
+    def put_many(self, items):
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.executemany(
+                """
+                INSERT INTO sentiment_cache (text_hash, backend, backend_version, text, score)
+                VALUES (%s::uuid, %s, %s, %s, %s)
+                ON CONFLICT (text_hash) DO NOTHING;
+                """,
+                [(self._digest(key), key[0], key[1], key[2], score) for key, score in items.items()],
+            )
+            conn.commit()
+
+class SentimentCache:
+    """Thread-safe LRU of polarity scores keyed by (backend, version, normalized text).
+
+    Misses fall through to the optional persistent ``store`` before the
+    backend runs; texts longer than ``max_text_length`` are never cached
+    since long reviews rarely repeat.
+    """
+
+    def __init__(self, max_size=10000, max_text_length=280, store=None):
+        self.max_size = max_size
+        self.max_text_length = max_text_length
+        self.store = store
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.store_errors = 0
+
+    def cacheable(self, text):
+        return len(text) <= self.max_text_length
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            self.hits += len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.store is not None:
+            try:
+                stored = self.store.get_many(missing)
+            except Exception:
+                logger.exception("Sentiment cache store lookup failed")
+                self.store_errors += 1
+                stored = {}
+            self._remember(stored)
+            found.update(stored)
+            with self._lock:
+                self.store_hits += len(stored)
+
+        with self._lock:
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        self._remember(items)
+        if items and self.store is not None:
+            try:
+                self.store.put_many(items)
+            except Exception:
+                logger.exception("Sentiment cache store write failed")
+                self.store_errors += 1
+
+    def _remember(self, items):
+        with self._lock:
+            for key, score in items.items():
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "max_text_length": self.max_text_length,
+                "persistent": self.store is not None,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "store_errors": self.store_errors,
+                "hit_rate": round((self.hits + self.store_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+class SentimentEngine:
+    """Scores many texts per call; empty texts are neutral without reaching the backend."""
+
+    def __init__(self, backend, cache=None):
+        self.backend = backend
+        self.cache = cache
+
+    def score(self, texts):
+        results = [(0.0, "neutral")] * len(texts)
+
+        pending = [(index, text) for index, text in enumerate(texts) if text]
+        if not pending:
+            return results
+
+        scores = {}
+        keys = {}
+        if self.cache is not None:
+            for index, text in pending:
+                if self.cache.cacheable(text):
+                    keys[index] = (self.backend.name, self.backend.version, normalize_text(text))
+            cached = self.cache.get_many(list(set(keys.values())))
+            scores = {index: cached[key] for index, key in keys.items() if key in cached}
+
+        to_score = {}
+        for index, text in pending:
+            if index not in scores:
+                to_score.setdefault(keys.get(index, text), []).append(index)
+
+        if to_score:
+            groups = list(to_score.items())
+            texts_to_score = [texts[indexes[0]] for _, indexes in groups]
+            fresh = self.backend.score_batch(texts_to_score)
+
+            for (key, indexes), score in zip(groups, fresh):
+                for index in indexes:
+                    scores[index] = score
+
+            if self.cache is not None:
+                self.cache.put_many({key: score for (key, _), score in zip(groups, fresh) if isinstance(key, tuple)})
+
+        for index, _ in pending:
+            results[index] = (scores[index], label_for(scores[index]))
+
+        return results
+
+_engine = None
+_engine_lock = threading.Lock()
+_warmup = {"state": "cold", "seconds": None}
+
+def create_cache():
+    if SENTIMENT_CACHE_SIZE <= 0:
+        return None
+
+    store = None
+    if SENTIMENT_CACHE_PERSIST and os.environ.get("DATABASE_URL"):
+        store = PostgresSentimentStore(os.environ["DATABASE_URL"])
+
+    return SentimentCache(
+        max_size=SENTIMENT_CACHE_SIZE,
+        max_text_length=SENTIMENT_CACHE_MAX_TEXT_LENGTH,
+        store=store,
+    )
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SentimentEngine(create_backend(SENTIMENT_BACKEND), cache=create_cache())
+    return _engine
+
+def warm_up():
+    """Build the engine and load the backend's model so the first review does not pay for it.
+
+    Scores a fixed text straight through the backend, leaving the cache and
+    its counters alone. Safe to call again; only the first successful call
+    does work. A failure is logged and reported as the ``failed`` state
+    rather than raised, since this also runs as the process initializer of
+    the analysis workers.
+    """
+    if _warmup["state"] == "warm":
+        return readiness()
+
+    _warmup["state"] = "warming"
+    started = time.perf_counter()
+    try:
+        get_engine().backend.warm_up()
+    except Exception:
+        _warmup["state"] = "failed"
+        logger.exception("Sentiment backend warmup failed")
+        return readiness()
+    _warmup["seconds"] = round(time.perf_counter() - started, 3)
+    _warmup["state"] = "warm"
+    logger.info("Sentiment backend %s warm in %.3f s", SENTIMENT_BACKEND, _warmup["seconds"])
+    return readiness()
+
+def readiness():
+    return {
+        "backend": SENTIMENT_BACKEND,
+        "state": _warmup["state"],
+        "warmup_seconds": _warmup["seconds"],
+        "pid": os.getpid(),
+    }
+
+def cache_stats():
+    cache = get_engine().cache
+    return cache.stats() if cache is not None else {"enabled": False}
+
+def analyze_sentiment(text):
+    return get_engine().score([text])[0]
+
+def get_overall_rating(avg_score):
+    if avg_score >= 0.6:
+        return "excellent"
+    elif avg_score >= 0.3:
+        return "good"
+    elif avg_score >= 0.0:
+        return "average"
+    elif avg_score >= -0.3:
+        return "poor"
+    else:
+        return "very_poor"
+
+def _summarize_review(texts, results):
+    scores = [score for score, _ in results]
+    valid_scores = [s for s in scores if s != 0.0 or texts[0]]
+
+    avg_score = sum(valid_scores) / len(valid_scores) if valid_scores else 0.0
+    return results, avg_score, get_overall_rating(avg_score)
+
+def score_review_texts(texts):
+    """Score the aspect texts of one review (overall experience first).
+
+    Returns ``(results, average_score, overall_rating)`` where ``results`` holds
+    one ``(score, label)`` pair per text. Kept at module level so it can be
+    shipped to a worker process.
+    """
+    return _summarize_review(texts, get_engine().score(texts))
+
+def score_review_batch(reviews):
+    """``score_review_texts`` for many reviews with a single engine call."""
+    results = get_engine().score([text for texts in reviews for text in texts])
+
+    summaries = []
+    offset = 0
+    for texts in reviews:
+        summaries.append(_summarize_review(texts, results[offset:offset + len(texts)]))
+        offset += len(texts)
+    return summaries
@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+from fastapi import HTTPException
+
+from admission import AdmissionController
+from conftest import run
+
+
+async def contend(claim, contenders=10):
+    admission = AdmissionController()
+    started = asyncio.Event()
+
+    async def leader_claim():
+        started.set()
+        await asyncio.sleep(0.01)
+        return await claim()
+
+    leader = asyncio.ensure_future(admission.claim("seat", leader_claim))
+    await started.wait()
+    followers = [admission.claim("seat", leader_claim) for _ in range(contenders - 1)]
+    results = await asyncio.gather(leader, *followers, return_exceptions=True)
+    assert admission.coalesced == contenders - 1
+    assert admission.stats()["seats_in_flight"] == 0
+    return results
+
+
+def test_followers_share_the_leaders_result():
+    async def claim():
+        return {"seat_number": "A1"}
+
+    results = asyncio.run(contend(claim))
+
+    assert results[0] == ({"seat_number": "A1"}, True)
+    assert all(result == ({"seat_number": "A1"}, False) for result in results[1:])
+
+
+def test_followers_get_the_leaders_error():
+    error = HTTPException(status_code=500, detail="connection reset")
+
+    async def claim():
+        raise error
+
+    results = asyncio.run(contend(claim))
+
+    assert all(result is error for result in results)
+
+
+def test_followers_contend_again_when_the_leader_is_cancelled():
+    async def scenario():
+        admission = AdmissionController()
+        started = asyncio.Event()
+
+        async def stuck():
+            started.set()
+            await asyncio.sleep(60)
+
+        async def claim():
+            return "booked"
+
+        leader = asyncio.ensure_future(admission.claim("seat", stuck))
+        await started.wait()
+        follower = asyncio.ensure_future(admission.claim("seat", claim))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == ("booked", True)
+
+
+async def book_concurrently(app, event_id, seat_id, contenders):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(
+            client.post(f"/events/{event_id}/book/{seat_id}", json={"user_id": user_id, "user_name": f"user{user_id}"})
+            for user_id in range(contenders)
+        ))
+
+
+def test_concurrent_bookings_of_a_missing_seat_all_404(client, event):
+    event_id, _ = event
+    coalesced = client.app.state.admission.coalesced
+
+    responses = run(client, book_concurrently, client.app, event_id, 999999, 20)
+
+    assert [response.status_code for response in responses] == [404] * 20
+    assert client.app.state.admission.coalesced > coalesced
+
+
+def test_concurrent_bookings_of_a_seat_have_one_winner(client, event):
+    event_id, seat_ids = event
+
+    responses = run(client, book_concurrently, client.app, event_id, seat_ids[0], 20)
+
+    statuses = [response.json()["status"] for response in responses]
+    assert statuses.count("success") == 1 and statuses.count("failed") == 19
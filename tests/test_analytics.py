@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from aspects import ASPECT_NAMES, insert_review_aspects
+from conftest import book, run
+
+
+async def insert_pending_review(db, event_id, seat_id):
+    # What a review looks like while the analysis worker has not scored it yet.
+    async with db.transaction() as tx:
+        review_id = await tx.fetchval("""
+            INSERT INTO reviews (event_id, seat_id, user_id, user_name, analysis_status)
+            VALUES (%s, %s, 1, 'user1', 'pending')
+            RETURNING review_id;
+        """, (event_id, seat_id))
+        await insert_review_aspects(tx, review_id, ["Great show"] + [None] * (len(ASPECT_NAMES) - 1))
+    return review_id
+
+
+def test_analytics_with_pending_review(client, event):
+    event_id, seat_ids = event
+    book(client, event_id, seat_ids[0]).raise_for_status()
+    book(client, event_id, seat_ids[1]).raise_for_status()
+    client.post(f"/events/{event_id}/review/{seat_ids[0]}", json={
+        "user_id": 1, "user_name": "user1", "overall_experience": "Great show",
+    }).raise_for_status()
+    run(client, insert_pending_review, client.app.state.db, event_id, seat_ids[1])
+
+    response = client.get(f"/events/{event_id}/analytics")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["overall_statistics"]["total_reviews"] == 2
+    assert body["aspects"]["overall_experience"]["labels"] == {"none": 1, "positive": 1}
+    assert {"category": None, "count": 1} in body["sentiment_breakdown"]
+
+
+@pytest.mark.parametrize("client", ["UTC", "America/New_York"], indirect=True)
+def test_timeseries_with_aware_bounds(client, event):
+    event_id, seat_ids = event
+    book(client, event_id, seat_ids[0]).raise_for_status()
+    client.post(f"/events/{event_id}/review/{seat_ids[0]}", json={
+        "user_id": 1, "user_name": "user1", "overall_experience": "Great show",
+    }).raise_for_status()
+    since = datetime.now(timezone.utc) - timedelta(hours=2)
+
+    utc = client.get(f"/events/{event_id}/analytics/timeseries", params={"since": since.isoformat()})
+    shifted = client.get(f"/events/{event_id}/analytics/timeseries", params={
+        "since": since.astimezone(timezone(timedelta(hours=5))).isoformat(),
+        "until": (since + timedelta(hours=3)).astimezone(timezone(timedelta(hours=-7))).isoformat(),
+    })
+
+    assert utc.status_code == 200 and shifted.status_code == 200
+    assert sum(bucket["reviews"] for bucket in utc.json()["series"]) == 1
+    assert shifted.json()["series"] == utc.json()["series"]
+    assert shifted.json()["since"] == since.replace(tzinfo=None).isoformat()
+
+
+def test_seat_analytics_pages_by_seat_id(client, event):
+    event_id, seat_ids = event
+    for seat_id in seat_ids[:3]:
+        book(client, event_id, seat_id).raise_for_status()
+        client.post(f"/events/{event_id}/review/{seat_id}", json={
+            "user_id": 1, "user_name": "user1", "overall_experience": "Great show",
+        }).raise_for_status()
+
+    first = client.get(f"/events/{event_id}/analytics/seats", params={"limit": 2}).json()
+    second = client.get(f"/events/{event_id}/analytics/seats", params={"limit": 2, "after": first["next_after"]}).json()
+
+    assert [seat["seat_id"] for seat in first["seats"]] == seat_ids[:2]
+    assert first["next_after"] == seat_ids[1]
+    assert [(row["row"], row["reviews"]) for row in first["rows"]] == [("A", 3)]
+    assert [seat["seat_id"] for seat in second["seats"]] == seat_ids[2:3]
+    assert second["next_after"] is None and "rows" not in second
+    assert all(seat["reviews"] == 1 for seat in first["seats"] + second["seats"])
@@ -0,0 +1,42 @@
+import psycopg2
+
+from conftest import DATABASE_URL, book
+
+
+def lock_seat(event_id, seat_id):
+    # What a batch booking or a confirmation that has not committed yet looks like.
+    conn = psycopg2.connect(DATABASE_URL)
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM seats WHERE event_id = %s AND id = %s FOR UPDATE;", (event_id, seat_id))
+    return conn
+
+
+def test_booking_a_locked_seat_asks_to_retry(client, event):
+    event_id, seat_ids = event
+    conn = lock_seat(event_id, seat_ids[0])
+    try:
+        locked = book(client, event_id, seat_ids[0])
+        held = client.post(f"/events/{event_id}/hold/{seat_ids[0]}", json={"user_id": 2, "user_name": "user2"})
+    finally:
+        conn.rollback()
+        conn.close()
+
+    assert locked.status_code == 409 and locked.headers["Retry-After"] == "1"
+    assert held.status_code == 409
+    assert book(client, event_id, seat_ids[0]).json()["status"] == "success"
+    assert book(client, event_id, seat_ids[0], user_id=2).json()["status"] == "failed"
+
+
+def test_oversized_seat_range_is_rejected_before_expanding(client, event, monkeypatch):
+    import main
+
+    event_id, _ = event
+    # Expanding this range would take minutes and gigabytes.
+    monkeypatch.setattr(main, "parse_seat_range", None)
+
+    response = client.post(f"/events/{event_id}/book/batch", json={
+        "user_id": 1, "user_name": "user1", "seat_range": "A1-A5000000000",
+    })
+
+    assert response.status_code == 422
+    assert "At most" in response.text
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import DATABASE_URL
+
+
+async def store_both_ways(backend, values):
+    from db import create_database
+
+    db = create_database(backend, DATABASE_URL, min_size=0, max_size=1)
+    await db.open()
+    try:
+        async with db.transaction() as tx:
+            await tx.execute("CREATE TEMP TABLE copied_at (path TEXT, n INTEGER, at TIMESTAMP) ON COMMIT DROP;")
+            for n, value in enumerate(values):
+                await tx.execute("INSERT INTO copied_at VALUES ('insert', %s, %s);", (n, value))
+            await tx.copy_records("copied_at", ("path", "n", "at"), [("copy", n, value) for n, value in enumerate(values)])
+            rows = await tx.fetch("SELECT path, n, at FROM copied_at ORDER BY n, path;")
+    finally:
+        await db.close()
+    return {(row['path'], row['n']): row['at'] for row in rows}
+
+
+@pytest.mark.parametrize("backend", ["sync", "async"])
+def test_copy_stores_timestamps_like_insert(backend):
+    if not DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL or DATABASE_URL is not set")
+
+    naive = datetime(2026, 3, 1, 12, 30, 15, 250000)
+    values = [
+        naive,
+        naive.replace(tzinfo=timezone.utc),
+        naive.replace(tzinfo=timezone(timedelta(hours=5, minutes=30))),
+        naive.replace(tzinfo=timezone(timedelta(hours=-8))),
+    ]
+
+    stored = asyncio.run(store_both_ways(backend, values))
+
+    for n, value in enumerate(values):
+        assert stored[("copy", n)] == stored[("insert", n)]
+    assert stored[("copy", 2)] == datetime(2026, 3, 1, 7, 0, 15, 250000)
+    assert stored[("copy", 3)] == datetime(2026, 3, 1, 20, 30, 15, 250000)
+
+
+async def query_concurrently(requests):
+    from db import create_database
+
+    db = create_database("sync", DATABASE_URL, min_size=0, max_size=2, timeout=3)
+    await db.open()
+    try:
+        results = await asyncio.gather(
+            *(db.fetchval("SELECT 1 FROM pg_sleep(0.01);") for _ in range(requests)),
+            return_exceptions=True,
+        )
+        return results, db.stats()
+    finally:
+        await db.close()
+
+
+def test_sync_pool_waiters_do_not_hold_worker_threads():
+    if not DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL or DATABASE_URL is not set")
+
+    # Twice anyio's default of 40 worker threads, queued on two connections.
+    results, stats = asyncio.run(query_concurrently(80))
+
+    assert results == [1] * 80
+    assert stats["timeouts_total"] == 0 and stats["waiting"] == 0
+
+
+@pytest.mark.parametrize("backend", ["sync", "async"])
+def test_timestamps_are_utc_whatever_the_client_time_zone(backend, monkeypatch):
+    if not DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL or DATABASE_URL is not set")
+    monkeypatch.setenv("PGTZ", "America/New_York")
+
+    aware = datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc)
+
+    stored = asyncio.run(store_both_ways(backend, [aware]))
+
+    assert stored[("insert", 0)] == stored[("copy", 0)] == datetime(2026, 3, 1, 12, 30)
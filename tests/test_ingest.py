@@ -0,0 +1,34 @@
+import json
+
+
+def test_bulk_load_reports_undecodable_lines(client, event):
+    event_id, seat_ids = event
+    row = {"seat_id": seat_ids[0], "user_id": 1, "user_name": "user1", "overall_experience": "Great show"}
+    body = b"\n".join([
+        json.dumps(row).encode(),
+        json.dumps({**row, "overall_experience": "Bad bytes"}).encode().replace(b"Bad", b"Bad \xff\xfe"),
+        json.dumps({**row, "overall_experience": "Café was fine"}, ensure_ascii=False).encode(),
+    ])
+
+    response = client.post(f"/events/{event_id}/reviews/bulk", content=body, headers={"content-type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["rows"], report["inserted"], report["failed"]) == (3, 2, 1)
+    assert report["errors"][0]["line"] == 2 and "UTF-8" in report["errors"][0]["error"]
+
+
+def test_bulk_load_reports_undecodable_csv_records(client, event):
+    event_id, seat_ids = event
+    body = (
+        b"seat_id,user_id,user_name,overall_experience\n"
+        + f'{seat_ids[0]},1,user1,"Two\nlines"\n'.encode()
+        + f'{seat_ids[1]},2,user2,"Bad\n\xff bytes"\n'.encode("latin-1")
+        + f"{seat_ids[2]},3,user3,Fine\n".encode()
+    )
+
+    response = client.post(f"/events/{event_id}/reviews/bulk", content=body, headers={"content-type": "text/csv"})
+
+    report = response.json()
+    assert (report["rows"], report["inserted"], report["failed"]) == (3, 2, 1)
+    assert report["errors"][0]["line"] == 5
@@ -0,0 +1,20 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def test_shutdown_after_failed_warmup_closes_everything(app, monkeypatch):
+    import main
+
+    async def broken_warmup(app, started):
+        raise RuntimeError("model failed to load")
+
+    monkeypatch.setattr(main, "SENTIMENT_WARMUP", "background")
+    monkeypatch.setattr(main, "warm_sentiment", broken_warmup)
+
+    with TestClient(app) as client:
+        assert client.get("/ready").status_code == 503
+
+    with pytest.raises(Exception, match="closed"):
+        asyncio.run(app.state.db.fetchval("SELECT 1;"))
@@ -0,0 +1,139 @@
+import asyncio
+import os
+
+import psycopg2
+import pytest
+from psycopg2.extensions import make_dsn
+
+from conftest import DATABASE_URL
+
+# What the drop-and-recreate startup before migrations left behind.
+BASELINE_SCHEMA = [
+    """
+    CREATE TABLE seats (
+        id SERIAL PRIMARY KEY,
+        seat_number VARCHAR(10) UNIQUE NOT NULL,
+        status VARCHAR(20) DEFAULT 'available',
+        user_id INTEGER,
+        user_name VARCHAR(100),
+        booked_at TIMESTAMP
+    );
+    """,
+    """
+    CREATE TABLE reviews (
+        review_id SERIAL PRIMARY KEY,
+        seat_id INTEGER REFERENCES seats(id),
+        user_id INTEGER NOT NULL,
+        user_name VARCHAR(100),
+        overall_experience TEXT,
+        overall_sentiment_score FLOAT,
+        overall_sentiment_label VARCHAR(20),
+        sound_quality_review TEXT, sound_quality_score FLOAT, sound_quality_label VARCHAR(20),
+        seat_comfort_review TEXT, seat_comfort_score FLOAT, seat_comfort_label VARCHAR(20),
+        seat_height_review TEXT, seat_height_score FLOAT, seat_height_label VARCHAR(20),
+        view_quality_review TEXT, view_quality_score FLOAT, view_quality_label VARCHAR(20),
+        booking_service_review TEXT, booking_service_score FLOAT, booking_service_label VARCHAR(20),
+        staff_behavior_review TEXT, staff_behavior_score FLOAT, staff_behavior_label VARCHAR(20),
+        cleanliness_review TEXT, cleanliness_score FLOAT, cleanliness_label VARCHAR(20),
+        value_for_money_review TEXT, value_for_money_score FLOAT, value_for_money_label VARCHAR(20),
+        average_score FLOAT,
+        overall_rating VARCHAR(20),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    "INSERT INTO seats (seat_number) SELECT 'A' || n FROM generate_series(1, 10) AS n;",
+    "UPDATE seats SET status = 'booked', user_id = id, user_name = 'user' || id, booked_at = now() WHERE id <= 2;",
+    """
+    INSERT INTO reviews (
+        seat_id, user_id, user_name, overall_experience, overall_sentiment_score, overall_sentiment_label,
+        sound_quality_review, sound_quality_score, sound_quality_label, average_score, overall_rating
+    ) VALUES
+        (1, 1, 'user1', 'Great show', 0.8, 'positive', 'Too loud', -0.2, 'negative', 0.3, 'good'),
+        (2, 2, 'user2', 'Fine', 0.4, 'positive', NULL, NULL, NULL, 0.4, 'good');
+    """,
+]
+
+
+@pytest.fixture
+def scratch_dsn():
+    if not DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL or DATABASE_URL is not set")
+
+    name = f"migrations_test_{os.getpid()}"
+    admin = psycopg2.connect(DATABASE_URL)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {name};")
+            try:
+                cur.execute(f"CREATE DATABASE {name};")
+            except psycopg2.errors.InsufficientPrivilege:
+                pytest.skip("the test role cannot create databases")
+        yield make_dsn(DATABASE_URL, dbname=name)
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE);")
+    finally:
+        admin.close()
+
+
+def execute(dsn, statements):
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        for sql in statements:
+            cur.execute(sql)
+    conn.close()
+
+
+def query(dsn, sql):
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        cur.execute(sql)
+        rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+async def migrate_and_check(dsn, backend):
+    from aggregates import check_review_stats
+    from db import create_database
+    from migrations import migrate
+
+    db = create_database(backend, dsn, min_size=0, max_size=1)
+    await db.open()
+    try:
+        first = await migrate(db)
+        second = await migrate(db)
+        return first, second, await check_review_stats(db)
+    finally:
+        await db.close()
+
+
+@pytest.mark.parametrize("backend", ["sync", "async"])
+def test_fresh_database(scratch_dsn, backend):
+    from migrations import MIGRATIONS
+
+    first, second, stats = asyncio.run(migrate_and_check(scratch_dsn, backend))
+
+    assert [m["version"] for m in first["applied"]] == [version for version, _, _ in MIGRATIONS]
+    assert second["applied"] == [] and second["version"] == MIGRATIONS[-1][0]
+    assert stats["consistent"]
+    assert query(scratch_dsn, "SELECT COUNT(*) FROM seats WHERE event_id = 1;") == [(30,)]
+
+
+def test_adopts_drop_and_recreate_schema(scratch_dsn):
+    execute(scratch_dsn, BASELINE_SCHEMA)
+
+    first, _, stats = asyncio.run(migrate_and_check(scratch_dsn, "sync"))
+
+    assert first["applied"][0]["version"] == 1
+    assert stats["consistent"], stats["mismatches"]
+    versions = query(scratch_dsn, "SELECT version FROM seats WHERE seat_number LIKE 'A%' ORDER BY id;")
+    assert len(versions) == 10 and len({version for version, in versions}) == 10
+    assert query(scratch_dsn, "SELECT status, user_name FROM seats WHERE seat_number = 'A1';") == [("booked", "user1")]
+    assert query(scratch_dsn, """
+        SELECT r.review_id, r.analysis_status, r.analyzed_at IS NOT NULL, a.aspect, a.score, a.label
+        FROM reviews r JOIN review_aspects a USING (review_id)
+        ORDER BY r.review_id, a.aspect;
+    """) == [
+        (1, "complete", True, "overall_experience", 0.8, "positive"),
+        (1, "complete", True, "sound_quality", -0.2, "negative"),
+        (2, "complete", True, "overall_experience", 0.4, "positive"),
+    ]
@@ -0,0 +1,19 @@
+def test_missing_events_are_not_cached(client, event):
+    event_id, _ = event
+    assert client.get(f"/events/{event_id}/seats").status_code == 200
+    before = client.get("/stats").json()["seat_cache"]
+
+    statuses = {client.get(f"/events/{event_id + n}/seats").status_code for n in range(1000, 1200)}
+
+    after = client.get("/stats").json()["seat_cache"]
+    assert statuses == {404}
+    assert (after["events"], after["evictions"]) == (before["events"], before["evictions"])
+    assert client.get(f"/events/{event_id}/seats").status_code == 200
+
+
+def test_seat_changes_since_must_be_a_version(client, event):
+    event_id, _ = event
+
+    assert client.get(f"/events/{event_id}/seats", params={"since": 2**70}).status_code == 422
+    assert client.get(f"/events/{event_id}/seats", params={"since": -1}).status_code == 422
+    assert client.get(f"/events/{event_id}/seats", params={"since": 2**63 - 1}).json()["changes"] == []